@@ -0,0 +1,76 @@
+"""Measure the startup time of the ``movici`` CLI using ``python -X importtime``, and list which
+heavy dependencies are imported. Commands that do not do any work (eg. ``--help``) should not
+import the dependencies that are only needed by specific commands.
+
+The script exits with a non-zero status when the import time of any of the commands exceeds the
+budget, so that it can be used to guard against startup time regressions.
+
+usage: python benchmarks/bench_cli_startup.py [--budget-ms 400] [--repeat 5]
+"""
+import argparse
+import os
+import pathlib
+import re
+import subprocess
+import sys
+
+COMMANDS = [
+    ["--help"],
+    ["config", "--help"],
+    ["get", "--help"],
+]
+
+# Dependencies that are only needed by some commands
+HEAVY_MODULES = ["httpx", "questionary", "prompt_toolkit", "tabulate", "tqdm", "orjson", "msgpack"]
+
+# Benchmark the working tree, also when the package is not installed
+SRC_DIR = str(pathlib.Path(__file__).resolve().parents[1] / "src")
+PYTHONPATH = os.environ.get("PYTHONPATH")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run(args):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "movici_api_client.cli", *args],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [SRC_DIR, PYTHONPATH]))},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"movici {' '.join(args)} failed:\n{result.stderr}")
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if (match := IMPORTTIME_LINE.match(line)) is None:
+            continue
+        cumulative, indent, module = int(match.group(2)), match.group(3), match.group(4)
+        modules.add(module)
+        # Only top level imports (with a single space of indentation) count towards the total,
+        # since the cumulative time of a module includes the time of its imports
+        if len(indent) == 1:
+            total_us += cumulative
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    over_budget = False
+    for command in COMMANDS:
+        results = [run(command) for _ in range(args.repeat)]
+        best = min(duration for duration, _ in results)
+        modules = results[0][1]
+        heavy = [m for m in HEAVY_MODULES if m in modules]
+        status = "ok" if best <= args.budget_ms else "OVER BUDGET"
+        over_budget |= best > args.budget_ms
+        print(f"movici {' '.join(command):<16s}: {best:7.1f} ms ({status})")
+        print(f"  heavy imports: {', '.join(heavy) or 'none'}")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare writing a streamed download to disk using small blocking writes on the event loop
+(the previous ``DownloadResource`` implementation) against ``BufferedFileWriter``.
+
+Besides throughput, this reports the maximum event loop lag during the download, which indicates
+how much a download stalls other concurrent downloads.
+
+usage: python benchmarks/bench_download_writes.py [--size-mb 512] [--concurrent 4]
+"""
+import argparse
+import asyncio
+import pathlib
+import tempfile
+import time
+
+from movici_api_client.cli.filetransfer.common import BufferedFileWriter
+
+NETWORK_CHUNK_SIZE = 64 * 1024
+
+
+async def fake_response(size: int):
+    """Mimics ``httpx.Response.aiter_bytes`` with data arriving in network sized chunks"""
+    chunk = b"x" * NETWORK_CHUNK_SIZE
+    for _ in range(size // NETWORK_CHUNK_SIZE):
+        yield chunk
+        await asyncio.sleep(0)
+
+
+async def rechunk(stream, chunk_size):
+    buffer = b""
+    async for data in stream:
+        buffer += data
+        while len(buffer) >= chunk_size:
+            yield buffer[:chunk_size]
+            buffer = buffer[chunk_size:]
+    if buffer:
+        yield buffer
+
+
+async def blocking_writes(file: pathlib.Path, size: int):
+    with open(file, "wb") as fout:
+        async for chunk in rechunk(fake_response(size), chunk_size=4096):
+            fout.write(chunk)
+
+
+async def buffered_writes(file: pathlib.Path, size: int):
+    with open(file, "wb") as fout:
+        async with BufferedFileWriter(fout) as writer:
+            async for chunk in fake_response(size):
+                await writer.write(chunk)
+
+
+async def measure_lag(stop: asyncio.Event, interval=0.001):
+    max_lag = 0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+    return max_lag
+
+
+async def run(method, directory: pathlib.Path, size: int, concurrent: int):
+    stop = asyncio.Event()
+    lag = asyncio.create_task(measure_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(method(directory / f"file_{i}", size) for i in range(concurrent)))
+    duration = time.perf_counter() - start
+    stop.set()
+    return duration, await lag
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--concurrent", type=int, default=4)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, method in [("blocking 4 KiB", blocking_writes), ("buffered", buffered_writes)]:
+            duration, lag = asyncio.run(run(method, pathlib.Path(tmp), size, args.concurrent))
+            throughput = args.size_mb * args.concurrent / duration
+            print(f"{name:<16s}: {throughput:8.1f} MB/s, max loop lag {lag * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
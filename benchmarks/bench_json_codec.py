@@ -0,0 +1,116 @@
+"""Compare the standard library ``json`` module against ``movici_api_client.api.codec`` (which uses
+``orjson`` when it is installed) on a synthetic timeline of updates.
+
+Three workloads are measured:
+
+* decoding the listing of all updates of a scenario (``GetUpdates``)
+* reading every update file from disk and encoding it as a request body, as is done when
+  uploading a timeline (``UploadUpdate``)
+* decoding every update response, as is done when downloading a timeline
+
+usage: python benchmarks/bench_json_codec.py [--updates 10000] [--entities 100]
+"""
+import argparse
+import json
+import pathlib
+import random
+import tempfile
+import time
+import uuid
+
+from movici_api_client.api import codec
+
+
+def make_update(i: int, entities: int):
+    return {
+        "uuid": str(uuid.UUID(int=i)),
+        "name": f"dataset_{i % 10}",
+        "timestamp": i // 10,
+        "iteration": i % 10,
+        "dataset_uuid": str(uuid.UUID(int=i % 10)),
+        "scenario_uuid": str(uuid.UUID(int=0)),
+        "data": {
+            "road_segment_entities": {
+                "id": list(range(entities)),
+                "traffic.passenger.flow": [random.random() * 1000 for _ in range(entities)],
+                "traffic.cargo.flow": [random.random() * 100 for _ in range(entities)],
+                "transport.delay_factor": [random.random() for _ in range(entities)],
+            }
+        },
+    }
+
+
+def listing(updates):
+    return {"updates": [{k: v for k, v in u.items() if k != "data"} for u in updates]}
+
+
+class Stdlib:
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj).encode()
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    num_bytes = func(*args)
+    return time.perf_counter() - start, num_bytes
+
+
+def decode_listing(impl, data: bytes):
+    impl.loads(data)
+    return len(data)
+
+
+def upload_updates(impl, files):
+    num_bytes = 0
+    for file in files:
+        num_bytes += len(impl.dumps(impl.loads(file.read_bytes())))
+    return num_bytes
+
+
+def decode_updates(impl, responses):
+    for response in responses:
+        impl.loads(response)
+    return sum(len(r) for r in responses)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=10000)
+    parser.add_argument("--entities", type=int, default=100)
+    args = parser.parse_args()
+    random.seed(0)
+
+    updates = [make_update(i, args.entities) for i in range(args.updates)]
+    listing_data = json.dumps(listing(updates)).encode()
+    responses = [json.dumps(u).encode() for u in updates]
+    print(f"codec: {'orjson' if codec.orjson is not None else 'stdlib (orjson not installed)'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for u, data in zip(updates, responses):
+            file = pathlib.Path(tmp, f"t{u['timestamp']}_{u['iteration']}_{u['name']}.json")
+            file.write_bytes(data)
+            files.append(file)
+
+        workloads = [
+            ("decode listing", decode_listing, listing_data),
+            ("upload updates", upload_updates, files),
+            ("decode updates", decode_updates, responses),
+        ]
+        for name, func, data in workloads:
+            results = {}
+            for impl_name, impl in [("stdlib", Stdlib), ("codec", codec)]:
+                duration, num_bytes = measure(func, impl, data)
+                results[impl_name] = duration
+                throughput = num_bytes / duration / 1024 / 1024
+                print(f"{name:<16s} {impl_name:<7s}: {throughput:8.1f} MB/s")
+            print(f"{name:<16s} speedup: {results['stdlib'] / results['codec']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
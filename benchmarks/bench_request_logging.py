@@ -0,0 +1,93 @@
+"""Measure the overhead of request logging in ``BaseClient._prepare_request_config`` when sending
+timeline updates (``CreateUpdate``) with a logger attached.
+
+The previous implementation logged ``str(conf)`` for every request, which formats the entire
+payload even when DEBUG logging is disabled. This compares it against the current, level-gated
+logging of a ``RequestSummary`` with DEBUG logging both disabled and enabled. Log records are
+formatted and written to ``os.devnull``.
+
+usage: python benchmarks/bench_request_logging.py [--updates 200] [--entities 10000] [--repeat 3]
+"""
+import argparse
+import logging
+import os
+import random
+import time
+
+from movici_api_client.api import codec
+from movici_api_client.api.auth import MoviciTokenAuth
+from movici_api_client.api.common import BaseClient
+from movici_api_client.api.requests import CreateUpdate
+
+
+class EagerLoggingClient(BaseClient):
+    """Logs requests the way ``BaseClient`` used to"""
+
+    def _prepare_request_config(self, req):
+        conf = req.generate_config(self)
+        if self.auth:
+            conf = self.auth(conf)
+        if self.logger:
+            self.logger.debug(str(conf))
+        return codec.encode_json_body(conf)
+
+
+def make_update(entities: int):
+    return {
+        "name": "road_network",
+        "timestamp": 0,
+        "iteration": 0,
+        "data": {
+            "road_segment_entities": {
+                "id": list(range(entities)),
+                "traffic.passenger.flow": [random.random() * 1000 for _ in range(entities)],
+            }
+        },
+    }
+
+
+def measure(client: BaseClient, requests, repeat: int):
+    """The fastest of ``repeat`` runs"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for req in requests:
+            client._prepare_request_config(req)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--entities", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    random.seed(0)
+
+    requests = [CreateUpdate("some-scenario", make_update(args.entities))] * args.updates
+    payload_mb = len(codec.dumps(requests[0].payload)) / 1024 / 1024
+    print(f"{args.updates} updates of {payload_mb:.2f} MB")
+
+    logger = logging.getLogger("bench_request_logging")
+    logger.propagate = False
+    devnull = open(os.devnull, "w")
+    logger.addHandler(logging.StreamHandler(devnull))
+    auth = MoviciTokenAuth("some-token")
+    baseline = measure(BaseClient("https://example.org", auth=auth), requests, args.repeat)
+    print(f"{'without logger':<24s}: {baseline * 1000:9.1f} ms")
+    for level in (logging.INFO, logging.DEBUG):
+        logger.setLevel(level)
+        for name, cls in [("eager", EagerLoggingClient), ("lazy", BaseClient)]:
+            client = cls("https://example.org", auth=auth, logger=logger)
+            duration = measure(client, requests, args.repeat)
+            label = f"{name}, {logging.getLevelName(level)}"
+            print(
+                f"{label:<24s}: {duration * 1000:9.1f} ms "
+                f"(overhead {(duration - baseline) * 1000:9.1f} ms)"
+            )
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""Measure the throughput of the file transfers of the CLI (``UploadProject``, ``UploadTimeline``,
+``DownloadProject`` and ``DownloadSingleScenario``) against the in memory ``StandInServer`` of
+``movici_api_client.cli.standin``, using a synthetic Movici data directory.
+
+For every transfer this reports the number of requests per second, the amount of data sent and
+received per second, the peak RSS and the maximum event loop lag. Every transfer runs in a fresh
+process, so that the peak RSS of one transfer does not hide that of another. Note that the
+stand-in server runs in the same process and event loop as the client, so both the peak RSS and
+the event loop lag include the (small) overhead of the server.
+
+Results can be appended to a JSON lines file using ``--save``, and compared against the last
+saved result with the same options using ``--compare``, so that performance regressions become
+visible between releases.
+
+usage: python benchmarks/bench_transfers.py [--datasets 20] [--dataset-kb 1024] [--scenarios 2]
+    [--updates 500] [--update-kb 16] [--latency-ms 0] [--bandwidth-mbps 0] [--throttle-rate 0]
+    [--jobs 4] [--only download_project]
+    [--save results.jsonl] [--compare results.jsonl]
+"""
+import argparse
+import asyncio
+import datetime
+import importlib.metadata
+import json
+import os
+import pathlib
+import platform
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+
+# Progress bars would clobber the output
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+import gimme  # noqa: E402
+import httpx  # noqa: E402
+
+from movici_api_client.api import codec  # noqa: E402
+from movici_api_client.api.client import AsyncClient  # noqa: E402
+from movici_api_client.api.retry import RetryPolicy  # noqa: E402
+from movici_api_client.cli.cache import UploadSessions  # noqa: E402
+from movici_api_client.cli.common import CLIParameters  # noqa: E402
+from movici_api_client.cli.config import Context  # noqa: E402
+from movici_api_client.cli.data_dir import MOVICI_UPLOAD_LEDGER, MoviciDataDir  # noqa: E402
+from movici_api_client.cli.filetransfer import DownloadProject, UploadProject  # noqa: E402
+from movici_api_client.cli.filetransfer.download import DownloadSingleScenario  # noqa: E402
+from movici_api_client.cli.filetransfer.upload import UploadTimeline  # noqa: E402
+from movici_api_client.cli.main import setup_concurrency_limiter  # noqa: E402
+from movici_api_client.cli.standin import Faults, StandInServer, StandInTransport  # noqa: E402
+
+BASE_URL = "https://movici.example"
+DATASET_TYPE = "road_network"
+BENCHMARKS = ["upload_project", "upload_timeline", "download_project", "download_scenario"]
+
+
+def entities(size: int):
+    """An entity group of approximately ``size`` bytes when encoded as JSON"""
+    count = max(1, size // 40)
+    return {
+        "road_segment_entities": {
+            "id": list(range(count)),
+            "traffic.passenger.flow": [round(random.random() * 1000, 6) for _ in range(count)],
+        }
+    }
+
+
+def generate_project(path: pathlib.Path, args) -> MoviciDataDir:
+    """Generates a Movici data directory with ``args.datasets`` datasets and ``args.scenarios``
+    scenarios, that each have a simulation of ``args.updates`` update files"""
+    data_dir = MoviciDataDir(path)
+    data_dir.initialize()
+    for i in range(args.datasets):
+        dataset = {"name": f"dataset_{i}", "type": DATASET_TYPE}
+        dataset["data"] = entities(args.dataset_kb * 1024)
+        data_dir.datasets.joinpath(f"dataset_{i}.json").write_bytes(codec.dumps(dataset))
+    for i in range(args.scenarios):
+        name = f"scenario_{i}"
+        scenario = {
+            "name": name,
+            "display_name": name,
+            "datasets": [{"name": f"dataset_{k}"} for k in range(args.datasets)],
+            "models": [],
+        }
+        data_dir.scenarios.joinpath(f"{name}.json").write_bytes(codec.dumps(scenario))
+        simulation_dir = data_dir.ensure_simulation_dir(name)
+        for k in range(args.updates):
+            timestamp, iteration, dataset = k // 10, k % 10, f"dataset_{k % args.datasets}"
+            update = {"data": entities(args.update_kb * 1024)}
+            file = simulation_dir.joinpath(f"t{timestamp}_{iteration}_{dataset}.json")
+            file.write_bytes(codec.dumps(update))
+    return data_dir
+
+
+def seed(server: StandInServer, data_dir: MoviciDataDir) -> dict:
+    """Adds a project with the datasets, scenarios and timelines of ``data_dir`` to ``server``"""
+    project = server.add_project("benchmark")
+    for file in data_dir.iter_datasets():
+        server.add_dataset(project["uuid"], file.stem, DATASET_TYPE, data=file.read_bytes())
+    for file in data_dir.iter_scenarios():
+        scenario = server.add_scenario(project["uuid"], codec.loads(file.read_bytes()))
+        scenario["has_timeline"] = True
+        server.timelines[scenario["uuid"]] = []
+        for update_file in data_dir.iter_updates(scenario["name"]):
+            ts, it, name = re.match(r"t(\d+)_(\d+)_(\w+)", update_file.stem).groups()
+            payload = codec.loads(update_file.read_bytes())
+            payload.update(name=name, timestamp=int(ts), iteration=int(it))
+            server.add_update(scenario["uuid"], payload)
+    return project
+
+
+async def measure_lag(stop: asyncio.Event, interval=0.001):
+    max_lag = 0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+    return max_lag
+
+
+def make_task(name: str, server: StandInServer, data_dir: MoviciDataDir, work: pathlib.Path):
+    """Prepares the server and returns the transfer task for benchmark ``name``"""
+    if name == "upload_project":
+        project = server.add_project("benchmark")
+        return UploadProject(data_dir, project["uuid"])
+    if name == "upload_timeline":
+        project = server.add_project("benchmark")
+        scenario_file = next(iter(data_dir.iter_scenarios()))
+        scenario = server.add_scenario(project["uuid"], codec.loads(scenario_file.read_bytes()))
+        return UploadTimeline(gimme.that(AsyncClient), data_dir, scenario["uuid"], scenario)
+    project = seed(server, data_dir)
+    target = MoviciDataDir(work.joinpath("download"))
+    target.initialize()
+    if name == "download_project":
+        return DownloadProject(project, target, progress=False)
+    scenario = next(iter(server.scenarios.values()))
+    return DownloadSingleScenario(scenario, target, progress=False)
+
+
+async def run_benchmark(name: str, data_dir: MoviciDataDir, work: pathlib.Path, args) -> dict:
+    faults = Faults(
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1024 * 1024 or None,
+        throttle_rate=args.throttle_rate,
+        retry_after=0.1,
+        seed=0,
+    )
+    server = StandInServer(faults)
+    transport = StandInTransport(server)
+    client = AsyncClient(
+        BASE_URL,
+        auth=False,
+        retry=RetryPolicy(max_retries=10),
+        client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+        coalesce_requests=True,
+        limiter=setup_concurrency_limiter(Context(name="benchmark", url=BASE_URL)),
+    )
+    with gimme.context() as repo:
+        repo.add(client)
+        repo.add(UploadSessions())
+        repo.add(
+            CLIParameters(
+                overwrite=True,
+                create=True,
+                inspect=True,
+                yes=True,
+                with_simulation=True,
+                with_views=False,
+                jobs=args.jobs,
+            )
+        )
+        task = make_task(name, server, data_dir, work)
+
+        stop = asyncio.Event()
+        lag = asyncio.create_task(measure_lag(stop))
+        start = time.perf_counter()
+        await task.run()
+        duration = time.perf_counter() - start
+        stop.set()
+
+    stats = server.stats
+    megabytes = (stats["bytes_received"] + stats["bytes_sent"]) / 1024 / 1024
+    return {
+        "benchmark": name,
+        "duration_s": duration,
+        "requests": stats["requests"],
+        "requests_per_s": stats["requests"] / duration,
+        "megabytes": megabytes,
+        "mb_per_s": megabytes / duration,
+        "peak_rss_mb": peak_rss_mb(),
+        "max_loop_lag_ms": await lag * 1000,
+    }
+
+
+def peak_rss_mb():
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def run_in_subprocess(name: str, data_dir: pathlib.Path, args) -> dict:
+    with tempfile.TemporaryDirectory() as work:
+        # Uploads are skipped when the upload ledger says that a file was uploaded before
+        shutil.copytree(data_dir, work, dirs_exist_ok=True)
+        pathlib.Path(work, MOVICI_UPLOAD_LEDGER).unlink(missing_ok=True)
+        result = subprocess.run(
+            [sys.executable, __file__, "--run", name, "--data-dir", work, *option_args(args)],
+            capture_output=True,
+            text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark {name} failed:\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def options(args) -> dict:
+    return {
+        k: getattr(args, k)
+        for k in (
+            "datasets",
+            "dataset_kb",
+            "scenarios",
+            "updates",
+            "update_kb",
+            "latency_ms",
+            "bandwidth_mbps",
+            "throttle_rate",
+            "jobs",
+        )
+    }
+
+
+def option_args(args) -> t.List[str]:
+    return [f"--{k.replace('_', '-')}={v}" for k, v in options(args).items()]
+
+
+def version_info() -> dict:
+    try:
+        version = importlib.metadata.version("movici-api-client")
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    try:
+        revision = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=pathlib.Path(__file__).parent,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        revision = None
+    return {"version": version, "revision": revision or None, "python": platform.python_version()}
+
+
+def load_previous(file: pathlib.Path, args) -> t.Optional[dict]:
+    if not file.is_file():
+        return None
+    previous = None
+    for line in file.read_text().splitlines():
+        if line.strip() and (record := json.loads(line))["options"] == options(args):
+            previous = record
+    return previous
+
+
+def print_results(results: t.List[dict], previous: t.Optional[dict]):
+    previous_results = {r["benchmark"]: r for r in (previous or {}).get("results", [])}
+    for r in results:
+        print(
+            f"{r['benchmark']:<18s}: {r['requests_per_s']:9.1f} req/s {r['mb_per_s']:8.1f} MB/s "
+            f"peak RSS {r['peak_rss_mb']:7.1f} MB  max loop lag {r['max_loop_lag_ms']:7.1f} ms"
+        )
+        if (old := previous_results.get(r["benchmark"])) is not None:
+            changes = ", ".join(
+                f"{key} {(r[key] - old[key]) / old[key]:+.1%}"
+                for key in ("requests_per_s", "mb_per_s", "peak_rss_mb")
+                if old[key]
+            )
+            print(f"{'':<18s}  vs {previous['revision'] or previous['date']}: {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--datasets", type=int, default=20)
+    parser.add_argument("--dataset-kb", type=int, default=1024)
+    parser.add_argument("--scenarios", type=int, default=2)
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--update-kb", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="0 is unlimited")
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--only", choices=BENCHMARKS, action="append")
+    parser.add_argument("--save", type=pathlib.Path, help="append the results to this file")
+    parser.add_argument("--compare", type=pathlib.Path, help="compare against the last result")
+    parser.add_argument("--run", choices=BENCHMARKS, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", type=pathlib.Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        work = args.data_dir
+        result = asyncio.run(run_benchmark(args.run, MoviciDataDir(work), work, args))
+        print(json.dumps(result))
+        return
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = generate_project(pathlib.Path(tmp, "project"), args)
+        results = [
+            run_in_subprocess(name, data_dir.path, args) for name in args.only or BENCHMARKS
+        ]
+
+    record = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        **version_info(),
+        "options": options(args),
+        "results": results,
+    }
+    print_results(results, load_previous(args.compare, args) if args.compare else None)
+    if args.save:
+        with open(args.save, "a") as fobj:
+            fobj.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,64 @@
-from .auth import MoviciLoginAuth, MoviciTokenAuth
-from .client import AsyncClient, Client, HTTPError, HTTPStatusError, Response
-from .common import IAsyncClient, ISyncClient, Request
+import importlib
+import typing as t
+
+if t.TYPE_CHECKING:
+    from .auth import MoviciLoginAuth, MoviciTokenAuth
+    from .client import AsyncClient, Client, HTTPError, HTTPStatusError, Response
+    from .common import IAsyncClient, ISyncClient, Request
+    from .limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimiter, TokenBucket
+    from .retry import RetryPolicy, RetryStats
+    from .tracing import JSONLinesExporter, RequestHooks, RequestTrace
+
+# The exports are only imported once they are used, so that importing one of the submodules (eg.
+# to define a command line interface) does not import ``httpx``
+_EXPORTS = {
+    "AdaptiveConcurrencyLimiter": "limiter",
+    "AsyncClient": "client",
+    "Client": "client",
+    "ConcurrencyLimiter": "limiter",
+    "HTTPError": "client",
+    "HTTPStatusError": "client",
+    "IAsyncClient": "common",
+    "ISyncClient": "common",
+    "JSONLinesExporter": "tracing",
+    "MoviciLoginAuth": "auth",
+    "MoviciTokenAuth": "auth",
+    "Request": "common",
+    "RequestHooks": "tracing",
+    "RequestTrace": "tracing",
+    "Response": "client",
+    "RetryPolicy": "retry",
+    "RetryStats": "retry",
+    "TokenBucket": "limiter",
+}
 
 __all__ = [
+    "AdaptiveConcurrencyLimiter",
     "AsyncClient",
     "Client",
+    "ConcurrencyLimiter",
     "HTTPError",
     "HTTPStatusError",
     "IAsyncClient",
     "ISyncClient",
+    "JSONLinesExporter",
     "MoviciLoginAuth",
     "MoviciTokenAuth",
     "Request",
+    "RequestHooks",
+    "RequestTrace",
     "Response",
+    "RetryPolicy",
+    "RetryStats",
+    "TokenBucket",
 ]
+
+
+def __getattr__(name):
+    if (module := _EXPORTS.get(name)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module}", __name__), name)
+
+
+def __dir__():
+    return [*globals(), *__all__]
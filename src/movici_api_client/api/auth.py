@@ -1,14 +1,29 @@
+from __future__ import annotations
+
+import threading
 import typing as t
 
 from .common import Auth, BaseClient
 from .requests import Login
 
+if t.TYPE_CHECKING:
+    from httpx import Response
+
 
 class MoviciTokenAuth(Auth):
+    """Authenticates requests with ``auth_token``. When the token is rejected, ``on_expired`` is
+    called to obtain a new token (or ``None`` if that is not possible). Requests that were
+    rejected concurrently share a single new token
+    """
+
     auth_token: t.Optional[str]
 
-    def __init__(self, auth_token):
+    def __init__(
+        self, auth_token, on_expired: t.Optional[t.Callable[[], t.Optional[str]]] = None
+    ) -> None:
         self.auth_token = auth_token
+        self.on_expired = on_expired
+        self.lock = threading.Lock()
 
     def __call__(self, config: dict) -> dict:
         if self.auth_token is None:
@@ -18,6 +33,18 @@ class MoviciTokenAuth(Auth):
         config["headers"]["Authorization"] = self.auth_token
         return config
 
+    def refresh(self, api: BaseClient, response: Response) -> bool:
+        if self.on_expired is None:
+            return False
+        with self.lock:
+            # The token may already have been replaced after another request was rejected
+            if response.request.headers.get("Authorization") != self.auth_token:
+                return self.auth_token is not None
+            if (auth_token := self.on_expired()) is None:
+                return False
+            self.auth_token = auth_token
+            return True
+
 
 class MoviciLoginAuth(MoviciTokenAuth):
     def __init__(self, username: str, password: str) -> None:
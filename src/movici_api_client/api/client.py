@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
+import json
 import logging
+import time
 import typing as t
-from asyncio import Semaphore
 
 import httpx
 from httpx import HTTPError, HTTPStatusError, Response, Timeout  # noqa
@@ -17,10 +19,17 @@ from .common import (
     ISyncClient,
     Service,
 )
+from .compression import Compression
+from .jsonstream import EnvelopeParser
+from .limiter import ConcurrencyLimiter, SlotGroup, TokenBucket
+from .pagination import DEFAULT_PAGE_SIZE, Page
+from .retry import RetryPolicy
+from .tracing import RequestHooks, RequestTracer
 
 T = t.TypeVar("T")
 
 DEFAULT_TIMEOUT_CONFIG = Timeout(timeout=5.0)
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
 
 
 class Client(BaseClient, ISyncClient):
@@ -32,26 +41,137 @@ class Client(BaseClient, ISyncClient):
         logger: t.Optional[logging.Logger] = None,
         on_error: t.Optional[ErrorCallback] = None,
         service_urls: t.Optional[t.Dict[Service, str]] = None,
+        timeout=DEFAULT_TIMEOUT_CONFIG,
+        http2=False,
+        limits: t.Optional[httpx.Limits] = None,
+        retry: t.Optional[RetryPolicy] = None,
+        rate_limits: t.Optional[t.Dict[Service, TokenBucket]] = None,
+        compression: t.Optional[Compression] = None,
+        hooks: t.Optional[RequestHooks] = None,
     ):
-        super().__init__(base_url, auth, logger, on_error, service_urls)
-        self.client = client or httpx.Client(timeout=DEFAULT_TIMEOUT_CONFIG)
+        super().__init__(
+            base_url, auth, logger, on_error, service_urls, retry, rate_limits, compression, hooks
+        )
+        self.http2 = http2
+        self.limits = limits
+        self.client = client or httpx.Client(timeout=timeout, **connection_options(http2, limits))
         self.timeout = self.client.timeout
 
     def request(
         self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None
     ) -> t.Optional[T]:
         self._assert_auth(req)
-        conf = self._prepare_request_config(req)
-        resp = self.client.request(**conf)
+        resp = self._send_request(req)
+        # A request that was rejected because its credentials expired is sent once more when new
+        # credentials could be obtained
+        if self._can_reauthenticate(req, resp) and self.auth.refresh(self, resp):
+            resp.close()
+            resp = self._send_request(req)
         self._handle_failure(resp, on_error)
         return req.make_response(resp)
 
+    def _send_request(self, req: BaseRequest[T]) -> Response:
+        conf = self._compress(self._prepare_request_config(req))
+        with self._trace(req, conf) as tracer:
+            resp = self._send(conf, req.service, tracer)
+            tracer.done(resp)
+        return resp
+
+    def _send(
+        self,
+        conf: dict,
+        service: t.Optional[Service] = None,
+        tracer: t.Optional[RequestTracer] = None,
+    ) -> Response:
+        tracer = tracer if tracer is not None else RequestTracer()
+        retry = self._start_retry(conf)
+        while True:
+            self._wait_for_rate_limit(service, tracer)
+            try:
+                resp = self._request(conf, tracer)
+            except httpx.TransportError as e:
+                if retry is None or (delay := retry.get_delay(exc=e)) is None:
+                    raise
+                tracer.retry(delay, exc=e)
+            else:
+                if retry is None or (delay := retry.get_delay(response=resp)) is None:
+                    return resp
+                tracer.retry(delay, response=resp)
+                resp.close()
+            time.sleep(delay)
+
+    def _request(self, conf: dict, tracer: RequestTracer) -> Response:
+        if not tracer.enabled:
+            return self.client.request(**conf)
+        # A streamed response tells when its first byte has been received
+        with self.client.stream(**conf) as resp:
+            tracer.first_byte(resp)
+            resp.read()
+        return resp
+
     @contextlib.contextmanager
     def stream(self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None):
-        conf = self._prepare_request_config(req)
-        with self.client.stream(**conf) as resp:
-            self._handle_failure(resp, on_error)
-            yield resp
+        conf = self._compress(self._prepare_request_config(req))
+        retry = self._start_retry(conf)
+        with self._trace(req, conf) as tracer:
+            while True:
+                # Only failures before the response is handed to the caller can be retried
+                yielded = False
+                self._wait_for_rate_limit(req.service, tracer)
+                try:
+                    with self.client.stream(**conf) as resp:
+                        tracer.first_byte(resp)
+                        if retry is None or (delay := retry.get_delay(response=resp)) is None:
+                            tracer.done(resp)
+                            self._handle_failure(resp, on_error)
+                            yielded = True
+                            yield resp
+                            return
+                        tracer.retry(delay, response=resp)
+                except httpx.TransportError as e:
+                    if yielded or retry is None or (delay := retry.get_delay(exc=e)) is None:
+                        raise
+                    tracer.retry(delay, exc=e)
+                time.sleep(delay)
+
+    def stream_items(
+        self, req: BaseRequest[t.List[T]], on_error: t.Optional[ErrorCallback] = None
+    ) -> t.Iterator[T]:
+        """Iterate over the items of a list response as they are received, so that the full
+        response does not need to be kept in memory. This requires that the request has an
+        ``envelope``. Yields nothing when the request failed and ``on_error`` suppressed the
+        error"""
+        if (envelope := req.envelope) is None:
+            yield from super().stream_items(req, on_error)
+            return
+        with self.stream(req, on_error) as resp:
+            if resp.status_code >= 400:
+                return
+            parser = EnvelopeParser(envelope)
+            for chunk in resp.iter_bytes():
+                yield from parser.feed(chunk)
+            yield from parser.close()
+
+    def iterate(
+        self,
+        req: BaseRequest[t.List[T]],
+        page_size: t.Optional[int] = None,
+        on_error: t.Optional[ErrorCallback] = None,
+    ) -> t.Iterator[T]:
+        """Lazily iterate over the items of a list response, requesting the next page only when
+        the items of the previous page have been consumed. See ``Page`` for the supported kinds
+        of pagination. Stops when a request failed and ``on_error`` suppressed the error"""
+        page = Page(req, page_size or DEFAULT_PAGE_SIZE)
+        while page is not None:
+            if (result := self.request(page, on_error)) is None:
+                return
+            page = result.next_page()
+            yield from result.items
+
+    def _wait_for_rate_limit(self, service: t.Optional[Service], tracer: RequestTracer):
+        if delay := self.resolve_rate_limit(service):
+            tracer.queued(delay)
+            time.sleep(delay)
 
 
 class AsyncClient(BaseClient, IAsyncClient):
@@ -67,36 +187,231 @@ class AsyncClient(BaseClient, IAsyncClient):
         service_urls: t.Optional[t.Dict[Service, str]] = None,
         max_concurrent=10,
         timeout=DEFAULT_TIMEOUT_CONFIG,
+        coalesce_requests=False,
+        http2=False,
+        limits: t.Optional[httpx.Limits] = None,
+        retry: t.Optional[RetryPolicy] = None,
+        limiter: t.Optional[ConcurrencyLimiter] = None,
+        rate_limits: t.Optional[t.Dict[Service, TokenBucket]] = None,
+        service_limiters: t.Optional[t.Dict[Service, ConcurrencyLimiter]] = None,
+        compression: t.Optional[Compression] = None,
+        hooks: t.Optional[RequestHooks] = None,
     ):
-        super().__init__(base_url, auth, logger, on_error, service_urls)
+        super().__init__(
+            base_url, auth, logger, on_error, service_urls, retry, rate_limits, compression, hooks
+        )
         self.client_factory = client_factory
         self.client = None
-        self.concurrent_requests = Semaphore(max_concurrent)
+        self.limiter = limiter if limiter is not None else ConcurrencyLimiter(max_concurrent)
+        # Concurrency caps per service, in addition to the overall limit
+        self.service_limiters = service_limiters if service_limiters is not None else {}
         self.enter_count = 0
         self.timeout = timeout
+        self.http2 = http2
+        self.limits = limits
+        # When coalescing, concurrent identical idempotent requests share a single call to the
+        # server. Every caller still handles the response (and any errors) individually
+        self.coalesce_requests = coalesce_requests
+        self.in_flight: t.Dict[str, asyncio.Future] = {}
 
     async def request(self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None):
-        async with self.concurrent_requests:
-            self._ensure_client()
-            self._assert_auth(req)
-            conf = self._prepare_request_config(req)
-            resp = await self.client.request(**conf)
+        self._ensure_client()
+        self._assert_auth(req)
+        resp = await self._send_request(req)
+        # Obtaining new credentials may block, eg. to ask the user to login again
+        if self._can_reauthenticate(
+            req, resp
+        ) and await asyncio.get_running_loop().run_in_executor(
+            None, self.auth.refresh, self, resp
+        ):
+            await resp.aclose()
+            resp = await self._send_request(req)
+
+        self._handle_failure(resp, on_error)
+        return req.make_response(resp)
+
+    async def _send_request(self, req: BaseRequest[T]) -> Response:
+        conf = await self._compress_async(self._prepare_request_config(req))
+        with self._trace(req, conf) as tracer:
+            if self.coalesce_requests and (key := coalesce_key(conf)) is not None:
+                resp = await self._send_coalesced(key, conf, req.service, tracer)
+            else:
+                resp = await self._send(conf, req.service, tracer)
+            tracer.done(resp)
+        return resp
+
+    async def _send(
+        self,
+        conf: dict,
+        service: t.Optional[Service] = None,
+        tracer: t.Optional[RequestTracer] = None,
+    ) -> Response:
+        tracer = tracer if tracer is not None else RequestTracer()
+        retry = self._start_retry(conf)
+        while True:
+            try:
+                async with self._acquire(service, tracer) as slot:
+                    resp = await self._request(conf, tracer)
+                    slot.record(resp)
+            except httpx.TransportError as e:
+                if retry is None or (delay := retry.get_delay(exc=e)) is None:
+                    raise
+                tracer.retry(delay, exc=e)
+            else:
+                if retry is None or (delay := retry.get_delay(response=resp)) is None:
+                    return resp
+                tracer.retry(delay, response=resp)
+                await resp.aclose()
+            await asyncio.sleep(delay)
+
+    async def _request(self, conf: dict, tracer: RequestTracer) -> Response:
+        if not tracer.enabled:
+            return await self.client.request(**conf)
+        # A streamed response tells when its first byte has been received
+        async with self.client.stream(**conf) as resp:
+            tracer.first_byte(resp)
+            await resp.aread()
+        return resp
 
-            self._handle_failure(resp, on_error)
-            return req.make_response(resp)
+    async def _send_coalesced(
+        self,
+        key: str,
+        conf: dict,
+        service: t.Optional[Service] = None,
+        tracer: t.Optional[RequestTracer] = None,
+    ) -> Response:
+        if (pending := self.in_flight.get(key)) is None:
+            pending = asyncio.ensure_future(self._send(conf, service, tracer))
+            self.in_flight[key] = pending
+
+            def done(fut: asyncio.Future):
+                self.in_flight.pop(key, None)
+                # prevent "exception was never retrieved" warnings when all callers are cancelled
+                if not fut.cancelled():
+                    fut.exception()
+
+            pending.add_done_callback(done)
+        elif tracer is not None:
+            tracer.coalesced()
+
+        # A cancelled caller must not cancel the request for the other callers
+        return await asyncio.shield(pending)
+
+    def stream(self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None):
+        return self._stream(req, on_error)
+
+    async def stream_items(
+        self, req: BaseRequest[t.List[T]], on_error: t.Optional[ErrorCallback] = None
+    ) -> t.AsyncIterator[T]:
+        """Iterate over the items of a list response as they are received, so that the full
+        response does not need to be kept in memory and the caller can start working on the
+        first items right away. This requires that the request has an ``envelope``. Yields
+        nothing when the request failed and ``on_error`` suppressed the error.
+
+        The response does not take up a place in the concurrency limits while its items are
+        consumed, so that the caller can send other requests for every item without waiting
+        for the list to finish"""
+        if (envelope := req.envelope) is None:
+            async for item in super().stream_items(req, on_error):
+                yield item
+            return
+        async with self._stream(req, on_error, release_slot=True) as resp:
+            if resp.status_code >= 400:
+                return
+            parser = EnvelopeParser(envelope)
+            async for chunk in resp.aiter_bytes():
+                for item in parser.feed(chunk):
+                    yield item
+            for item in parser.close():
+                yield item
+
+    async def iterate(
+        self,
+        req: BaseRequest[t.List[T]],
+        page_size: t.Optional[int] = None,
+        on_error: t.Optional[ErrorCallback] = None,
+    ) -> t.AsyncIterator[T]:
+        """Lazily iterate over the items of a list response. The next page is requested while
+        the items of the current page are being consumed. See ``Page`` for the supported kinds of
+        pagination. Stops when a request failed and ``on_error`` suppressed the error"""
+        pending = asyncio.ensure_future(
+            self.request(Page(req, page_size or DEFAULT_PAGE_SIZE), on_error)
+        )
+        try:
+            while pending is not None:
+                result, pending = await pending, None
+                if result is None:
+                    return
+                if (page := result.next_page()) is not None:
+                    pending = asyncio.ensure_future(self.request(page, on_error))
+                for item in result.items:
+                    yield item
+        finally:
+            if pending is not None:
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
 
     @contextlib.asynccontextmanager
-    async def stream(self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None):
-        async with self.concurrent_requests:
-            self._ensure_client()
-            conf = self._prepare_request_config(req)
-            async with self.client.stream(**conf) as resp:
-                self._handle_failure(resp, on_error)
-                yield resp
+    async def _stream(
+        self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None, release_slot=False
+    ):
+        self._ensure_client()
+        conf = await self._compress_async(self._prepare_request_config(req))
+        retry = self._start_retry(conf)
+        with self._trace(req, conf) as tracer:
+            while True:
+                # Only failures before the response is handed to the caller can be retried
+                yielded = False
+                try:
+                    async with self._acquire(req.service, tracer) as slot:
+                        async with self.client.stream(**conf) as resp:
+                            slot.record(resp)
+                            tracer.first_byte(resp)
+                            if retry is None or (delay := retry.get_delay(response=resp)) is None:
+                                tracer.done(resp)
+                                self._handle_failure(resp, on_error)
+                                if release_slot:
+                                    slot.release()
+                                yielded = True
+                                yield resp
+                                return
+                            tracer.retry(delay, response=resp)
+                except httpx.TransportError as e:
+                    if yielded or retry is None or (delay := retry.get_delay(exc=e)) is None:
+                        raise
+                    tracer.retry(delay, exc=e)
+                await asyncio.sleep(delay)
+
+    async def _compress_async(self, conf: dict) -> dict:
+        """Compress a large body in a thread, so that it does not block the event loop"""
+        if self.compression is None or not self.compression.should_compress(conf):
+            return self._compress(conf)
+        return await asyncio.get_running_loop().run_in_executor(None, self._compress, conf)
+
+    @contextlib.asynccontextmanager
+    async def _acquire(
+        self, service: t.Optional[Service], tracer: t.Optional[RequestTracer] = None
+    ) -> t.AsyncIterator[SlotGroup]:
+        """Wait until a request to ``service`` is allowed by the service's concurrency cap, the
+        service's rate limit and the overall concurrency limit, in that order. Waiting for the
+        service first prevents requests to a busy service from occupying the overall limit"""
+        started = time.perf_counter()
+        async with contextlib.AsyncExitStack() as stack:
+            slots = []
+            if (service_limiter := self.service_limiters.get(service)) is not None:
+                slots.append(await stack.enter_async_context(service_limiter.acquire()))
+            if delay := self.resolve_rate_limit(service):
+                await asyncio.sleep(delay)
+            slots.append(await stack.enter_async_context(self.limiter.acquire()))
+            if tracer is not None:
+                tracer.queued(time.perf_counter() - started)
+            yield SlotGroup(slots)
 
     def _ensure_client(self):
         if self.client is None:
-            self.client = self.client_factory(timeout=self.timeout)
+            self.client = self.client_factory(
+                timeout=self.timeout, **connection_options(self.http2, self.limits)
+            )
         return self.client
 
     async def close(self):
@@ -105,10 +420,12 @@ class AsyncClient(BaseClient, IAsyncClient):
 
         await self.client.aclose()
         self.client = None
+        if self.hooks is not None:
+            # Hooks may wait for exported traces to be written
+            await asyncio.get_running_loop().run_in_executor(None, self.hooks.close)
 
     async def __aenter__(self):
-        if self.client is None:
-            self.client = self.client_factory()
+        self._ensure_client()
         self.enter_count += 1
         return self
 
@@ -118,7 +435,16 @@ class AsyncClient(BaseClient, IAsyncClient):
             await self.close()
 
     @classmethod
-    def from_sync_client(cls, client: Client):
+    def from_sync_client(
+        cls,
+        client: Client,
+        coalesce_requests=False,
+        max_concurrent=10,
+        limiter: t.Optional[ConcurrencyLimiter] = None,
+        service_limiters: t.Optional[t.Dict[Service, ConcurrencyLimiter]] = None,
+    ):
+        """Create an ``AsyncClient`` with the same settings as ``client``. The clients share
+        their rate limits, since they send requests to the same server"""
         return AsyncClient(
             base_url=client.base_url,
             auth=client.auth,
@@ -126,4 +452,38 @@ class AsyncClient(BaseClient, IAsyncClient):
             on_error=client.on_error,
             service_urls=client.service_urls,
             timeout=client.timeout,
+            coalesce_requests=coalesce_requests,
+            http2=client.http2,
+            limits=client.limits,
+            max_concurrent=max_concurrent,
+            retry=client.retry,
+            limiter=limiter,
+            rate_limits=client.rate_limits,
+            service_limiters=service_limiters,
+            compression=client.compression,
+            hooks=client.hooks,
         )
+
+
+def connection_options(http2=False, limits: t.Optional[httpx.Limits] = None):
+    """Keyword arguments for creating an ``httpx`` client. Only non-default options are given,
+    so that a custom ``client_factory`` does not need to support them"""
+    rv = {}
+    if http2:
+        rv["http2"] = True
+    if limits is not None:
+        rv["limits"] = limits
+    return rv
+
+
+def coalesce_key(conf: dict) -> t.Optional[str]:
+    """Return a key that identifies a request config, or ``None`` if the request may not be
+    coalesced because it is not idempotent or has a body"""
+    if conf.get("method", "").upper() not in SAFE_METHODS:
+        return None
+    if any(conf.get(key) is not None for key in ("content", "data", "files", "json")):
+        return None
+    try:
+        return json.dumps(conf, sort_keys=True)
+    except TypeError:
+        return None
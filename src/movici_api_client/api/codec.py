@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import json
+import typing as t
+
+# JSON is encoded and decoded using ``orjson`` when it is installed, which is several times faster
+# than the standard library. Both raise a ``json.JSONDecodeError`` on invalid JSON
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(data: t.Union[bytes, str]) -> t.Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: t.Any, pretty=False) -> bytes:
+    """Encode ``obj`` as UTF-8 JSON. A ``pretty`` document is indented by two spaces"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def encode_json_body(conf: dict) -> dict:
+    """Replace the ``json`` payload of a request config by its encoded ``content``, which is
+    faster than letting ``httpx`` encode it"""
+    if (payload := conf.get("json")) is None:
+        return conf
+    return {
+        **{k: v for k, v in conf.items() if k != "json"},
+        "content": dumps(payload),
+        "headers": {**conf.get("headers", {}), "Content-Type": "application/json"},
+    }
@@ -2,12 +2,21 @@ from __future__ import annotations
 
 import enum
 import functools
+import hashlib
 import logging
 import typing as t
 from functools import reduce
 from urllib.parse import urljoin as urljoin_
 
-from httpx import Response
+from . import codec
+
+if t.TYPE_CHECKING:
+    from httpx import Response
+
+    from .compression import Compression
+    from .limiter import TokenBucket
+    from .retry import RetryPolicy, RetryState
+    from .tracing import RequestHooks, RequestTracer
 
 
 class MoviciServiceUnavailable(Exception):
@@ -35,8 +44,13 @@ class Auth:
     def __call__(self, config: dict) -> dict:
         raise NotImplementedError
 
+    def refresh(self, api: BaseClient, response: Response) -> bool:
+        """Called when an authenticated request was rejected with a 401 response. Returns whether
+        new credentials were obtained, in which case the request is sent once more"""
+        return False
+
 
-ErrorCallback = t.Callable[[Response], bool]
+ErrorCallback = t.Callable[["Response"], bool]
 
 
 def parse_service_urls(bases_dict=None, prefix=""):
@@ -67,6 +81,23 @@ class ISyncClient:
     def stream(self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None):
         raise NotImplementedError
 
+    def stream_items(
+        self, req: BaseRequest[t.List[T]], on_error: t.Optional[ErrorCallback] = None
+    ) -> t.Iterator[T]:
+        """Iterate over the items of a list response. Clients that support it yield the items
+        while the response is still being received"""
+        yield from self.request(req, on_error) or ()
+
+    def iterate(
+        self,
+        req: BaseRequest[t.List[T]],
+        page_size: t.Optional[int] = None,
+        on_error: t.Optional[ErrorCallback] = None,
+    ) -> t.Iterator[T]:
+        """Iterate over the items of a list response. Clients that support it request the list
+        in pages of ``page_size`` items"""
+        yield from self.request(req, on_error) or ()
+
 
 class IAsyncClient:
     async def request(
@@ -77,6 +108,25 @@ class IAsyncClient:
     async def stream(self, req: BaseRequest[T], on_error: t.Optional[ErrorCallback] = None):
         raise NotImplementedError
 
+    async def stream_items(
+        self, req: BaseRequest[t.List[T]], on_error: t.Optional[ErrorCallback] = None
+    ) -> t.AsyncIterator[T]:
+        """Iterate over the items of a list response. Clients that support it yield the items
+        while the response is still being received"""
+        for item in await self.request(req, on_error) or ():
+            yield item
+
+    async def iterate(
+        self,
+        req: BaseRequest[t.List[T]],
+        page_size: t.Optional[int] = None,
+        on_error: t.Optional[ErrorCallback] = None,
+    ) -> t.AsyncIterator[T]:
+        """Iterate over the items of a list response. Clients that support it request the list
+        in pages of ``page_size`` items"""
+        for item in await self.request(req, on_error) or ():
+            yield item
+
 
 class BaseClient:
     auth: t.Optional[Auth]
@@ -88,12 +138,35 @@ class BaseClient:
         logger: t.Optional[logging.Logger] = None,
         on_error: t.Optional[ErrorCallback] = None,
         service_urls: t.Optional[t.Dict[Service, str]] = None,
+        retry: t.Optional[RetryPolicy] = None,
+        rate_limits: t.Optional[t.Dict[Service, TokenBucket]] = None,
+        compression: t.Optional[Compression] = None,
+        hooks: t.Optional[RequestHooks] = None,
     ):
         self.base_url = base_url
         self.auth = auth
         self.logger = logger
         self.on_error = on_error
         self.service_urls = service_urls if service_urls is not None else parse_service_urls()
+        self.retry = retry
+        self.rate_limits = rate_limits if rate_limits is not None else {}
+        self.compression = compression
+        self.hooks = hooks
+
+    def _start_retry(self, conf: dict) -> t.Optional[RetryState]:
+        if self.retry is None:
+            return None
+        return self.retry.start(conf)
+
+    def _trace(self, req: BaseRequest[T], conf: dict) -> RequestTracer:
+        # Like everything that depends on ``httpx``, the tracer is only imported by the clients,
+        # so that the requests can be used without importing ``httpx``
+        from .tracing import RequestTracer
+
+        return RequestTracer(self.hooks, req, conf)
+
+    def _can_reauthenticate(self, req: BaseRequest[T], resp: Response) -> bool:
+        return resp.status_code == 401 and bool(req.auth) and bool(self.auth)
 
     def _handle_failure(self, resp: Response, on_error: t.Optional[ErrorCallback] = None):
         if resp.status_code >= 400:
@@ -120,6 +193,18 @@ class BaseClient:
                 raise MoviciServiceUnavailable()
         return urljoin(self.base_url, service_url)
 
+    def resolve_rate_limit(self, service: t.Optional[Service]) -> float:
+        """Reserve a request to ``service`` and return the number of seconds to wait before it
+        may be sent"""
+        if (bucket := self.rate_limits.get(service)) is None:
+            return 0.0
+        return bucket.reserve()
+
+    def _compress(self, conf: dict) -> dict:
+        if self.compression is None:
+            return conf
+        return self.compression.apply(conf)
+
     def _assert_auth(self, request: BaseRequest[T]):
         if request.auth:
             if self.auth is None:
@@ -132,8 +217,11 @@ class BaseClient:
 
         if self.auth:
             conf = self.auth(conf)
-        if self.logger:
-            self.logger.debug(str(conf))
+        conf = codec.encode_json_body(conf)
+        # Request configs can hold large payloads, so they are only summarized when the log
+        # record is actually emitted
+        if self.logger and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("request %s", RequestSummary(conf))
         return conf
 
 
@@ -142,6 +230,12 @@ T = t.TypeVar("T")
 
 class BaseRequest(t.Generic[T]):
     auth = False
+    service: t.Optional[Service] = None
+    # The field of a JSON object response that holds the (list) result, see ``unwrap_envelope``
+    envelope: t.Optional[str] = None
+    # Whether the service pages the (list) result when given ``limit`` and ``offset`` or
+    # ``cursor`` query parameters, see ``Page``
+    paginated = False
 
     def generate_config(self, api: BaseClient):
         return self.make_request()
@@ -150,12 +244,16 @@ class BaseRequest(t.Generic[T]):
         raise NotImplementedError
 
     def make_response(self, resp: Response) -> T:
-        return resp.json()
+        return self.parse_response(codec.loads(resp.content))
+
+    def parse_response(self, body: t.Any) -> T:
+        """Turns the decoded JSON body of the response into the result. ``Page`` uses this to
+        transform every page of a paginated request without decoding the body twice"""
+        return body
 
 
 class Request(BaseRequest):
     auth = True
-    service: t.Optional[Service] = None
 
     def generate_config(self, api: BaseClient):
         request = self.make_request()
@@ -166,6 +264,49 @@ class Request(BaseRequest):
         }
 
 
+class RequestWithHeaders(BaseRequest[T]):
+    """Wraps a request to send additional headers, without changing the request itself"""
+
+    def __init__(self, request: BaseRequest[T], headers: t.Dict[str, str]):
+        self.request = request
+        self.headers = headers
+
+    @property
+    def auth(self):
+        return self.request.auth
+
+    @property
+    def service(self):
+        return self.request.service
+
+    @property
+    def envelope(self):
+        return self.request.envelope
+
+    @property
+    def paginated(self):
+        return self.request.paginated
+
+    def generate_config(self, api: BaseClient):
+        config = self.request.generate_config(api)
+        return {**config, "headers": {**config.get("headers", {}), **self.headers}}
+
+    def make_response(self, resp: Response) -> T:
+        return self.request.make_response(resp)
+
+    def parse_response(self, body: t.Any) -> T:
+        return self.request.parse_response(body)
+
+    def __eq__(self, other):
+        if not isinstance(other, RequestWithHeaders):
+            return NotImplemented
+        return self.request == other.request and self.headers == other.headers
+
+
+def with_headers(request: BaseRequest[T], headers: t.Dict[str, str]) -> BaseRequest[T]:
+    return RequestWithHeaders(request, headers)
+
+
 def simple_request(func):
     @functools.wraps(func)
     def wrapped(*args, **kwargs):
@@ -176,18 +317,53 @@ def simple_request(func):
 
 def unwrap_envelope(envelope):
     def decorator(cls: Request):
-        original = cls.make_response
+        original = cls.parse_response
 
-        def make_response(self, resp: Response):
-            result = original(self, resp)
-            return result[envelope]
+        def parse_response(self, body: t.Any):
+            return original(self, body)[envelope]
 
-        cls.make_response = make_response
+        cls.parse_response = parse_response
+        cls.envelope = envelope
         return cls
 
     return decorator
 
 
+class RequestSummary:
+    """Formats a request config for logging. Sensitive headers are redacted and bodies are
+    summarized by their size and hash"""
+
+    def __init__(self, conf: dict):
+        self.conf = conf
+
+    def __str__(self):
+        conf = self.conf
+        parts = [str(conf.get("method", "GET")).upper(), str(conf.get("url", ""))]
+        if params := conf.get("params"):
+            parts.append(f"params={params!r}")
+        if headers := conf.get("headers"):
+            parts.append(f"headers={redact_headers(headers)!r}")
+        for key in ("content", "json", "data", "files"):
+            if (body := conf.get(key)) is not None:
+                parts.append(f"{key}={summarize_body(body)}")
+        return " ".join(parts)
+
+
+REDACTED_HEADERS = frozenset({"authorization", "cookie", "proxy-authorization"})
+
+
+def redact_headers(headers: t.Mapping[str, str]) -> t.Dict[str, str]:
+    return {k: "<redacted>" if k.lower() in REDACTED_HEADERS else v for k, v in headers.items()}
+
+
+def summarize_body(body) -> str:
+    if isinstance(body, str):
+        body = body.encode()
+    if isinstance(body, (bytes, bytearray)):
+        return f"<{len(body)} bytes, sha256 {hashlib.sha256(body).hexdigest()[:12]}>"
+    return f"<{type(body).__name__}>"
+
+
 def urljoin(*parts):
     return reduce(urljoin_, (str(part) + "/" for part in parts))
 
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import typing as t
+import zlib
+
+import httpx
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+DEFAULT_MIN_SIZE = 1024
+DECODING_ERRORS = (zlib.error, zstandard.ZstdError) if zstandard is not None else (zlib.error,)
+
+
+def supported_codecs() -> t.List[str]:
+    """The content codings that can be used for compression and decompression, in order of
+    preference"""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def accept_encoding() -> str:
+    return ", ".join(supported_codecs())
+
+
+class Compression:
+    """Compresses request bodies using ``codec`` (``gzip`` or ``zstd``) at ``level``. Raw
+    ``content``, which includes JSON payloads once they are encoded by the client, is compressed
+    up front, multipart uploads are compressed while streaming. Bodies smaller than ``min_size``
+    are sent uncompressed, since compressing them costs more than it saves. The server must
+    support the ``Content-Encoding`` of the request
+    """
+
+    def __init__(
+        self, codec="gzip", level: t.Optional[int] = None, min_size=DEFAULT_MIN_SIZE
+    ) -> None:
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        if codec not in ("gzip", "zstd"):
+            raise ValueError(f"unsupported compression codec: {codec}")
+        if codec == "gzip" and level is not None and not -1 <= level <= 9:
+            raise ValueError("gzip compression level must be between -1 and 9")
+        self.codec = codec
+        self.level = level
+        self.min_size = min_size
+
+    def compressobj(self):
+        """Return an object with ``compress(data)`` and ``flush()`` methods that compresses a
+        stream"""
+        if self.codec == "zstd":
+            level = self.level if self.level is not None else 3
+            return zstandard.ZstdCompressor(level=level).compressobj()
+        level = self.level if self.level is not None else 6
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self.compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+    def should_compress(self, conf: dict):
+        """Whether ``conf`` has a body that ``apply`` will compress. Only compressing a raw body
+        is expensive"""
+        content = conf.get("content")
+        return isinstance(content, bytes) and len(content) >= self.min_size
+
+    def apply(self, conf: dict) -> dict:
+        """Return a request config with a compressed body, if ``conf`` has a body that is worth
+        compressing. This may take a while for large bodies"""
+        headers = {**conf.get("headers", {})}
+        content = conf.get("content")
+        if hasattr(content, "compress_with"):
+            # The length of a compressed stream is unknown up front
+            headers.pop("Content-Length", None)
+            content = content.compress_with(self)
+        elif isinstance(content, bytes) and len(content) >= self.min_size:
+            content = self.compress(content)
+        else:
+            return conf
+        headers["Content-Encoding"] = self.codec
+        return {**conf, "content": content, "headers": headers}
+
+
+class VerifyingDecoder:
+    """Decodes a response body with a given ``Content-Encoding``. Unlike the ``httpx`` decoders,
+    ``flush`` raises a ``httpx.DecodingError`` if the compressed stream is incomplete
+    """
+
+    def __init__(self, encoding: t.Optional[str]) -> None:
+        self.encoding = (encoding or "identity").strip().lower()
+        if self.encoding == "gzip":
+            self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "deflate":
+            self.decoder = zlib.decompressobj()
+        elif self.encoding == "zstd" and zstandard is not None:
+            self.decoder = zstandard.ZstdDecompressor().decompressobj()
+        elif self.encoding == "identity":
+            self.decoder = None
+        else:
+            raise httpx.DecodingError(f"Unsupported content encoding: {self.encoding}")
+
+    @property
+    def compressed(self):
+        return self.decoder is not None
+
+    def decode(self, data: bytes) -> bytes:
+        if self.decoder is None:
+            return data
+        try:
+            return self.decoder.decompress(data)
+        except DECODING_ERRORS as e:
+            raise httpx.DecodingError(str(e)) from e
+
+    def flush(self) -> bytes:
+        if self.decoder is None:
+            return b""
+        if not self.decoder.eof:
+            raise httpx.DecodingError("Incomplete compressed response body")
+        return self.decoder.flush()
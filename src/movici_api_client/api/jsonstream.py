@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import codecs
+import enum
+import json
+import re
+import typing as t
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _State(enum.Enum):
+    START = enum.auto()
+    KEY = enum.auto()
+    COLON = enum.auto()
+    VALUE = enum.auto()
+    AFTER_VALUE = enum.auto()
+    ITEMS_START = enum.auto()
+    ITEM = enum.auto()
+    AFTER_ITEM = enum.auto()
+    DONE = enum.auto()
+
+
+class _Incomplete(Exception):
+    pass
+
+
+class EnvelopeParser:
+    """Incrementally parses the items of the list in the ``envelope`` field of a JSON object, eg.
+    the updates in ``{"updates": [...]}``. Data is given to ``feed`` as it arrives, which returns
+    the items that are complete. Only a single item (and any other fields of the object) needs to
+    be kept in memory. ``close`` must be called after the last data, and raises a ``ValueError``
+    when the JSON is invalid or incomplete, or a ``KeyError`` when the envelope is missing
+    """
+
+    def __init__(self, envelope: str) -> None:
+        self.envelope = envelope
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.state = _State.START
+        self.key: t.Optional[str] = None
+        self.found = False
+
+    def feed(self, data: bytes) -> t.List[t.Any]:
+        self.buffer = self.buffer[self.pos :] + self.text_decoder.decode(data)
+        self.pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> t.List[t.Any]:
+        self.buffer = self.buffer[self.pos :] + self.text_decoder.decode(b"", final=True)
+        self.pos = 0
+        items = self._parse(final=True)
+        if self.state is not _State.DONE or self.buffer[self.pos :].strip():
+            raise ValueError("Invalid or incomplete JSON")
+        if not self.found:
+            raise KeyError(self.envelope)
+        return items
+
+    def _parse(self, final: bool) -> t.List[t.Any]:
+        items = []
+        try:
+            while self.state is not _State.DONE:
+                if (item := self._step(final)) is not _NO_ITEM:
+                    items.append(item)
+        except _Incomplete:
+            if final:
+                raise ValueError("Invalid or incomplete JSON")
+        return items
+
+    def _step(self, final: bool):
+        state = self.state
+        if state is _State.START:
+            self._expect("{")
+            self.state = _State.KEY
+        elif state is _State.KEY:
+            if self._peek() == "}":
+                self._advance(_State.DONE)
+            else:
+                self.key = self._decode(final)
+                if not isinstance(self.key, str):
+                    raise ValueError("Invalid JSON: expected a key")
+                self.state = _State.COLON
+        elif state is _State.COLON:
+            self._expect(":")
+            self.state = _State.VALUE
+        elif state is _State.VALUE:
+            if self.key == self.envelope and self._peek() == "[":
+                self.found = True
+                self._advance(_State.ITEMS_START)
+            else:
+                self._decode(final)
+                self.state = _State.AFTER_VALUE
+        elif state is _State.AFTER_VALUE:
+            char = self._peek()
+            if char not in (",", "}"):
+                raise ValueError(f"Invalid JSON: unexpected {char!r}")
+            self._advance(_State.KEY if char == "," else _State.DONE)
+        elif state is _State.ITEMS_START:
+            if self._peek() == "]":
+                self._advance(_State.AFTER_VALUE)
+            else:
+                self.state = _State.ITEM
+        elif state is _State.ITEM:
+            item = self._decode(final)
+            self.state = _State.AFTER_ITEM
+            return item
+        elif state is _State.AFTER_ITEM:
+            char = self._peek()
+            if char not in (",", "]"):
+                raise ValueError(f"Invalid JSON: unexpected {char!r}")
+            self._advance(_State.ITEM if char == "," else _State.AFTER_VALUE)
+        return _NO_ITEM
+
+    def _peek(self) -> str:
+        self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+        if self.pos >= len(self.buffer):
+            raise _Incomplete()
+        return self.buffer[self.pos]
+
+    def _advance(self, state: _State):
+        self.pos += 1
+        self.state = state
+
+    def _expect(self, char: str):
+        if (found := self._peek()) != char:
+            raise ValueError(f"Invalid JSON: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def _decode(self, final: bool):
+        self._peek()
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            # Most likely the value has not been received completely
+            raise _Incomplete()
+        # A number (or literal) at the end of the buffer may continue in the next data
+        if end == len(self.buffer) and not final:
+            raise _Incomplete()
+        self.pos = end
+        return value
+
+
+_NO_ITEM = object()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import time
+import typing as t
+
+import httpx
+
+# Responses that indicate the server (or a gateway in front of it) is overloaded
+OVERLOAD_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+class Slot:
+    """Represents a single request that is allowed to run by a ``ConcurrencyLimiter``. Once the
+    response is received, it should be passed to ``record`` so that the limiter can learn from
+    it. A slot that was not recorded is considered a neutral outcome, unless the request failed
+    with a timeout
+    """
+
+    def __init__(
+        self, epoch: int, on_release: t.Optional[t.Callable[[Slot], None]] = None
+    ) -> None:
+        self.epoch = epoch
+        self.start = time.monotonic()
+        self.latency: t.Optional[float] = None
+        self.overloaded = False
+        self.succeeded = False
+        self.on_release = on_release
+        self.released = False
+
+    def record(self, response: httpx.Response):
+        self.latency = time.monotonic() - self.start
+        self.overloaded = response.status_code in OVERLOAD_STATUS_CODES
+        self.succeeded = response.status_code < 500
+
+    def release(self):
+        """Give up the slot before the request is finished, eg. while a response body is
+        consumed at the pace of the caller. Releasing more than once has no effect"""
+        if self.released:
+            return
+        self.released = True
+        if self.on_release is not None:
+            self.on_release(self)
+
+
+class SlotGroup:
+    """The slots of a request that is limited by more than one ``ConcurrencyLimiter``"""
+
+    def __init__(self, slots: t.Sequence[Slot]) -> None:
+        self.slots = slots
+
+    def record(self, response: httpx.Response):
+        for slot in self.slots:
+            slot.record(response)
+
+    def release(self):
+        for slot in self.slots:
+            slot.release()
+
+
+class ConcurrencyLimiter:
+    """Limits the number of concurrent requests to a fixed ``limit``"""
+
+    def __init__(self, limit: int = 10) -> None:
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self._limit = limit
+        self.in_flight = 0
+        self.epoch = 0
+        self._waiters: t.Deque[asyncio.Future] = collections.deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> t.AsyncIterator[Slot]:
+        await self._wait()
+        self.in_flight += 1
+        slot = Slot(self.epoch, on_release=self._release)
+        try:
+            yield slot
+        except httpx.TimeoutException:
+            slot.overloaded = True
+            raise
+        finally:
+            slot.release()
+
+    def _release(self, slot: Slot):
+        self.in_flight -= 1
+        self.update(slot)
+        self._wake_up()
+
+    async def _wait(self):
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # pass on a wake up call that this waiter can no longer use
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_up()
+                raise
+            finally:
+                with contextlib.suppress(ValueError):
+                    self._waiters.remove(waiter)
+
+    def _wake_up(self):
+        available = self.limit - self.in_flight
+        while available > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    def update(self, slot: Slot):
+        pass
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """Adapts the concurrency limit to the capacity of the server using Additive Increase,
+    Multiplicative Decrease (AIMD). Every successful response with a latency close to the lowest
+    observed latency increases the limit by ``increase / limit``, so that the limit grows by
+    roughly ``increase`` for every ``limit`` requests. Server errors never increase the limit.
+    Timeouts and 429, 502, 503 or 504 responses multiply the limit by ``decrease_factor``. Only
+    the first overloaded response of requests that were started with the same limit decreases
+    the limit, so that a burst of failures does not collapse it. The limit always stays between
+    ``min_limit`` and ``max_limit``
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        baseline_drift: float = 0.01,
+    ) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("limits must satisfy 1 <= min_limit <= max_limit")
+        super().__init__(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.baseline_drift = baseline_drift
+        self.min_latency: t.Optional[float] = None
+
+    def update(self, slot: Slot):
+        if slot.overloaded:
+            if slot.epoch == self.epoch:
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self.epoch += 1
+            return
+        # A fast server error says nothing about the capacity of the server
+        if slot.latency is None or not slot.succeeded:
+            return
+        # The baseline slowly drifts upwards so that it can follow a permanent change in latency
+        if self.min_latency is None:
+            self.min_latency = slot.latency
+        self.min_latency = min(slot.latency, self.min_latency * (1 + self.baseline_drift))
+        if slot.latency <= self.min_latency * self.latency_tolerance:
+            self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+
+
+class TokenBucket:
+    """Limits the rate of requests to ``rate`` requests per second on average, while allowing
+    bursts of up to ``burst`` requests. Tokens are reserved ahead of time, so that callers that
+    need to wait are served in order. A reserved token is not returned when the caller does not
+    use it (eg. because it is cancelled)
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def reserve(self) -> float:
+        """Take a token and return the number of seconds to wait before it may be used"""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import copy
+import io
+import mimetypes
+import os
+import pathlib
+import secrets
+import typing as t
+
+if t.TYPE_CHECKING:
+    from .compression import Compression
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+FileSource = t.Union[str, pathlib.Path, t.IO[bytes]]
+ProgressCallback = t.Callable[[int], None]
+
+
+class FilePart:
+    """A single file in a multipart body. A file object is read from its current position, a
+    path is only opened while its content is being sent"""
+
+    def __init__(self, name: str, source: FileSource) -> None:
+        self.name = name
+        self.source = source
+        if isinstance(source, (str, pathlib.Path)):
+            self.filename = pathlib.Path(source).name
+            self.start = 0
+            self.size = os.stat(source).st_size
+        else:
+            self.filename = pathlib.Path(getattr(source, "name", "upload")).name
+            self.start = source.tell()
+            self.size = source.seek(0, io.SEEK_END) - self.start
+            source.seek(self.start)
+
+    def header(self, boundary: str) -> bytes:
+        content_type = mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+        return (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{self.name}"; filename="{self.filename}"\r\n'
+            f"Content-Type: {content_type}\r\n"
+            "\r\n"
+        ).encode()
+
+    @contextlib.contextmanager
+    def open(self):
+        if isinstance(self.source, (str, pathlib.Path)):
+            with open(self.source, "rb") as fobj:
+                yield fobj
+        else:
+            self.source.seek(self.start)
+            yield self.source
+
+
+class BaseMultipartStream:
+    """A ``multipart/form-data`` request body that is streamed from files in chunks of
+    ``chunk_size``. Its ``Content-Length`` is known up front without reading the files, unless
+    the body is compressed using ``compress_with``. ``on_progress`` is called with the number of
+    bytes of file content after every chunk.
+
+    Use as the ``content`` of a request together with its ``headers``. Every iteration sends the
+    full body again, so a request with this body can be retried without rewinding it. Progress is
+    only reported for content beyond what an earlier iteration already sent, so that the reported
+    total does not exceed the size of the files
+    """
+
+    rewindable = True
+
+    def __init__(
+        self,
+        files: t.Dict[str, FileSource],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        on_progress: t.Optional[ProgressCallback] = None,
+        boundary: t.Optional[str] = None,
+    ) -> None:
+        self.parts = [FilePart(name, source) for name, source in files.items()]
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.boundary = boundary or secrets.token_hex(16)
+        self.compression: t.Optional[Compression] = None
+        self.reported = 0
+
+    @property
+    def headers(self):
+        rv = {"Content-Type": f"multipart/form-data; boundary={self.boundary}"}
+        if self.content_length is not None:
+            rv["Content-Length"] = str(self.content_length)
+        return rv
+
+    @property
+    def content_length(self) -> t.Optional[int]:
+        if self.compression is not None:
+            return None
+        return sum(len(part.header(self.boundary)) + part.size + 2 for part in self.parts) + len(
+            self.footer
+        )
+
+    @property
+    def footer(self):
+        return f"--{self.boundary}--\r\n".encode()
+
+    def compress_with(self, compression: Compression):
+        """Return a copy of this body that is compressed while it is being sent"""
+        rv = copy.copy(self)
+        rv.compression = compression
+        return rv
+
+    def _read(self, fobj: t.IO[bytes], size: int, compressor) -> t.Tuple[int, bytes]:
+        chunk = fobj.read(size)
+        return len(chunk), self._encode(compressor, chunk)
+
+    @staticmethod
+    def _encode(compressor, data: bytes, flush=False):
+        if compressor is None:
+            return data
+        rv = compressor.compress(data)
+        return rv + compressor.flush() if flush else rv
+
+    def _check_chunk(self, num_bytes: int, part: FilePart, sent: int) -> int:
+        """Returns the number of bytes of file content that is sent after this chunk"""
+        if not num_bytes:
+            raise ValueError(f"File '{part.filename}' changed while uploading")
+        sent += num_bytes
+        if self.on_progress is not None and sent > self.reported:
+            self.on_progress(sent - self.reported)
+            self.reported = sent
+        return sent
+
+    def _compressor(self):
+        return self.compression.compressobj() if self.compression is not None else None
+
+
+class MultipartStream(BaseMultipartStream):
+    """A multipart body for a synchronous ``httpx.Client``"""
+
+    def __iter__(self) -> t.Iterator[bytes]:
+        compressor = self._compressor()
+        sent = 0
+        for part in self.parts:
+            yield self._encode(compressor, part.header(self.boundary))
+            with part.open() as fobj:
+                remaining = part.size
+                while remaining > 0:
+                    num_bytes, chunk = self._read(
+                        fobj, min(self.chunk_size, remaining), compressor
+                    )
+                    sent = self._check_chunk(num_bytes, part, sent)
+                    remaining -= num_bytes
+                    yield chunk
+            yield self._encode(compressor, b"\r\n")
+        yield self._encode(compressor, self.footer, flush=True)
+
+
+class AsyncMultipartStream(BaseMultipartStream):
+    """A multipart body for an ``httpx.AsyncClient``. The files are read (and compressed) in a
+    thread, so that concurrent uploads do not block the event loop or each other"""
+
+    async def __aiter__(self) -> t.AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        compressor = self._compressor()
+        sent = 0
+        for part in self.parts:
+            yield self._encode(compressor, part.header(self.boundary))
+            with part.open() as fobj:
+                remaining = part.size
+                while remaining > 0:
+                    num_bytes, chunk = await loop.run_in_executor(
+                        None, self._read, fobj, min(self.chunk_size, remaining), compressor
+                    )
+                    sent = self._check_chunk(num_bytes, part, sent)
+                    remaining -= num_bytes
+                    yield chunk
+            yield self._encode(compressor, b"\r\n")
+        yield self._encode(compressor, self.footer, flush=True)
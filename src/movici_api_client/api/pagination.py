@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import typing as t
+
+from . import codec
+from .common import BaseClient, BaseRequest
+
+if t.TYPE_CHECKING:
+    from httpx import Response
+
+T = t.TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class Page(BaseRequest["PageResult[T]"]):
+    """Requests a single page of the list returned by ``request``, using ``limit`` and either
+    ``offset`` or ``cursor`` query parameters. Only requests that are marked as ``paginated`` are
+    paged. The body of every page is decoded once, and turned into the page's items by the
+    ``parse_response`` of ``request``, so that a page holds the same (transformed) items as the
+    full list. Any other request is sent as is, and returns the full list as the only page
+    """
+
+    def __init__(
+        self,
+        request: BaseRequest[t.List[T]],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0,
+        cursor: t.Optional[str] = None,
+    ):
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        self.request = request
+        self.page_size = page_size
+        self.offset = offset
+        self.cursor = cursor
+
+    @property
+    def auth(self):
+        return self.request.auth
+
+    @property
+    def service(self):
+        return self.request.service
+
+    def generate_config(self, api: BaseClient):
+        config = self.request.generate_config(api)
+        if not self.request.paginated:
+            return config
+        params = {"limit": self.page_size}
+        if self.cursor is not None:
+            params["cursor"] = self.cursor
+        elif self.offset:
+            params["offset"] = self.offset
+        return {**config, "params": {**config.get("params", {}), **params}}
+
+    def make_response(self, resp: Response) -> t.Optional[PageResult[T]]:
+        # The response of a failed request can only get here if the error callback suppressed
+        # the error
+        if resp.status_code >= 400:
+            return None
+        if not self.request.paginated:
+            return PageResult(self, self.request.make_response(resp), None)
+        body = codec.loads(resp.content)
+        return PageResult(self, self.request.parse_response(body), body)
+
+    def __eq__(self, other):
+        if not isinstance(other, Page):
+            return NotImplemented
+        return (self.request, self.page_size, self.offset, self.cursor) == (
+            other.request,
+            other.page_size,
+            other.offset,
+            other.cursor,
+        )
+
+
+class PageResult(t.Generic[T]):
+    """The ``items`` of a ``Page`` together with the response ``body``, which tells whether there
+    is a next page. A paginating service includes ``limit`` and/or ``offset`` in the body, and
+    optionally the ``total`` number of items. A service with cursor based pagination instead
+    includes a ``next_cursor``, which is ``null`` on the last page. A body without these fields
+    contains the full list
+    """
+
+    def __init__(self, page: Page[T], items: t.List[T], body: t.Any):
+        self.page = page
+        self.items = items
+        self.body = body
+
+    def next_page(self) -> t.Optional[Page[T]]:
+        body, page = self.body, self.page
+        if not isinstance(body, dict):
+            return None
+        if "next_cursor" in body:
+            if (cursor := body["next_cursor"]) is None:
+                return None
+            return Page(page.request, page.page_size, cursor=cursor)
+        if "limit" not in body and "offset" not in body:
+            return None
+
+        # A short page is the last page. A page that is longer than requested means that the
+        # limit was ignored
+        if len(self.items) != page.page_size:
+            return None
+        offset = page.offset + len(self.items)
+        if (total := body.get("total")) is not None and offset >= total:
+            return None
+        return Page(page.request, page.page_size, offset=offset)
@@ -3,7 +3,17 @@ import io
 import pathlib
 import typing as t
 
-from .common import Request, Service, pick, simple_request, unwrap_envelope, urljoin
+from .common import (
+    BaseClient,
+    IAsyncClient,
+    Request,
+    Service,
+    pick,
+    simple_request,
+    unwrap_envelope,
+    urljoin,
+)
+from .multipart import AsyncMultipartStream, BaseMultipartStream, MultipartStream
 
 
 class AuthRequest(Request):
@@ -50,18 +60,19 @@ class CheckAuthToken(AuthRequest):
 
 @dataclasses.dataclass
 class GetScopes(AuthRequest):
+    paginated = True
+
     @simple_request
     def make_request(self):
         return "scopes"
 
-    def make_response(self, resp):
-        result = resp.json()
+    def parse_response(self, body):
         return [
             {
                 "name": s["scope_name"],
                 "uuid": s["scope_uuid"],
             }
-            for s in result["scopes"]
+            for s in body["scopes"]
         ]
 
 
@@ -91,6 +102,8 @@ class DeleteScope(AuthRequest):
 @dataclasses.dataclass
 @unwrap_envelope("projects")
 class GetProjects(DataEngineRequest):
+    paginated = True
+
     @simple_request
     def make_request(self):
         return "projects"
@@ -147,6 +160,7 @@ class DeleteProject(DataEngineRequest):
 @unwrap_envelope("datasets")
 class GetDatasets(DataEngineRequest):
     project_uuid: str
+    paginated = True
 
     @simple_request
     def make_request(self):
@@ -220,22 +234,30 @@ class GetDatasetData(DataEngineRequest):
 
 @dataclasses.dataclass
 class AddDatasetData(DataEngineRequest):
+    """Upload the data of a dataset. The file is streamed in chunks, which are read in a thread
+    when using an ``AsyncClient``. ``on_progress`` is called with the number of bytes sent after
+    every chunk
+    """
+
     uuid: str
     file: t.Union[str, pathlib.Path, io.BufferedIOBase]
+    on_progress: t.Optional[t.Callable[[int], None]] = None
 
     def make_request(self):
-        file = self.file
-        if isinstance(file, (str, pathlib.Path)):
-            file = open(file, "rb")
-
         return {
             "method": "POST",
             "url": urljoin("datasets", self.uuid, "data"),
-            "files": {
-                "data": file,
-            },
         }
 
+    def generate_config(self, api: BaseClient):
+        # The body depends on the client, so it is only created here
+        stream_type = AsyncMultipartStream if isinstance(api, IAsyncClient) else MultipartStream
+        return {**super().generate_config(api), **self.make_body(stream_type)}
+
+    def make_body(self, stream_type: t.Type[BaseMultipartStream]):
+        body = stream_type({"data": self.file}, on_progress=self.on_progress)
+        return {"content": body, "headers": body.headers}
+
 
 class ModifiyDatasetData(AddDatasetData):
     def make_request(self):
@@ -254,10 +276,84 @@ class DeleteDatasetData(DataEngineRequest):
         }
 
 
+@dataclasses.dataclass
+class CreateDatasetUpload(DataEngineRequest):
+    """Start a chunked upload of dataset data. The response contains the ``upload_uuid`` and
+    optionally the ``chunk_size`` that the server prefers. Servers that do not support chunked
+    uploads respond with 404, 405 or 501
+    """
+
+    uuid: str
+    filename: str
+    size: int
+    overwrite: bool = False
+
+    def make_request(self):
+        req = {
+            "method": "POST",
+            "url": urljoin("datasets", self.uuid, "uploads"),
+            "json": {"filename": self.filename, "size": self.size},
+        }
+        if self.overwrite:
+            req["params"] = {"overwrite": True}
+        return req
+
+
+@dataclasses.dataclass
+class GetDatasetUpload(DataEngineRequest):
+    """The response contains the ``offset`` up to which the data has been received"""
+
+    uuid: str
+    upload_uuid: str
+
+    @simple_request
+    def make_request(self):
+        return urljoin("datasets", self.uuid, "uploads", self.upload_uuid)
+
+
+@dataclasses.dataclass
+class UploadDatasetChunk(DataEngineRequest):
+    """Upload a chunk of data starting at ``offset``. The response contains the ``offset`` up to
+    which the data has been received"""
+
+    uuid: str
+    upload_uuid: str
+    offset: int
+    data: bytes
+    size: int
+
+    def make_request(self):
+        last = self.offset + len(self.data) - 1
+        return {
+            "method": "PUT",
+            "url": urljoin("datasets", self.uuid, "uploads", self.upload_uuid),
+            "content": self.data,
+            "headers": {
+                "Content-Type": "application/octet-stream",
+                "Content-Range": f"bytes {self.offset}-{last}/{self.size}",
+            },
+        }
+
+
+@dataclasses.dataclass
+class CommitDatasetUpload(DataEngineRequest):
+    """Finish a chunked upload, after which the data becomes the dataset's data"""
+
+    uuid: str
+    upload_uuid: str
+
+    def make_request(self):
+        return {
+            "method": "POST",
+            "url": urljoin("datasets", self.uuid, "uploads", self.upload_uuid, "commit"),
+        }
+
+
 @dataclasses.dataclass
 @unwrap_envelope("scenarios")
 class GetScenarios(DataEngineRequest):
     project_uuid: str
+    paginated = True
 
     @simple_request
     def make_request(self):
@@ -369,6 +465,7 @@ class DeleteSimulation(SimulationControlRequest):
 @unwrap_envelope("updates")
 class GetUpdates(DataEngineRequest):
     scenario_uuid: str
+    paginated = True
 
     @simple_request
     def make_request(self):
@@ -401,6 +498,7 @@ class CreateUpdate(DataEngineRequest):
 @unwrap_envelope("views")
 class GetViews(DataEngineRequest):
     scenario_uuid: str
+    paginated = True
 
     @simple_request
     def make_request(self):
@@ -456,6 +554,8 @@ class DeleteView(DataEngineRequest):
 @dataclasses.dataclass
 @unwrap_envelope("dataset_types")
 class GetDatasetTypes(DataEngineRequest):
+    paginated = True
+
     @simple_request
     def make_request(self):
         return urljoin("schema/dataset_types")
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import email.utils
+import random
+import typing as t
+
+import httpx
+
+DEFAULT_RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# These status codes indicate that the server did not process the request, so they may be
+# retried regardless of the request method
+NOT_PROCESSED_STATUS_CODES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# A connection that could not be established means the request was never sent
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclasses.dataclass
+class RetryStats:
+    requests: int = 0
+    retries: int = 0
+    # requests that still failed after having been retried
+    exhausted: int = 0
+
+
+class RetryPolicy:
+    """Determines whether and when a failed request is retried. Connection errors, and
+    responses with a status code in ``status_codes`` are retried up to ``max_retries`` times with
+    exponential backoff and full jitter, or after the duration given in a ``Retry-After`` header.
+    Requests that are not idempotent are only retried if the server did not process them.
+
+    To protect a struggling server, the total number of retries is limited by a retry budget of
+    ``min_budget`` plus ``budget_ratio`` times the number of requests.
+    """
+
+    def __init__(
+        self,
+        max_retries=3,
+        backoff_factor=0.5,
+        max_backoff=30.0,
+        max_retry_after=60.0,
+        status_codes: t.Collection[int] = DEFAULT_RETRY_STATUS_CODES,
+        methods: t.Collection[str] = IDEMPOTENT_METHODS,
+        budget_ratio=0.2,
+        min_budget=10,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.status_codes = status_codes
+        self.methods = methods
+        self.budget_ratio = budget_ratio
+        self.min_budget = min_budget
+        self.stats = RetryStats()
+
+    def start(self, conf: dict) -> RetryState:
+        self.stats.requests += 1
+        return RetryState(self, conf)
+
+    def has_budget(self):
+        return self.stats.retries < self.min_budget + self.budget_ratio * self.stats.requests
+
+    def backoff(self, attempt: int):
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2**attempt))
+
+
+class RetryState:
+    """Tracks the retries of a single request. Any file objects in the request body are rewound
+    to their original position before a retry. Requests with a body that cannot be rewound (eg. a
+    generator) are never retried
+    """
+
+    def __init__(self, policy: RetryPolicy, conf: dict) -> None:
+        self.policy = policy
+        self.method = conf.get("method", "GET").upper()
+        self.attempt = 0
+        self.positions = get_body_positions(conf)
+
+    def get_delay(
+        self, response: t.Optional[httpx.Response] = None, exc: t.Optional[Exception] = None
+    ) -> t.Optional[float]:
+        """Return the number of seconds to wait before retrying, or ``None`` if the request
+        should not be retried. Must be called for every failed attempt
+        """
+        if response is not None and response.status_code < 400:
+            return None
+        delay = self._get_delay(response, exc)
+        if delay is None:
+            if self.attempt > 0:
+                self.policy.stats.exhausted += 1
+            return None
+        self.rewind()
+        self.attempt += 1
+        self.policy.stats.retries += 1
+        return delay
+
+    def _get_delay(self, response: t.Optional[httpx.Response], exc: t.Optional[Exception]):
+        policy = self.policy
+        if (
+            self.positions is None
+            or self.attempt >= policy.max_retries
+            or not policy.has_budget()
+            or not self.is_retryable(response, exc)
+        ):
+            return None
+        if response is None or (retry_after := parse_retry_after(response)) is None:
+            return policy.backoff(self.attempt)
+        if retry_after > policy.max_retry_after:
+            return None
+        return retry_after
+
+    def is_retryable(self, response: t.Optional[httpx.Response], exc: t.Optional[Exception]):
+        idempotent = self.method in self.policy.methods
+        if exc is not None:
+            return isinstance(exc, NOT_SENT_ERRORS) or (
+                idempotent and isinstance(exc, httpx.TransportError)
+            )
+        if response.status_code not in self.policy.status_codes:
+            return False
+        return idempotent or response.status_code in NOT_PROCESSED_STATUS_CODES
+
+    def rewind(self):
+        for fobj, position in self.positions:
+            fobj.seek(position)
+
+
+def get_body_positions(conf: dict) -> t.Optional[t.List[t.Tuple[t.IO, int]]]:
+    """Return the current position of every file object in the request body, or ``None`` if the
+    body contains a stream that cannot be rewound. A ``rewindable`` stream starts over on every
+    iteration, so it does not need to be rewound"""
+    bodies = []
+    for value in (conf.get("files") or {}).values():
+        bodies.append(value[1] if isinstance(value, tuple) else value)
+    if (content := conf.get("content")) is not None:
+        bodies.append(content)
+
+    positions = []
+    for body in bodies:
+        if isinstance(body, (str, bytes)) or getattr(body, "rewindable", False):
+            continue
+        if not (hasattr(body, "seekable") and body.seekable()):
+            return None
+        positions.append((body, body.tell()))
+    return positions
+
+
+def parse_retry_after(response: httpx.Response) -> t.Optional[float]:
+    if (value := response.headers.get("retry-after")) is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+import typing as t
+from urllib.parse import urlsplit
+
+from . import codec
+
+if t.TYPE_CHECKING:
+    import httpx
+
+# Path segments that identify a resource are replaced by a placeholder in the URL template, so
+# that all requests to the same endpoint share a template
+UUID_SEGMENT = re.compile(r"[0-9a-fA-F]{8}-?(?:[0-9a-fA-F]{4}-?){3}[0-9a-fA-F]{12}")
+ID_SEGMENT = re.compile(r"\d+")
+
+TRACE_FORMATS = ("trace", "otlp")
+
+# OpenTelemetry enum values, see the OTLP trace protocol
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_UNSET = 0
+STATUS_CODE_ERROR = 2
+
+
+@dataclasses.dataclass
+class RequestTrace:
+    """The lifecycle of a single request, including its retries. ``started_at`` is a unix
+    timestamp, all other durations are in seconds. ``queue_wait`` is the time spent waiting for
+    the concurrency and rate limits, ``retry_wait`` the time spent waiting before retries,
+    ``time_to_first_byte`` the time until the headers of the (last) response were received and
+    ``latency`` the total duration of the request. The byte counts include all attempts. A
+    ``coalesced`` request shared the response of an identical request that was already in
+    flight, and did not send anything itself
+    """
+
+    request: str
+    method: str
+    url: str
+    url_template: str
+    service: t.Optional[str] = None
+    started_at: float = dataclasses.field(default_factory=time.time)
+    trace_id: str = dataclasses.field(default_factory=lambda: secrets.token_hex(16))
+    span_id: str = dataclasses.field(default_factory=lambda: secrets.token_hex(8))
+    attempts: int = 0
+    status_code: t.Optional[int] = None
+    error: t.Optional[str] = None
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    queue_wait: float = 0.0
+    retry_wait: float = 0.0
+    time_to_first_byte: t.Optional[float] = None
+    latency: t.Optional[float] = None
+    coalesced: bool = False
+    # (seconds since the start, name, attributes) of every event during the request
+    events: t.List[t.Tuple[float, str, dict]] = dataclasses.field(default_factory=list)
+
+    @classmethod
+    def from_config(cls, req, conf: dict):
+        url = str(conf.get("url", ""))
+        service = getattr(req, "service", None)
+        return cls(
+            request=request_name(req),
+            method=conf.get("method", "GET").upper(),
+            url=url,
+            url_template=url_template(url),
+            service=service.value[0] if service is not None else None,
+        )
+
+    def as_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+    def as_otlp(self) -> dict:
+        """This trace as an OpenTelemetry span, wrapped in an OTLP/JSON export request"""
+        start = int(self.started_at * 1e9)
+        attributes = {
+            "http.request.method": self.method,
+            "url.full": self.url,
+            "url.template": self.url_template,
+            "http.response.status_code": self.status_code,
+            "http.request.resend_count": max(self.attempts - 1, 0),
+            "http.request.body.size": self.bytes_sent,
+            "http.response.body.size": self.bytes_received,
+            "error.type": self.error,
+            "movici.request": self.request,
+            "movici.service": self.service,
+            "movici.queue_wait": self.queue_wait,
+            "movici.retry_wait": self.retry_wait,
+            "movici.time_to_first_byte": self.time_to_first_byte,
+            "movici.coalesced": self.coalesced,
+        }
+        failed = self.error is not None or (self.status_code or 0) >= 400
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": f"{self.method} {self.url_template}",
+            "kind": SPAN_KIND_CLIENT,
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int((self.latency or 0) * 1e9)),
+            "attributes": otlp_attributes(attributes),
+            "events": [
+                {
+                    "timeUnixNano": str(start + int(at * 1e9)),
+                    "name": name,
+                    "attributes": otlp_attributes(event_attributes),
+                }
+                for at, name, event_attributes in self.events
+            ],
+            "status": {"code": STATUS_CODE_ERROR if failed else STATUS_CODE_UNSET},
+        }
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": otlp_attributes({"service.name": "movici-api-client"})
+                    },
+                    "scopeSpans": [{"scope": {"name": "movici_api_client"}, "spans": [span]}],
+                }
+            ]
+        }
+
+
+class RequestHooks:
+    """Receives the lifecycle events of the requests sent by a client. Every request starts with
+    ``on_request_start`` and ends with ``on_complete``. In between, every attempt calls
+    ``on_first_byte`` when the response headers have been received, and ``on_retry`` when the
+    attempt failed and will be retried. Subclasses override the events they are interested in.
+    Hooks are called in the thread or event loop that sends the request, so they must be fast
+    """
+
+    def on_request_start(self, trace: RequestTrace):
+        pass
+
+    def on_first_byte(self, trace: RequestTrace):
+        pass
+
+    def on_retry(self, trace: RequestTrace, delay: float):
+        pass
+
+    def on_complete(self, trace: RequestTrace):
+        pass
+
+    def close(self):
+        """Called when the client that uses these hooks is closed. The client may still be used
+        (and call the hooks) afterwards"""
+        pass
+
+
+class HookGroup(RequestHooks):
+    """Calls multiple ``RequestHooks`` in order"""
+
+    def __init__(self, hooks: t.Sequence[RequestHooks]):
+        self.hooks = hooks
+
+    def on_request_start(self, trace: RequestTrace):
+        for hooks in self.hooks:
+            hooks.on_request_start(trace)
+
+    def on_first_byte(self, trace: RequestTrace):
+        for hooks in self.hooks:
+            hooks.on_first_byte(trace)
+
+    def on_retry(self, trace: RequestTrace, delay: float):
+        for hooks in self.hooks:
+            hooks.on_retry(trace, delay)
+
+    def on_complete(self, trace: RequestTrace):
+        for hooks in self.hooks:
+            hooks.on_complete(trace)
+
+    def close(self):
+        for hooks in self.hooks:
+            hooks.close()
+
+
+class JSONLinesExporter(RequestHooks):
+    """Writes every completed request as a line of JSON to ``file``, which is either a path (that
+    is appended to) or a binary file object. The ``trace`` format writes the fields of the
+    ``RequestTrace``. The ``otlp`` format writes OpenTelemetry spans in the OTLP/JSON encoding, as
+    read by the OpenTelemetry Collector's ``otlpjsonfile`` receiver.
+
+    The traces are encoded and written in a background thread, so that requests do not wait for
+    disk I/O. ``flush`` waits until all completed requests have been written. ``close`` also
+    closes the file if it was opened from a path, which is opened again when another request
+    completes
+    """
+
+    def __init__(self, file: t.Union[str, os.PathLike, t.BinaryIO], format: str = "trace") -> None:
+        if format not in TRACE_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(TRACE_FORMATS)}")
+        self.format = format
+        self.owns_file = isinstance(file, (str, os.PathLike))
+        self.path = file if self.owns_file else None
+        self.file = open(file, "ab") if self.owns_file else file
+        self.queue: queue.Queue[t.Optional[RequestTrace]] = queue.Queue()
+        self.writer: t.Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def on_complete(self, trace: RequestTrace):
+        with self.lock:
+            if self.writer is None:
+                if self.file.closed and self.owns_file:
+                    self.file = open(self.path, "ab")
+                self.writer = threading.Thread(target=self._write, daemon=True)
+                self.writer.start()
+            self.queue.put(trace)
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        with self.lock:
+            writer, self.writer = self.writer, None
+            if writer is not None:
+                self.queue.put(None)
+                writer.join()
+            if self.owns_file:
+                self.file.close()
+
+    def _write(self):
+        while True:
+            # Write everything that is queued at once, so that the file is flushed only once for
+            # a burst of requests
+            traces = [self.queue.get()]
+            with contextlib.suppress(queue.Empty):
+                while traces[-1] is not None:
+                    traces.append(self.queue.get_nowait())
+            try:
+                self.file.write(
+                    b"".join(
+                        codec.dumps(self._record(trace)) + b"\n"
+                        for trace in traces
+                        if trace is not None
+                    )
+                )
+                self.file.flush()
+            except (OSError, ValueError):
+                # Failing to export a trace must not affect the requests that are being traced
+                pass
+            finally:
+                for _ in traces:
+                    self.queue.task_done()
+            if traces[-1] is None:
+                return
+
+    def _record(self, trace: RequestTrace):
+        return trace.as_otlp() if self.format == "otlp" else trace.as_dict()
+
+
+class RequestTracer:
+    """Records the ``RequestTrace`` of a single request and reports it to ``hooks``. Does nothing
+    when there are no hooks. Used as a context manager around the request, which completes the
+    trace with either the ``response`` given to ``done`` or the exception that was raised
+    """
+
+    def __init__(self, hooks: t.Optional[RequestHooks] = None, req=None, conf=None) -> None:
+        self.hooks = hooks
+        self.trace: t.Optional[RequestTrace] = None
+        self.response: t.Optional[httpx.Response] = None
+        if hooks is not None:
+            self.trace = RequestTrace.from_config(req, conf)
+            self.start = time.perf_counter()
+            hooks.on_request_start(self.trace)
+
+    @property
+    def enabled(self):
+        return self.trace is not None and self.trace.latency is None
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def queued(self, seconds: float):
+        if self.enabled:
+            self.trace.queue_wait += seconds
+
+    def first_byte(self, response: httpx.Response):
+        if not self.enabled:
+            return
+        trace = self.trace
+        trace.attempts += 1
+        trace.status_code = response.status_code
+        trace.bytes_sent += int(response.request.headers.get("Content-Length", 0))
+        trace.time_to_first_byte = self.elapsed()
+        trace.events.append((trace.time_to_first_byte, "first_byte", {}))
+        self.hooks.on_first_byte(trace)
+
+    def retry(
+        self,
+        delay: float,
+        response: t.Optional[httpx.Response] = None,
+        exc: t.Optional[Exception] = None,
+    ):
+        if not self.enabled:
+            return
+        trace = self.trace
+        if response is not None:
+            trace.bytes_received += response.num_bytes_downloaded
+            reason = {"http.response.status_code": response.status_code}
+        else:
+            trace.attempts += 1
+            reason = {"error.type": type(exc).__name__}
+        trace.retry_wait += delay
+        trace.events.append((self.elapsed(), "retry", {"delay": delay, **reason}))
+        self.hooks.on_retry(trace, delay)
+
+    def coalesced(self):
+        if self.enabled:
+            self.trace.coalesced = True
+
+    def done(self, response: httpx.Response):
+        self.response = response
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled:
+            return
+        trace = self.trace
+        if exc_val is not None:
+            # Only imported here, so that configuring tracing does not import ``httpx``
+            from httpx import TransportError
+
+            trace.error = type(exc_val).__name__
+            # A request that failed with a transport error never received a first byte
+            if isinstance(exc_val, TransportError):
+                trace.attempts += 1
+        if self.response is not None and not trace.coalesced:
+            trace.bytes_received += self.response.num_bytes_downloaded
+        trace.latency = self.elapsed()
+        self.hooks.on_complete(trace)
+
+
+def request_name(req) -> str:
+    """The class name of a request, including that of any wrapped request"""
+    name = type(req).__name__
+    if (inner := getattr(req, "request", None)) is not None and hasattr(inner, "make_response"):
+        return f"{name}({request_name(inner)})"
+    return name
+
+
+def url_template(url: str) -> str:
+    segments = urlsplit(url).path.split("/")
+    return "/".join(
+        "{uuid}" if UUID_SEGMENT.fullmatch(s) else "{id}" if ID_SEGMENT.fullmatch(s) else s
+        for s in segments
+    )
+
+
+def otlp_attributes(attributes: dict) -> t.List[dict]:
+    rv = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            # 64 bit integers are encoded as strings in OTLP/JSON
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        rv.append({"key": key, "value": encoded})
+    return rv
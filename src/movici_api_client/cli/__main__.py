@@ -1,11 +1,5 @@
 from movici_api_client.cli.bootstrap import cli_factory
-from movici_api_client.cli.controllers.config import ConfigController
-from movici_api_client.cli.controllers.dataset_types import DatasetTypeController
-from movici_api_client.cli.controllers.datasets import DatasetController
-from movici_api_client.cli.controllers.projects import ProjectController
-from movici_api_client.cli.controllers.scenarios import ScenarioController
-from movici_api_client.cli.controllers.scopes import ScopeController
-from movici_api_client.cli.controllers.views import ViewController
+from movici_api_client.cli.commands import CONTROLLERS
 from movici_api_client.cli.main import (
     activate_project,
     handle_global_error,
@@ -17,14 +11,6 @@ from movici_api_client.cli.main import (
 cli_factory(
     main=main,
     commands=[login, activate_project, initialize_data_dir],
-    controller_types=[
-        ProjectController,
-        DatasetController,
-        ScenarioController,
-        ViewController,
-        DatasetTypeController,
-        ConfigController,
-        ScopeController,
-    ],
+    lazy_controllers=CONTROLLERS,
     on_error=handle_global_error,
 )()
@@ -1,5 +1,7 @@
 import functools
+import importlib
 import sys
+import typing as t
 
 import click
 
@@ -67,8 +69,67 @@ def register_command(group: click.Group, command, name=None):
     group.add_command(command, name)
 
 
-def cli_factory(main, commands=None, controller_types=None, result_callback=None, on_error=None):
-    main = create_click_command(catch_exceptions(main), factory=click.group)
+class LazyGroup(click.Group):
+    """A group with subcommands that are registered by controllers that are only imported once
+    one of their subcommands is used. ``lazy_controllers`` maps the import path of every
+    controller (``module:ControllerClass``) to the names of the subcommands it registers in this
+    group
+    """
+
+    def __init__(
+        self, *args, lazy_controllers: t.Optional[t.Dict[str, t.Sequence[str]]] = None, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.lazy_controllers = dict(lazy_controllers or {})
+
+    def list_commands(self, ctx):
+        lazy = {name for names in self.lazy_controllers.values() for name in names}
+        return sorted({*super().list_commands(ctx), *lazy})
+
+    def get_command(self, ctx, cmd_name):
+        self.load_controllers(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def load_controllers(self, cmd_name):
+        for path, names in list(self.lazy_controllers.items()):
+            if cmd_name in names:
+                del self.lazy_controllers[path]
+                register_controller(self, import_controller(path)())
+
+    def format_commands(self, ctx, formatter):
+        # Unlike ``click.Group``, this does not load every command to show its help text. The
+        # subgroups that are registered by controllers do not have a help text anyway
+        names = self.list_commands(ctx)
+        if not names:
+            return
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            if (cmd := self.commands.get(name)) is None:
+                rows.append((name, ""))
+            elif not cmd.hidden:
+                rows.append((name, cmd.get_short_help_str(limit)))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+def import_controller(path: str) -> t.Type[Controller]:
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def cli_factory(
+    main,
+    commands=None,
+    controller_types=None,
+    result_callback=None,
+    on_error=None,
+    lazy_controllers: t.Optional[t.Dict[str, t.Sequence[str]]] = None,
+):
+    main = create_click_command(
+        catch_exceptions(main),
+        factory=functools.partial(click.group, cls=LazyGroup, lazy_controllers=lazy_controllers),
+    )
     for cmd in commands or []:
         register_command(main, cmd)
 
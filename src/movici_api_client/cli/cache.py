@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import re
+import time
+import typing as t
+
+from movici_api_client.cli.config import Context
+from movici_api_client.cli.exceptions import InvalidFile
+from movici_api_client.cli.helpers import read_json_file, write_json_atomic
+
+# "~" is properly expanded using pathlib.Path.expanduser() on all platforms including windows
+DEFAULT_CACHE_DIR = "~/.movici_cache"
+CACHE_DIR_ENV = "MOVICI_CLI_CACHE_DIR"
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_MAX_ENTRIES = 100
+UPLOAD_SESSIONS_SUFFIX = ".uploads.json"
+
+
+def get_cache_dir(env=CACHE_DIR_ENV, default=DEFAULT_CACHE_DIR):
+    return pathlib.Path(os.getenv(env, default=default)).expanduser()
+
+
+def get_cache_file(
+    context: Context, directory: t.Optional[pathlib.Path] = None, suffix: str = ".json"
+):
+    directory = directory if directory is not None else get_cache_dir()
+    return directory.joinpath(re.sub(r"[^\w.-]", "_", context.name) + suffix)
+
+
+class MetadataCache:
+    """A persistent cache for resource metadata (eg. name to uuid mappings) of a single context.
+    Entries expire after ``ttl`` seconds and when there are more than ``max_entries`` entries, the
+    oldest entries are evicted. A cache without a ``file`` is disabled and never returns a value
+    """
+
+    def __init__(
+        self,
+        file: t.Optional[pathlib.Path] = None,
+        url: t.Optional[str] = None,
+        ttl: float = DEFAULT_CACHE_TTL,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+        entries: t.Optional[dict] = None,
+    ) -> None:
+        self.file = file
+        self.url = url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: t.Dict[str, dict] = entries if entries is not None else {}
+
+    @property
+    def enabled(self):
+        return self.file is not None and self.ttl > 0
+
+    @classmethod
+    def from_context(cls, context: Context, directory: t.Optional[pathlib.Path] = None):
+        try:
+            ttl = float(context.get("cache_ttl", DEFAULT_CACHE_TTL))
+        except ValueError:
+            ttl = DEFAULT_CACHE_TTL
+        return cls.load(get_cache_file(context, directory), url=context.url, ttl=ttl)
+
+    @classmethod
+    def load(cls, file: pathlib.Path, url: t.Optional[str] = None, **kwargs):
+        entries = None
+        if file.is_file():
+            try:
+                contents = read_json_file(file)
+                # a context may be pointed to a different server, which invalidates everything
+                if contents["url"] == url:
+                    entries = contents["entries"]
+            except (InvalidFile, KeyError, TypeError):
+                entries = None
+        return cls(file, url=url, entries=entries, **kwargs)
+
+    def get(self, key: str):
+        if not self.enabled or (entry := self.entries.get(key)) is None:
+            return None
+        if time.time() - entry["time"] > self.ttl:
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value):
+        if not self.enabled:
+            return
+        self.entries[key] = {"time": time.time(), "value": value}
+        self.evict()
+        self.save()
+
+    def invalidate(self, *keys: str):
+        """Remove entries by key. A key also invalidates all entries that are scoped to it, eg:
+        ``datasets`` invalidates ``datasets:<project_uuid>``
+        """
+        if not self.enabled:
+            return
+        to_remove = [
+            entry
+            for entry in self.entries
+            if any(entry == key or entry.startswith(key + ":") for key in keys)
+        ]
+        for entry in to_remove:
+            del self.entries[entry]
+        if to_remove:
+            self.save()
+
+    def evict(self):
+        now = time.time()
+        self.entries = {
+            key: entry for key, entry in self.entries.items() if now - entry["time"] <= self.ttl
+        }
+        if len(self.entries) > self.max_entries:
+            newest = sorted(self.entries.items(), key=lambda e: e[1]["time"])[-self.max_entries :]
+            self.entries = dict(newest)
+
+    def save(self):
+        if self.file is None:
+            return
+        write_json_atomic(self.file, {"url": self.url, "entries": self.entries})
+
+    def clear(self):
+        self.entries = {}
+        if self.file is not None and self.file.exists():
+            self.file.unlink()
+
+
+class UploadSessions:
+    """Persists the chunked upload sessions of a single context, so that an interrupted upload
+    can be resumed. Sessions are keyed by dataset uuid and contain the uploaded file's absolute
+    path, size and modification time, so that a session is only resumed for the same, unchanged
+    file. Without a ``file``, sessions are only kept in memory
+    """
+
+    def __init__(
+        self,
+        file: t.Optional[pathlib.Path] = None,
+        url: t.Optional[str] = None,
+        entries: t.Optional[dict] = None,
+    ) -> None:
+        self.file = file
+        self.url = url
+        self.entries: t.Dict[str, dict] = entries if entries is not None else {}
+
+    @classmethod
+    def from_context(cls, context: Context, directory: t.Optional[pathlib.Path] = None):
+        return cls.load(
+            get_cache_file(context, directory, suffix=UPLOAD_SESSIONS_SUFFIX), context.url
+        )
+
+    @classmethod
+    def load(cls, file: pathlib.Path, url: t.Optional[str] = None):
+        entries = None
+        if file.is_file():
+            try:
+                contents = read_json_file(file)
+                if contents["url"] == url:
+                    entries = contents["entries"]
+            except (InvalidFile, KeyError, TypeError):
+                entries = None
+        return cls(file, url=url, entries=entries)
+
+    def get(self, uuid: str, file: pathlib.Path) -> t.Optional[dict]:
+        if (entry := self.entries.get(uuid)) is None:
+            return None
+        try:
+            stat = file.stat()
+        except OSError:
+            return None
+        if (str(file.resolve()), stat.st_size, stat.st_mtime_ns) != (
+            entry["file"],
+            entry["size"],
+            entry["mtime_ns"],
+        ):
+            return None
+        return entry
+
+    def set(self, uuid: str, file: pathlib.Path, upload_uuid: str, chunk_size: int):
+        stat = file.stat()
+        self.entries[uuid] = {
+            "file": str(file.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "upload_uuid": upload_uuid,
+            "chunk_size": chunk_size,
+        }
+        self.save()
+
+    def remove(self, uuid: str):
+        if self.entries.pop(uuid, None) is not None:
+            self.save()
+
+    def save(self):
+        if self.file is None:
+            return
+        write_json_atomic(self.file, {"url": self.url, "entries": self.entries})
+
+
+def clear_cache_dir(directory: t.Optional[pathlib.Path] = None):
+    directory = directory if directory is not None else get_cache_dir()
+    if not directory.is_dir():
+        return
+    # Only metadata caches are cleared. Upload sessions are kept so that unfinished uploads can
+    # still be resumed
+    for file in directory.glob("*.json"):
+        if not file.name.endswith(UPLOAD_SESSIONS_SUFFIX):
+            file.unlink()
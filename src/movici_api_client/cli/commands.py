@@ -0,0 +1,58 @@
+# The controllers of the CLI, by import path, together with the top level commands that they
+# register. Controllers are only imported when one of their commands is used, so that starting
+# the CLI does not import every dependency of every command
+CONTROLLERS = {
+    "movici_api_client.cli.controllers.projects:ProjectController": (
+        "create",
+        "delete",
+        "download",
+        "get",
+        "project",
+        "update",
+        "upload",
+    ),
+    "movici_api_client.cli.controllers.datasets:DatasetController": (
+        "clear",
+        "create",
+        "dataset",
+        "delete",
+        "download",
+        "edit",
+        "get",
+        "update",
+        "upload",
+    ),
+    "movici_api_client.cli.controllers.scenarios:ScenarioController": (
+        "clear",
+        "create",
+        "delete",
+        "download",
+        "edit",
+        "get",
+        "run",
+        "scenario",
+        "upload",
+    ),
+    "movici_api_client.cli.controllers.views:ViewController": (
+        "create",
+        "delete",
+        "download",
+        "edit",
+        "get",
+        "update",
+        "upload",
+        "view",
+    ),
+    "movici_api_client.cli.controllers.dataset_types:DatasetTypeController": (
+        "dataset_type",
+        "get",
+    ),
+    "movici_api_client.cli.controllers.config:ConfigController": ("config",),
+    "movici_api_client.cli.controllers.scopes:ScopeController": (
+        "create",
+        "delete",
+        "get",
+        "scope",
+    ),
+    "movici_api_client.cli.controllers.cache:CacheController": ("cache",),
+}
@@ -5,9 +5,11 @@ import typing as t
 
 import gimme
 
-from movici_api_client.api import AsyncClient, Client
 from movici_api_client.cli.cqrs import Mediator
 
+if t.TYPE_CHECKING:
+    from movici_api_client.api import AsyncClient, Client
+
 __MOVICI_CLI_OPTIONS__ = "__movici_cli_options__"
 
 OPTIONS_COMMAND = "command"
@@ -44,6 +46,8 @@ class CLIParameters:
     with_simulation: t.Optional[bool] = None
     with_views: t.Optional[bool] = None
     output: t.Optional[str] = None
+    jobs: t.Optional[int] = None
+    format: t.Optional[str] = None
 
 
 class Controller:
@@ -53,8 +57,9 @@ class Controller:
     __commands__: t.Set[callable]
 
     mediator: Mediator = gimme.attribute(Mediator)
-    client: Client = gimme.attribute(Client)
-    async_client: AsyncClient = gimme.attribute(AsyncClient)
+    # The clients are looked up by name, so that defining a controller does not import them
+    client: Client = gimme.attribute("Client")
+    async_client: AsyncClient = gimme.attribute("AsyncClient")
     params: CLIParameters = gimme.attribute(CLIParameters)
 
     def __init_subclass__(cls) -> None:
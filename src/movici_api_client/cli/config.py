@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import dataclasses
+import functools
 import json
 import os
 import pathlib
@@ -8,6 +9,8 @@ import typing as t
 
 import gimme
 
+from movici_api_client.api.common import Service
+from movici_api_client.api.tracing import TRACE_FORMATS
 from movici_api_client.cli.helpers import read_json_file
 
 from .exceptions import DuplicateContext, InvalidConfigFile, InvalidFile
@@ -15,6 +18,10 @@ from .exceptions import DuplicateContext, InvalidConfigFile, InvalidFile
 # "~" is properly expanded using pathlib.Path.expanduser() on all platforms including windows
 DEFAULT_CONFIG_LOCATION = "~/.movici.conf"
 CONFIG_LOCATION_ENV = "MOVICI_CLI_CONFIG"
+COMPRESSION_CODECS = ("none", "gzip", "zstd")
+DOWNLOAD_FORMATS = ("json", "msgpack")
+# seconds
+DEFAULT_AUTH_CHECK_INTERVAL = 300.0
 
 
 def get_config_path(env=CONFIG_LOCATION_ENV, default=DEFAULT_CONFIG_LOCATION):
@@ -131,6 +138,19 @@ def parse_bool(value, allow_none=False):
     return bool(value)
 
 
+def parse_number(value, tp: t.Type = int):
+    try:
+        return tp(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"not a valid {tp.__name__}: {value}")
+
+
+def parse_choice(value, choices: t.Collection[str]):
+    if (value := str(value).lower()) not in choices:
+        raise ValueError(f"must be one of {', '.join(choices)}: {value}")
+    return value
+
+
 _MISSING = object()
 
 
@@ -144,8 +164,37 @@ class SpecialKey:
 class Context(dict):
     __special_keys__ = {
         "auth": SpecialKey(parse=parse_bool, default=True),
+        "auth_check_interval": SpecialKey(parse=functools.partial(parse_number, tp=float)),
+        "auth_token_checked_at": SpecialKey(parse=functools.partial(parse_number, tp=float)),
+        "auth_token_checked_for": SpecialKey(),
         "name": SpecialKey(required=True),
         "url": SpecialKey(required=True),
+        "http2": SpecialKey(parse=parse_bool),
+        "max_connections": SpecialKey(parse=parse_number),
+        "max_keepalive_connections": SpecialKey(parse=parse_number),
+        "keepalive_expiry": SpecialKey(parse=functools.partial(parse_number, tp=float)),
+        "max_concurrent_requests": SpecialKey(parse=parse_number),
+        "min_concurrent_requests": SpecialKey(parse=parse_number),
+        "adaptive_concurrency": SpecialKey(parse=parse_bool),
+        "max_retries": SpecialKey(parse=parse_number),
+        "compression": SpecialKey(
+            parse=functools.partial(parse_choice, choices=COMPRESSION_CODECS)
+        ),
+        "compression_level": SpecialKey(parse=parse_number),
+        "download_format": SpecialKey(
+            parse=functools.partial(parse_choice, choices=DOWNLOAD_FORMATS)
+        ),
+        "trace_file": SpecialKey(),
+        "trace_format": SpecialKey(parse=functools.partial(parse_choice, choices=TRACE_FORMATS)),
+        **{
+            f"{setting}.{service}": SpecialKey(parse=parse)
+            for setting, parse in [
+                ("rate_limit", functools.partial(parse_number, tp=float)),
+                ("rate_burst", parse_number),
+                ("max_concurrent_requests", parse_number),
+            ]
+            for service in Service.by_name()
+        },
     }
 
     def __init__(self, name: str, url: str, **kwargs) -> None:
@@ -163,7 +212,7 @@ class Context(dict):
             super().__setattr__(name, value)
 
     def __getitem__(self, key):
-        if (special := self.__special_keys__.get(key)) and special.default:
+        if (special := self.__special_keys__.get(key)) and special.default is not _MISSING:
             return self.get(key, special.default)
         return super().__getitem__(key)
 
@@ -179,7 +228,7 @@ class Context(dict):
         return super().__delitem__(key)
 
     def get(self, key, default=None):
-        if (special := self.__special_keys__.get(key)) and special.default:
+        if (special := self.__special_keys__.get(key)) and special.default is not _MISSING:
             default = special.default
 
         return super().get(key, default)
@@ -0,0 +1,23 @@
+import gimme
+
+from movici_api_client.cli.cache import MetadataCache, clear_cache_dir
+from movici_api_client.cli.config import Config
+
+from ..common import Controller
+from ..decorators import command, option
+from ..utils import assert_context, echo
+
+
+class CacheController(Controller):
+    name = "cache"
+    reverse = False
+    config: Config = gimme.attribute(Config)
+
+    @command
+    @option("-a", "--all", is_flag=True, help="Clear the cache of all contexts")
+    def clear(self, all):
+        if all:
+            clear_cache_dir()
+        else:
+            MetadataCache.from_context(assert_context(self.config)).clear()
+        echo("Cache succesfully cleared")
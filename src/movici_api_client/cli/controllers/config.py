@@ -1,7 +1,12 @@
 import gimme
 
 from movici_api_client.cli.config import Config, Context, write_config
-from movici_api_client.cli.exceptions import DuplicateContext, NoContextAvailable, NoSuchContext
+from movici_api_client.cli.exceptions import (
+    DuplicateContext,
+    InvalidUsage,
+    NoContextAvailable,
+    NoSuchContext,
+)
 
 from ..common import Controller
 from ..decorators import argument, command, format_output, option
@@ -62,7 +67,10 @@ class ConfigController(Controller):
     def set(self, key, value):
         config = self.config
         context = assert_context(config)
-        context[key] = value
+        try:
+            context[key] = value
+        except ValueError as e:
+            raise InvalidUsage(str(e))
 
         write_config(config)
         echo("Context succesfully updated")
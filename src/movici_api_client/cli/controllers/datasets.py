@@ -109,7 +109,7 @@ class DatasetController(Controller):
 
     @command(name="datasets", group="upload")
     @data_directory_option(purpose="datasets")
-    @cli_options("overwrite", "create", "yes", "no", "inspect")
+    @cli_options("overwrite", "create", "yes", "no", "inspect", "jobs")
     @handle_event(success_message="Success!")
     def upload_multiple(self, directory):
         return UploadMultipleDatasets(directory)
@@ -117,14 +117,14 @@ class DatasetController(Controller):
     @command
     @argument("name_or_uuid")
     @data_directory_option(purpose="datasets")
-    @cli_options("overwrite", "yes", "no")
+    @cli_options("overwrite", "yes", "no", "format")
     @handle_event(success_message="Success!")
     def download(self, name_or_uuid, directory):
         return DownloadDataset(name_or_uuid, directory)
 
     @command(name="datasets", group="download")
     @data_directory_option(purpose="datasets")
-    @cli_options("overwrite", "yes", "no")
+    @cli_options("overwrite", "yes", "no", "format")
     @handle_event(success_message="Success!")
     def download_multiple(self, directory):
         return DownloadMultipleDatasets(directory)
@@ -1,8 +1,14 @@
-from movici_api_client.api import Client
+from __future__ import annotations
+
+import typing as t
+
 from movici_api_client.api.requests import Login
 
 from ..config import Context
-from ..utils import echo, prompt
+from ..utils import echo, mark_auth_token_checked, prompt
+
+if t.TYPE_CHECKING:
+    from movici_api_client.api import Client
 
 # While this is in the controllers package, it is not a subclass of Controller.
 # it must be instantiated from inside a command
@@ -39,3 +45,5 @@ class LoginController:
     def handle_success(self, resp, username):
         self.context["auth_token"] = resp["session"]
         self.context["username"] = username
+        # a fresh token is known to be valid
+        mark_auth_token_checked(self.context)
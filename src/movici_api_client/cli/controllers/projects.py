@@ -66,14 +66,14 @@ class ProjectController(Controller):
 
     @command
     @data_directory_option("project")
-    @cli_options("overwrite", "create", "yes", "no", "inspect")
+    @cli_options("overwrite", "create", "yes", "no", "inspect", "jobs")
     @handle_event(success_message="Success!")
     def upload(self, directory):
         return UploadProject(directory)
 
     @command
     @data_directory_option(purpose="project")
-    @cli_options("overwrite", "yes", "no")
+    @cli_options("overwrite", "yes", "no", "format")
     @handle_event(success_message="Success!")
     def download(self, directory):
         return DownloadProject(directory)
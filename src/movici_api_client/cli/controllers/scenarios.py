@@ -120,7 +120,9 @@ class ScenarioController(Controller):
 
     @command(name="scenarios", group="upload")
     @data_directory_option(purpose="scenarios")
-    @cli_options("overwrite", "create", "yes", "no", "inspect", "with_simulation", "with_views")
+    @cli_options(
+        "overwrite", "create", "yes", "no", "inspect", "with_simulation", "with_views", "jobs"
+    )
     @handle_event(success_message="Success!")
     def upload_multiple(self, directory):
         return UploadMultipleScenarios(directory)
@@ -128,14 +130,14 @@ class ScenarioController(Controller):
     @command
     @argument("name_or_uuid")
     @data_directory_option(purpose="scenarios")
-    @cli_options("overwrite", "yes", "no", "with_simulation", "with_views")
+    @cli_options("overwrite", "yes", "no", "with_simulation", "with_views", "format")
     @handle_event(success_message="Success!")
     def download(self, name_or_uuid, directory):
         return DownloadScenario(name_or_uuid, directory)
 
     @command(name="scenarios", group="download")
     @data_directory_option(purpose="scenarios")
-    @cli_options("overwrite", "yes", "no", "with_simulation", "with_views")
+    @cli_options("overwrite", "yes", "no", "with_simulation", "with_views", "format")
     @handle_event(success_message="Success!")
     def download_multiple(self, directory):
         return DownloadMultipleScenarios(directory=directory)
@@ -1,10 +1,12 @@
 import asyncio
+import contextlib
 import json
 import pathlib
 
 from movici_api_client.api.client import AsyncClient, Client
 from movici_api_client.api.requests import DeleteView, GetSingleView, GetViews, UpdateView
 
+from ..cache import MetadataCache
 from ..common import Controller
 from ..data_dir import DataDir
 from ..decorators import (
@@ -52,7 +54,9 @@ class ViewController(Controller):
         client = get(Client)
         scenario_uuid = get_scenario_uuid(scenario_name_or_uuid, project_uuid, client=client)
 
-        return client.request(GetViews(scenario_uuid))
+        result = client.request(GetViews(scenario_uuid))
+        view_query(scenario_uuid).update_cache(result)
+        return result
 
     @command
     @argument("scenario_name_or_uuid")
@@ -92,11 +96,13 @@ class ViewController(Controller):
     @format_output
     def delete(self, project_uuid, scenario_name_or_uuid, view_name_or_uuid):
         client = get(Client)
-        view = get_view(project_uuid, scenario_name_or_uuid, view_name_or_uuid)
+        scenario_uuid = get_scenario_uuid(scenario_name_or_uuid, project_uuid, client=client)
+        view = get_view(project_uuid, scenario_uuid, view_name_or_uuid, client=client)
         uuid = view["uuid"]
 
         confirm(f"Are you sure you wish to delete view '{view_name_or_uuid}'")
-        return client.request(DeleteView(uuid))
+        with invalidates_views(scenario_uuid):
+            return client.request(DeleteView(uuid))
 
     @command
     @argument("scenario_name_or_uuid")
@@ -117,18 +123,19 @@ class ViewController(Controller):
         client = AsyncClient.from_sync_client(get(Client))
         view_name_or_uuid = view_name_or_uuid or file.stem
         scenario_uuid = get_scenario_uuid(scenario_name_or_uuid, project_uuid, client)
-        asyncio.run(
-            UploadResource(
-                client,
-                file,
-                parent_uuid=scenario_uuid,
-                strategy=ViewUploadStrategy(client=client),
-                name_or_uuid=view_name_or_uuid,
-                overwrite=maybe_set_flag(overwrite, yes, no),
-                create_new=maybe_set_flag(create, yes, no),
-                inspect_file=True,
-            ).run()
-        )
+        with invalidates_views(scenario_uuid):
+            asyncio.run(
+                UploadResource(
+                    client,
+                    file,
+                    parent_uuid=scenario_uuid,
+                    strategy=ViewUploadStrategy(client=client),
+                    name_or_uuid=view_name_or_uuid,
+                    overwrite=maybe_set_flag(overwrite, yes, no),
+                    create_new=maybe_set_flag(create, yes, no),
+                    inspect_file=True,
+                ).run()
+            )
 
         echo("Success!")
 
@@ -151,17 +158,18 @@ class ViewController(Controller):
         scenario = get_scenario(scenario_name_or_uuid, project_uuid, client)
         client = AsyncClient.from_sync_client(get(Client))
         strategy = ViewUploadStrategy(client=client, scenario=scenario)
-        asyncio.run(
-            UploadMultipleResources(
-                client,
-                directory,
-                parent_uuid=scenario["uuid"],
-                strategy=strategy,
-                overwrite=maybe_set_flag(overwrite, yes, no),
-                create_new=maybe_set_flag(create, yes, no),
-                inspect_file=True,
-            ).run()
-        )
+        with invalidates_views(scenario["uuid"]):
+            asyncio.run(
+                UploadMultipleResources(
+                    client,
+                    directory,
+                    parent_uuid=scenario["uuid"],
+                    strategy=strategy,
+                    overwrite=maybe_set_flag(overwrite, yes, no),
+                    create_new=maybe_set_flag(create, yes, no),
+                    inspect_file=True,
+                ).run()
+            )
         echo("Success!")
 
     @command
@@ -222,10 +230,12 @@ class ViewController(Controller):
     @argument("view_name_or_uuid")
     def edit(self, project_uuid, scenario_name_or_uuid, view_name_or_uuid):
         client = get(Client)
-        current = get_view(project_uuid, scenario_name_or_uuid, view_name_or_uuid, client=client)
+        scenario_uuid = get_scenario_uuid(scenario_name_or_uuid, project_uuid, client=client)
+        current = get_view(project_uuid, scenario_uuid, view_name_or_uuid, client=client)
         uuid = current["uuid"]
         result = edit_resource(current)
-        client.request(UpdateView(uuid, payload=result))
+        with invalidates_views(scenario_uuid):
+            client.request(UpdateView(uuid, payload=result))
         echo("Succesfully updated view")
 
 
@@ -236,6 +246,27 @@ def get_view(project_uuid, scenario_name_or_uuid, view_name_or_uuid, client: Cli
         return client.request(GetSingleView(view_name_or_uuid))
 
     scenario_uuid = get_scenario_uuid(scenario_name_or_uuid, project_uuid, client=client)
+    query = view_query(scenario_uuid)
+    if (uuid := (query.get_cached_uuids() or {}).get(view_name_or_uuid)) is not None:
+        return client.request(GetSingleView(uuid))
 
     all_views = client.request(GetViews(scenario_uuid))
+    query.update_cache(all_views)
     return get_resource_from_list(view_name_or_uuid, all_views, resource_type="view")
+
+
+@contextlib.contextmanager
+def invalidates_views(scenario_uuid: str):
+    """Like ``handlers.remote.invalidates_cache``, for commands that create, modify or delete the
+    views of a scenario"""
+    try:
+        yield
+    finally:
+        get(MetadataCache).invalidate(view_query(scenario_uuid).cache_key)
+
+
+def view_query(scenario_uuid: str):
+    # importing the handlers loads every remote handler, which is not needed to build the commands
+    from ..handlers.query import ViewQuery
+
+    return ViewQuery(scenario_uuid)
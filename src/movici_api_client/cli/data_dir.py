@@ -1,16 +1,190 @@
+import functools
 import pathlib
 import re
 import typing as t
 
-from movici_api_client.cli.exceptions import InvalidDirectory
+from movici_api_client.cli.exceptions import InvalidDirectory, InvalidFile
+from movici_api_client.cli.helpers import file_hash, read_json_file, write_json_atomic
 
 MOVICI_DATADIR_SENTINEL = ".movici_data"
+MOVICI_DOWNLOAD_MANIFEST = ".movici_manifest.json"
+MOVICI_UPLOAD_LEDGER = ".movici_uploads.json"
+
+
+class LocalFileIndex:
+    """Base class for indexes of local files that are stored as json inside a data directory.
+    Every entry contains the file's size, modification time and sha256 hash, so that it can be
+    determined whether a file has changed
+    """
+
+    def __init__(self, file: pathlib.Path, root: pathlib.Path, entries: dict = None) -> None:
+        self.file = file
+        self.root = root
+        self.entries: t.Dict[str, dict] = entries if entries is not None else {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, file: pathlib.Path, root: pathlib.Path):
+        entries = None
+        if file.is_file():
+            try:
+                entries = read_json_file(file)["resources"]
+            except (InvalidFile, KeyError, TypeError):
+                # A corrupt index only means we have to transfer everything again
+                entries = None
+        return cls(file, root, entries)
+
+    def save(self):
+        if not self.dirty:
+            return
+        write_json_atomic(self.file, {"version": 1, "resources": self.entries}, pretty=True)
+        self.dirty = False
+
+    def relative_path(self, file: pathlib.Path):
+        return file.relative_to(self.root).as_posix()
+
+    def _make_entry(self, file: pathlib.Path, sha256: str, **kwargs):
+        stat = file.stat()
+        return {
+            "file": self.relative_path(file),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            **kwargs,
+        }
+
+    def _check_unchanged(self, entry: dict) -> t.Tuple[bool, t.Optional[int]]:
+        """Returns whether the file of ``entry`` is unchanged and, if the file was only touched,
+        its new modification time (see ``_touch``). Only verifies the file hash if the file was
+        modified. The entry itself is not modified, so that this can be run in a thread while the
+        index is used elsewhere. This may block on disk I/O
+        """
+        file = self.root.joinpath(entry["file"])
+        try:
+            stat = file.stat()
+        except OSError:
+            return False, None
+        if stat.st_size != entry["size"]:
+            return False, None
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True, None
+        if file_hash(file) != entry["sha256"]:
+            return False, None
+        return True, stat.st_mtime_ns
+
+    def _touch(self, entry: dict, mtime_ns: t.Optional[int]):
+        """Record the new modification time of a file that was only touched, so that it is not
+        hashed again"""
+        if mtime_ns is not None and entry["mtime_ns"] != mtime_ns:
+            entry["mtime_ns"] = mtime_ns
+            self.dirty = True
+
+    def _iter_entries(self, directory: pathlib.Path) -> t.Iterable[t.Tuple[str, dict]]:
+        for key, entry in list(self.entries.items()):
+            if self.root.joinpath(entry["file"]).parent == directory:
+                yield key, entry
+
+
+class DownloadManifest(LocalFileIndex):
+    """Keeps track of the resources that have been downloaded into a data directory, so that
+    unchanged resources do not need to be downloaded again. Entries are keyed by resource uuid
+    and contain the local file (relative to the data directory), its size, modification time and
+    sha256 hash, and the information about the remote version of the resource (``etag``,
+    ``last_modified`` and ``version``)
+    """
+
+    def get(self, uuid: str) -> t.Optional[dict]:
+        return self.entries.get(uuid)
+
+    def get_valid(self, uuid: str) -> t.Optional[dict]:
+        """Return the entry for a resource only if its local file has not changed since it was
+        downloaded. This may block on disk I/O
+        """
+        return self.touch_valid(*self.check_valid(uuid))
+
+    def check_valid(self, uuid: str) -> t.Tuple[t.Optional[dict], t.Optional[int]]:
+        """The first half of ``get_valid``, which does not modify the manifest and can therefore
+        be run in a thread. Returns the entry (if its file is unchanged) and the new modification
+        time of its file, which are to be given to ``touch_valid``. This may block on disk I/O
+        """
+        if (entry := self.get(uuid)) is None:
+            return None, None
+        unchanged, mtime_ns = self._check_unchanged(entry)
+        return (entry, mtime_ns) if unchanged else (None, None)
+
+    def touch_valid(self, entry: t.Optional[dict], mtime_ns: t.Optional[int]) -> t.Optional[dict]:
+        """The second half of ``get_valid``, see ``check_valid``"""
+        if entry is not None:
+            self._touch(entry, mtime_ns)
+        return entry
+
+    def set(self, uuid: str, file: pathlib.Path, sha256: str, **remote: t.Optional[str]):
+        self.entries[uuid] = self._make_entry(file, sha256, **remote)
+        self.dirty = True
+
+    def remove(self, uuid: str):
+        if self.entries.pop(uuid, None) is not None:
+            self.dirty = True
+
+    def iter_files(self, directory: pathlib.Path) -> t.Iterable[t.Tuple[str, pathlib.Path]]:
+        """yield ``(uuid, file)`` for every tracked file inside ``directory``"""
+        for uuid, entry in self._iter_entries(directory):
+            yield uuid, self.root.joinpath(entry["file"])
+
+
+class UploadLedger(LocalFileIndex):
+    """Keeps track of the files that have been uploaded from a data directory, so that unchanged
+    files do not need to be uploaded again. Entries are keyed by the file path (relative to the
+    data directory) and contain the file's size, modification time and sha256 hash, and the uuid
+    of the resource it was uploaded to. The ledger also counts the files that were skipped
+    """
+
+    def __init__(self, file: pathlib.Path, root: pathlib.Path, entries: dict = None) -> None:
+        super().__init__(file, root, entries)
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+
+    def get(self, file: pathlib.Path) -> t.Optional[dict]:
+        return self.entries.get(self.relative_path(file))
+
+    def hash_file(self, file: pathlib.Path) -> str:
+        """Return the sha256 hash of a file. The hash is only calculated if the file was modified
+        since it was last recorded. This may block on disk I/O
+        """
+        if (entry := self.get(file)) is not None:
+            stat = file.stat()
+            if (stat.st_size, stat.st_mtime_ns) == (entry["size"], entry["mtime_ns"]):
+                return entry["sha256"]
+        return file_hash(file)
+
+    def is_uploaded(self, file: pathlib.Path, uuid: str, sha256: str):
+        entry = self.get(file)
+        return entry is not None and entry["uuid"] == uuid and entry["sha256"] == sha256
+
+    def record(self, file: pathlib.Path, uuid: str, sha256: str):
+        self.entries[self.relative_path(file)] = self._make_entry(file, sha256, uuid=uuid)
+        self.dirty = True
+
+    def remove(self, file: pathlib.Path):
+        if self.entries.pop(self.relative_path(file), None) is not None:
+            self.dirty = True
+
+    def skip(self, file: pathlib.Path):
+        self.skipped_files += 1
+        self.skipped_bytes += file.stat().st_size
+
+    def iter_files(self, directory: pathlib.Path) -> t.Iterable[t.Tuple[pathlib.Path, dict]]:
+        """yield ``(file, entry)`` for every recorded file inside ``directory``"""
+        for _, entry in self._iter_entries(directory):
+            yield self.root.joinpath(entry["file"]), entry
 
 
 class DataDir:
     datasets: pathlib.Path = None
     scenarios: pathlib.Path = None
     views: pathlib.Path = None
+    manifest: t.Optional[DownloadManifest] = None
+    upload_ledger: t.Optional[UploadLedger] = None
 
     def __init__(self, path: pathlib.Path) -> None:
         self.path = path
@@ -62,6 +236,14 @@ class MoviciDataDir(DataDir):
     def _sentinel(self):
         return self.path.joinpath(MOVICI_DATADIR_SENTINEL)
 
+    @functools.cached_property
+    def manifest(self):
+        return DownloadManifest.load(self.path.joinpath(MOVICI_DOWNLOAD_MANIFEST), root=self.path)
+
+    @functools.cached_property
+    def upload_ledger(self):
+        return UploadLedger.load(self.path.joinpath(MOVICI_UPLOAD_LEDGER), root=self.path)
+
     def __eq__(self, other):
         if not isinstance(other, MoviciDataDir):
             return NotImplemented
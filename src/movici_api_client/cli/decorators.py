@@ -1,15 +1,15 @@
+from __future__ import annotations
+
 import asyncio
 import functools
 import typing as t
 
 import gimme
 
-from movici_api_client.api import Client, Response
 from movici_api_client.api.requests import CheckAuthToken
 from movici_api_client.cli.controllers.common import resolve_data_directory
 from movici_api_client.cli.cqrs import Event, Mediator
 
-from . import dependencies
 from .common import (
     OPTIONS_COMMAND,
     CLIParameters,
@@ -18,6 +18,7 @@ from .common import (
     has_options,
     set_options,
 )
+from .config import DOWNLOAD_FORMATS
 from .exceptions import (
     InvalidActiveProject,
     InvalidUsage,
@@ -29,13 +30,20 @@ from .ui import format_anything, format_table
 from .utils import (
     Choice,
     DirPath,
+    IntRange,
     assert_current_context,
+    auth_token_recently_checked,
     echo,
+    get_client,
     get_project_uuids,
     handle_movici_error,
     maybe_set_flag,
+    set_auth_token_checked,
 )
 
+if t.TYPE_CHECKING:
+    from movici_api_client.api import Response
+
 
 def catch_exceptions(func):
     """Decorator for catching (movici) exceptions, and handling them properly"""
@@ -51,17 +59,23 @@ def catch_exceptions(func):
 
 
 def authenticated(func):
+    """Check that the auth token is valid before running the command. Once checked, the token is
+    trusted for ``auth_check_interval`` seconds, so that short commands do not need an additional
+    request. Should the token expire during that time, the first failing request of the command
+    raises ``Unauthenticated`` (see ``main.handle_http_error``)
+    """
+
     def on_error(resp: Response):
         if resp.status_code == 401:
+            set_auth_token_checked(assert_current_context(), valid=False)
             raise Unauthenticated()
 
     @functools.wraps(func)
     def _decorated(*args, **kwargs):
-        client = dependencies.get(Client)
-
         context = assert_current_context()
-        if context.get("auth"):
-            client.request(CheckAuthToken(), on_error=on_error)
+        if context.get("auth") and not auth_token_recently_checked(context):
+            get_client().request(CheckAuthToken(), on_error=on_error)
+            set_auth_token_checked(context, valid=True)
         return func(*args, **kwargs)
 
     return _decorated
@@ -215,6 +229,20 @@ _CLI_OPTIONS = {
     ),
     "with_simulation": option("--with-simulation", is_flag=True),
     "with_views": option("--with-views", is_flag=True),
+    "jobs": option(
+        "-j",
+        "--jobs",
+        type=IntRange(min=1),
+        default=1,
+        help="Number of files to upload concurrently",
+    ),
+    "format": option(
+        "--format",
+        type=Choice(DOWNLOAD_FORMATS, case_sensitive=False),
+        default=None,
+        help="Preferred format of downloaded datasets and updates (default: context setting "
+        "'download_format' or json)",
+    ),
 }
 
 
@@ -231,8 +259,9 @@ def cli_options(*options: str):
             for option in options:
                 if option not in kwargs:
                     continue
-                result = kwargs.pop(option)
-                setattr(params, option, result)
+                # An option that was not given keeps its default, eg. from the context
+                if (result := kwargs.pop(option)) is not None:
+                    setattr(params, option, result)
             func(*args, **kwargs)
 
         return wrapped
@@ -261,6 +290,14 @@ def normalize_options(arguments: dict):
     return arguments
 
 
+def report_retries():
+    from movici_api_client.api import RetryPolicy
+
+    stats = gimme.that(RetryPolicy).stats
+    if stats.retries:
+        echo(f"Retried {stats.retries} failed requests", err=True)
+
+
 def handle_event(func=None, *, success_message=None):
     if func is None:
         return functools.partial(handle_event, success_message=success_message)
@@ -272,7 +309,10 @@ def handle_event(func=None, *, success_message=None):
             raise TypeError("A function decorated with 'handle_event' must return an Event")
 
         mediator = gimme.that(Mediator)
-        result = asyncio.run(mediator.send(event))
+        try:
+            result = asyncio.run(mediator.send(event))
+        finally:
+            report_retries()
         if success_message is not None:
             echo(success_message)
         return result
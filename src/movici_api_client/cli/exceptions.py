@@ -38,6 +38,13 @@ class InvalidConfigFile(InvalidFile):
     template = "Invalid config file [{msg}]: {file!s}"
 
 
+@dataclasses.dataclass
+class InvalidContextSetting(MoviciCLIError):
+    key: str
+    value: str
+    template = "Invalid value for context setting {key}: {value}"
+
+
 class NoCurrentContext(MoviciCLIError):
     template = "No context is activated, please activate a context using `movici config activate`"
 
@@ -1,4 +1,6 @@
 import asyncio
+import queue
+import threading
 import typing as t
 
 import gimme
@@ -9,6 +11,12 @@ from movici_api_client.cli.common import CLIParameters
 
 from ..utils import confirm
 
+DEFAULT_MAX_CONCURRENT_TASKS = 20
+MIN_WRITE_CHUNK_SIZE = 1024 * 1024
+MAX_WRITE_CHUNK_SIZE = 8 * 1024 * 1024
+
+T = t.TypeVar("T")
+
 
 class Task:
     client: IAsyncClient = gimme.attribute(IAsyncClient)
@@ -43,25 +51,162 @@ class SequentialTaskGroup(Task):
 
 
 class ParallelTaskGroup(Task):
-    def __init__(self, tasks: t.Iterable[Task], progress=False, description=None) -> None:
+    """Run tasks concurrently using a fixed pool of workers. Workers pull tasks lazily from
+    ``tasks`` so that at most ``max_concurrent`` tasks are in flight at any time, regardless of
+    the number of tasks. ``tasks`` may therefore be a (large) generator, or an async iterable
+    that produces tasks while they are being run. If ``tasks`` has no length, ``total`` may be
+    given to show a complete progress bar
+    """
+
+    def __init__(
+        self,
+        tasks: t.Union[t.Iterable[Task], t.AsyncIterable[Task]],
+        progress=False,
+        description=None,
+        max_concurrent=DEFAULT_MAX_CONCURRENT_TASKS,
+        total: t.Optional[int] = None,
+    ) -> None:
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
         self.tasks = tasks
         self.progress = progress
         self.description = description
+        self.max_concurrent = max_concurrent
+        self.total = total
 
     async def run(self) -> t.Optional[bool]:
-        tasks = [task.create_task() for task in self.tasks]
-        coros = asyncio.as_completed(tasks)
-
-        if self.progress:
-            coros = tqdm(coros, total=len(tasks), desc=self.description)
+        total = self.total
+        if total is None and isinstance(self.tasks, t.Sized):
+            total = len(self.tasks)
+        progress = tqdm(total=total, desc=self.description) if self.progress else None
+
+        if isinstance(self.tasks, t.AsyncIterable):
+            tasks = self.tasks.__aiter__()
+            lock = asyncio.Lock()
+
+            async def next_task():
+                # An async iterator may yield to the event loop, so workers take turns in waiting
+                # for the next task
+                async with lock:
+                    try:
+                        return await tasks.__anext__()
+                    except StopAsyncIteration:
+                        return None
+
+        else:
+            tasks = iter(self.tasks)
+
+            async def next_task():
+                # This is safe since ``next()`` never yields to the event loop
+                return next(tasks, None)
+
+        async def worker():
+            # All workers share the same iterator, pulling a new task only after finishing the
+            # previous one
+            while (task := await next_task()) is not None:
+                await task.run()
+                if progress is not None:
+                    progress.update()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrent)]
         try:
-            for coro in coros:
+            for coro in asyncio.as_completed(workers):
                 await coro
         finally:
-            for task in tasks:
-                if not task.done():
-                    task.cancel()
-            await asyncio.gather(*tasks, return_exceptions=True)
+            for worker_task in workers:
+                if not worker_task.done():
+                    worker_task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if hasattr(tasks, "aclose"):
+                await tasks.aclose()
+            if progress is not None:
+                progress.close()
+
+
+async def as_async_iterable(
+    items: t.Union[t.Iterable[T], t.AsyncIterable[T]]
+) -> t.AsyncIterator[T]:
+    if isinstance(items, t.AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class BufferedFileWriter:
+    """Writes data to a (binary) file object from a background thread, so that disk I/O does not
+    block the event loop. Incoming data is buffered into large chunks before it is handed to the
+    writer thread. The chunk size starts at ``min_chunk_size`` and doubles after every chunk up to
+    ``max_chunk_size``, so that small files are written immediately while large files are written
+    using few, large writes. At most ``max_pending`` chunks are queued for writing, after which
+    ``write`` waits for the writer thread to catch up.
+
+    Use as an async context manager, which flushes the remaining data and waits for the writer
+    thread to finish on exit. Errors raised while writing are reraised in the event loop
+    """
+
+    def __init__(
+        self,
+        fobj: t.BinaryIO,
+        min_chunk_size=MIN_WRITE_CHUNK_SIZE,
+        max_chunk_size=MAX_WRITE_CHUNK_SIZE,
+        max_pending=4,
+    ):
+        self.fobj = fobj
+        self.chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.buffer = bytearray()
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self.error: t.Optional[BaseException] = None
+
+    async def __aenter__(self):
+        self.thread.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # Also on error we write all data received so far, since it can be used to resume a
+        # download
+        try:
+            await self.flush()
+        finally:
+            await self._put(None)
+            await asyncio.get_running_loop().run_in_executor(None, self.thread.join)
+        self._raise_for_error()
+
+    async def write(self, data: bytes):
+        self._raise_for_error()
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_size:
+            await self.flush()
+            self.chunk_size = min(self.chunk_size * 2, self.max_chunk_size)
+
+    async def flush(self):
+        if self.buffer:
+            chunk, self.buffer = self.buffer, bytearray()
+            await self._put(chunk)
+
+    async def _put(self, chunk: t.Optional[bytes]):
+        try:
+            self.queue.put_nowait(chunk)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self.queue.put, chunk)
+
+    def _write_chunks(self):
+        while (chunk := self.queue.get()) is not None:
+            # After an error, we keep consuming the queue so that the event loop never blocks on
+            # a full queue
+            if self.error is not None:
+                continue
+            try:
+                self.fobj.write(chunk)
+            except BaseException as e:
+                self.error = e
+
+    def _raise_for_error(self):
+        if self.error is not None:
+            raise self.error
 
 
 def resolve_question_flag(flag, confirm_message):
@@ -1,14 +1,15 @@
 from __future__ import annotations
 
-import contextlib
-import json
+import asyncio
 import pathlib
 import shutil
 import typing as t
 
 from tqdm.auto import tqdm
 
-from movici_api_client.api.common import Request
+from movici_api_client.api import codec
+from movici_api_client.api.common import Request, with_headers
+from movici_api_client.api.compression import VerifyingDecoder, accept_encoding
 from movici_api_client.api.requests import (
     GetDatasetData,
     GetDatasets,
@@ -19,14 +20,41 @@ from movici_api_client.api.requests import (
     GetUpdates,
     GetViews,
 )
-from movici_api_client.cli.data_dir import DataDir
+from movici_api_client.cli.data_dir import DataDir, DownloadManifest
 
 from ..exceptions import InvalidFile
+from ..helpers import file_hash
 from ..utils import echo
-from .common import ParallelTaskGroup, Task, resolve_question_flag
+from .common import (
+    BufferedFileWriter,
+    ParallelTaskGroup,
+    Task,
+    as_async_iterable,
+    resolve_question_flag,
+)
+
+# The validator of an interrupted download is stored next to its ``.part`` file
+VALIDATOR_SUFFIX = ".validator"
 
 
 class DownloadResource(Task):
+    """Download a resource into ``file``, with an extension based on its content type. When a
+    ``manifest`` is given, the download is skipped if the resource with ``uuid`` has not changed
+    since it was last downloaded. A resource is unchanged if its ``version`` (eg. a
+    ``last_modified`` value from the resource listing) is equal to the one stored in the manifest,
+    or if the server responds with 304 Not Modified to a conditional request.
+
+    A preferred ``format`` (see ``ACCEPT``) may be requested, which the server uses if it
+    supports it. A resource that was downloaded before in a different format is downloaded again
+    and its previous file is removed
+    """
+
+    ACCEPT = {
+        "json": "application/json",
+        "msgpack": "application/msgpack, application/x-msgpack;q=0.9, application/json;q=0.5",
+    }
+    DEFAULT_FORMAT = "json"
+
     EXTENSIONS = {
         "application/json": ".json",
         "application/msgpack": ".msgpack",
@@ -38,6 +66,7 @@ class DownloadResource(Task):
         "text/plain": ".txt",
         "image/tiff": ".tif",
     }
+    DEFAULT_EXTENSION = ".dat"
 
     def __init__(
         self,
@@ -45,37 +74,203 @@ class DownloadResource(Task):
         request: Request,
         progress=True,
         continue_after_failed_overwrite=False,
+        manifest: t.Optional[DownloadManifest] = None,
+        uuid: t.Optional[str] = None,
+        version: t.Optional[str] = None,
+        format: t.Optional[str] = None,
     ) -> None:
         self.file = file
         self.request = request
         self.progress = progress
         self.continue_after_failed_overwrite = continue_after_failed_overwrite
+        self.manifest = manifest
+        self.uuid = uuid
+        self.version = version
+        self.format = format or self.DEFAULT_FORMAT
 
     async def run(self):
-        async with self.client.stream(self.request) as response:
+        # A download whose resume was rejected is started over, but only after its response has
+        # been closed. Otherwise the new request would wait for the concurrency slot that is
+        # still held by the rejected response
+        while (result := await self.download()) is None:
+            pass
+        return result
+
+    async def download(self) -> t.Optional[bool]:
+        """Returns ``None`` when the download must be started over"""
+        entry = previous = await self.get_manifest_entry()
+        if entry is not None and entry.get("format", self.DEFAULT_FORMAT) != self.format:
+            entry = None
+        if entry is not None and self.version is not None and entry.get("version") == self.version:
+            return True
+
+        # A download is first streamed into a ``.part`` file next to the target file, which is
+        # renamed once the download is complete. When a previous download was interrupted, we try
+        # to resume it using a Range request. The range is made conditional on the validator
+        # (ETag or Last-Modified) of the interrupted response, so that the server sends the whole
+        # resource if it has changed in the meantime. If the server does not honour the range, or
+        # we have no validator for the partial download, we start over. A compressed download
+        # cannot be resumed, since the range would apply to the compressed data
+        partial = self.find_partial_file()
+        if partial is not None and (validator := self.read_validator(partial)) is None:
+            self.discard_part_file(partial)
+            partial = None
+        offset = partial.stat().st_size if partial is not None else 0
+        if offset:
+            headers = {
+                "Range": f"bytes={offset}-",
+                "If-Range": validator,
+                "Accept-Encoding": "identity",
+            }
+        else:
+            headers = {"Accept-Encoding": accept_encoding()}
+            if entry is not None:
+                headers.update(self.conditional_headers(entry))
+        if self.format != self.DEFAULT_FORMAT:
+            headers["Accept"] = self.ACCEPT[self.format]
+        request = with_headers(self.request, headers)
+
+        async with self.client.stream(request, on_error=ignore_invalid_range) as response:
+            if response.status_code == 304:
+                return True
             file = self.file_with_suffix(response)
-            if not prepare_overwrite_file(file, self.params.overwrite):
+            part = self.part_file(file)
+            if offset and not self.can_resume(response, part, partial, offset):
+                self.discard_part_file(partial)
+                if response.status_code != 200:
+                    return None
+                offset = 0
+
+            # A file that we downloaded before (in any format) and that has not been modified
+            # locally can safely be overwritten with a newer version, unless overwriting was
+            # explicitly disabled
+            overwrite = self.params.overwrite
+            if overwrite is None and previous is not None:
+                overwrite = True
+            if not prepare_overwrite_file(file, overwrite):
                 return self.continue_after_failed_overwrite
-            fopen = open(file, "wb")
-            if self.progress:
-                context = tqdm.wrapattr(
-                    fopen,
-                    "write",
-                    miniters=1,
-                    desc=file.name,
-                    total=self.infer_file_size(response),
-                )
-            else:
-                context = contextlib.nullcontext(fopen)
-
-            with context as fout:
-                async for chunk in response.aiter_bytes(chunk_size=4096):
-                    fout.write(chunk)
+            await self.write_part_file(response, part, offset, desc=file.name)
+        part.replace(file)
+        self.validator_file(part).unlink(missing_ok=True)
+        await self.update_manifest(file, response)
+        if previous is not None and (old := self.manifest.root.joinpath(previous["file"])) != file:
+            old.unlink(missing_ok=True)
         return True
 
+    async def get_manifest_entry(self) -> t.Optional[dict]:
+        if self.manifest is None or self.uuid is None:
+            return None
+        entry, mtime_ns = await asyncio.get_running_loop().run_in_executor(
+            None, self.manifest.check_valid, self.uuid
+        )
+        # The manifest is shared by concurrent downloads, so it is only modified on the loop
+        return self.manifest.touch_valid(entry, mtime_ns)
+
+    async def update_manifest(self, file: pathlib.Path, response):
+        if self.manifest is None or self.uuid is None:
+            return
+        sha256 = await asyncio.get_running_loop().run_in_executor(None, file_hash, file)
+        self.manifest.set(
+            self.uuid,
+            file,
+            sha256=sha256,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            version=self.version,
+            format=self.format,
+        )
+
+    @staticmethod
+    def conditional_headers(entry: dict):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def write_part_file(self, response, part: pathlib.Path, offset: int, desc=None):
+        progress = tqdm(
+            total=offset + self.infer_file_size(response),
+            initial=offset,
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+            miniters=1,
+            desc=desc,
+            disable=not self.progress,
+        )
+        # We decode the response ourselves, so that a truncated compressed download is detected
+        decoder = VerifyingDecoder(response.headers.get("content-encoding"))
+        resumable = not decoder.compressed and self.accepts_ranges(response)
+        if not offset:
+            self.write_validator(part, self.range_validator(response) if resumable else None)
+        try:
+            with open(part, "ab" if offset else "wb") as fout, progress:
+                async with BufferedFileWriter(fout) as writer:
+                    async for chunk in response.aiter_raw():
+                        await writer.write(decoder.decode(chunk))
+                        progress.update(len(chunk))
+                    await writer.write(decoder.flush())
+        except BaseException:
+            # Only keep a partial download if we can resume it later
+            if not resumable:
+                self.discard_part_file(part)
+            raise
+
+    def find_partial_file(self) -> t.Optional[pathlib.Path]:
+        for suffix in {*self.EXTENSIONS.values(), self.DEFAULT_EXTENSION}:
+            part = self.part_file(self.file.with_suffix(suffix))
+            if part.is_file():
+                return part
+        return None
+
+    @staticmethod
+    def can_resume(response, part, partial, offset):
+        if response.status_code != 206 or part != partial:
+            return False
+        content_range = response.headers.get("content-range", "")
+        return content_range.startswith(f"bytes {offset}-")
+
+    @staticmethod
+    def part_file(file: pathlib.Path):
+        return file.with_name(file.name + ".part")
+
+    @staticmethod
+    def validator_file(part: pathlib.Path):
+        return part.with_name(part.name + VALIDATOR_SUFFIX)
+
+    def read_validator(self, part: pathlib.Path) -> t.Optional[str]:
+        try:
+            return self.validator_file(part).read_text() or None
+        except FileNotFoundError:
+            return None
+
+    def write_validator(self, part: pathlib.Path, validator: t.Optional[str]):
+        file = self.validator_file(part)
+        if validator is None:
+            file.unlink(missing_ok=True)
+        else:
+            file.write_text(validator)
+
+    def discard_part_file(self, part: pathlib.Path):
+        part.unlink(missing_ok=True)
+        self.validator_file(part).unlink(missing_ok=True)
+
+    @staticmethod
+    def range_validator(response) -> t.Optional[str]:
+        # If-Range only accepts a strong ETag or a Last-Modified date
+        if (etag := response.headers.get("etag")) and not etag.startswith("W/"):
+            return etag
+        return response.headers.get("last-modified")
+
+    @staticmethod
+    def accepts_ranges(response):
+        return response.headers.get("accept-ranges", "none").lower() == "bytes"
+
     def file_with_suffix(self, response):
         return self.file.with_suffix(
-            self.EXTENSIONS.get(response.headers.get("content-type"), ".dat")
+            self.EXTENSIONS.get(response.headers.get("content-type"), self.DEFAULT_EXTENSION)
         )
 
     @staticmethod
@@ -87,86 +282,129 @@ class DownloadResource(Task):
 
 
 class RecursivelyDownloadResource(Task):
+    # When streaming, ``create_subtasks`` receives the resources as an async iterable that yields
+    # them while they are being received, instead of a list. ``create_subtasks`` may then also
+    # be an async generator
+    stream_resources = False
+
     def __init__(
         self,
         parent: dict,
         directory: DataDir,
         progress=True,
+        save_manifest=True,
     ) -> None:
         self.parent = parent
         self.directory = directory
         self.progress = progress
+        # Nested downloads leave saving the manifest to the outermost download, so that it is
+        # written only once
+        self.save_manifest = save_manifest
 
     async def run(self):
-        async with self.client:
-            all_resources = await self.client.request(self.request_all())
-
-            for task in self.create_subtasks(all_resources):
-                result = await task.run()
-                if result is False:
-                    return
+        try:
+            async with self.client:
+                if self.stream_resources:
+                    all_resources = self.iter_all()
+                else:
+                    all_resources = await self.client.request(self.request_all())
+
+                async for task in as_async_iterable(self.create_subtasks(all_resources)):
+                    result = await task.run()
+                    if result is False:
+                        return
+        finally:
+            if self.save_manifest and self.directory.manifest is not None:
+                self.directory.manifest.save()
 
     def request_all(self):
         raise NotImplementedError
 
-    def create_subtasks(self, resources: t.List[dict]) -> t.Iterable[Task]:
+    def iter_all(self) -> t.AsyncIterable[dict]:
+        return self.client.iterate(self.request_all())
+
+    def create_subtasks(
+        self, resources: t.Union[t.List[dict], t.AsyncIterable[dict]]
+    ) -> t.Union[t.Iterable[Task], t.AsyncIterable[Task]]:
         raise NotImplementedError
 
 
 class DownloadDatasets(RecursivelyDownloadResource):
+    stream_resources = True
+
     def request_all(self):
         return GetDatasets(self.parent["uuid"])
 
-    def create_subtasks(self, resources: t.List[dict]) -> t.Iterable[t.Iterable[Task]]:
-        yield from (
-            DownloadResource(
-                file=self.directory.datasets.joinpath(ds["name"]),
-                request=GetDatasetData(ds["uuid"]),
-                progress=self.progress,
-                continue_after_failed_overwrite=True,
-            )
-            for ds in resources
-            if ds["has_data"]
-        )
+    async def create_subtasks(self, resources: t.AsyncIterable[dict]) -> t.AsyncIterator[Task]:
+        async for ds in resources:
+            if ds["has_data"]:
+                yield DownloadResource(
+                    file=self.directory.datasets.joinpath(ds["name"]),
+                    request=GetDatasetData(ds["uuid"]),
+                    progress=self.progress,
+                    continue_after_failed_overwrite=True,
+                    manifest=self.directory.manifest,
+                    uuid=ds["uuid"],
+                    version=ds.get("last_modified"),
+                    format=self.params.format,
+                )
 
 
 class DownloadScenarios(RecursivelyDownloadResource):
+    stream_resources = True
+
     def request_all(self):
         return GetScenarios(self.parent["uuid"])
 
-    def create_subtasks(self, resources: t.List[dict]) -> t.Iterable[t.Iterable[Task]]:
+    def create_subtasks(self, resources: t.AsyncIterable[dict]) -> t.Iterable[t.Iterable[Task]]:
         yield ParallelTaskGroup(
-            (DownloadSingleScenario(parent=r, directory=self.directory) for r in resources),
+            self.download_scenarios(resources),
             progress=False,
             description="Downloading scenarios",
         )
 
+    async def download_scenarios(
+        self, scenarios: t.AsyncIterable[dict]
+    ) -> t.AsyncIterator[DownloadSingleScenario]:
+        async for r in scenarios:
+            yield DownloadSingleScenario(parent=r, directory=self.directory, save_manifest=False)
+
 
 class DownloadSingleScenario(RecursivelyDownloadResource):
+    """Download a scenario and (optionally) its updates. The updates are streamed, so that they
+    are downloaded while the list of updates is still being received"""
+
+    stream_resources = True
+
     def request_all(self):
         return GetUpdates(self.parent["uuid"])
 
-    def create_subtasks(self, resources: t.List[dict]) -> t.Iterable[t.Iterable[Task]]:
+    def iter_all(self) -> t.AsyncIterable[dict]:
+        # A timeline can have very many updates, which are streamed even when the service does
+        # not support pagination
+        return self.client.stream_items(self.request_all())
+
+    def create_subtasks(self, resources: t.AsyncIterable[dict]) -> t.Iterable[t.Iterable[Task]]:
         name, uuid = self.parent["name"], self.parent["uuid"]
+        manifest = self.directory.manifest
         yield DownloadResource(
             file=self.directory.scenarios.joinpath(name),
             request=GetSingleScenario(uuid),
             progress=False,
+            manifest=manifest,
+            uuid=uuid,
+            version=self.parent.get("last_modified"),
         )
         if self.params.with_simulation:
             simulation_dir = self.directory.ensure_simulation_dir(name)
-            yield PrepareOverwriteDirectory(simulation_dir)
+            if manifest is None:
+                yield PrepareOverwriteDirectory(simulation_dir)
+            else:
+                sync = SyncSimulationDirectory(simulation_dir, manifest)
+                yield sync
+                resources = sync.track(resources)
             yield ParallelTaskGroup(
-                (
-                    DownloadResource(
-                        file=simulation_dir.joinpath(
-                            f"t{r['timestamp']}_{r['iteration']}_{r['name']}"
-                        ),
-                        request=GetSingleUpdate(r["uuid"]),
-                        progress=False,
-                    )
-                    for r in resources
-                ),
+                self.download_updates(resources, simulation_dir),
                 progress=self.progress,
                 description=name,
             )
@@ -176,6 +414,21 @@ class DownloadSingleScenario(RecursivelyDownloadResource):
                 directory=self.directory,
             )
 
+    async def download_updates(
+        self, updates: t.AsyncIterable[dict], simulation_dir: pathlib.Path
+    ) -> t.AsyncIterator[DownloadResource]:
+        async for r in updates:
+            yield DownloadResource(
+                file=simulation_dir.joinpath(update_file_name(r)),
+                request=GetSingleUpdate(r["uuid"]),
+                progress=False,
+                manifest=self.directory.manifest,
+                uuid=r["uuid"],
+                # Updates cannot be modified, so its uuid identifies its content
+                version=r["uuid"],
+                format=self.params.format,
+            )
+
 
 class DownloadViews(Task):
     def __init__(
@@ -198,23 +451,28 @@ class DownloadViews(Task):
         file = directory.joinpath(name).with_suffix(".json")
         if not prepare_overwrite_file(file, self.params.overwrite):
             return
-        file.write_text(json.dumps(view, indent=2))
+        file.write_bytes(codec.dumps(view, pretty=True))
 
 
 class DownloadProject(RecursivelyDownloadResource):
+    # The projects are not used, so they are never requested
+    stream_resources = True
+
     def request_all(self):
         return GetProjects()
 
-    def create_subtasks(self, resources: t.List[dict]) -> t.Iterable[Task]:
+    def create_subtasks(self, resources: t.AsyncIterable[dict]) -> t.Iterable[Task]:
         yield DownloadDatasets(
             parent=self.parent,
             directory=self.directory,
             progress=self.progress,
+            save_manifest=False,
         )
         yield DownloadScenarios(
             self.parent,
             directory=self.directory,
             progress=False,
+            save_manifest=False,
         )
 
 
@@ -246,6 +504,81 @@ class PrepareOverwriteDirectory(Task):
         return True
 
 
+class SyncSimulationDirectory(PrepareOverwriteDirectory):
+    """Prepare a simulation directory for an incremental download. Update files that are no longer
+    part of the scenario's timeline are removed, so that only new updates need to be downloaded.
+    When the directory contains files that are not tracked by the manifest, we cannot do an
+    incremental download and fall back to overwriting the whole directory.
+
+    When the uuids of the updates to ``keep`` are not known up front, ``track`` removes the stale
+    files while the updates of the timeline are being received
+    """
+
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        manifest: DownloadManifest,
+        keep: t.Optional[t.Collection[str]] = None,
+    ):
+        super().__init__(directory)
+        self.manifest = manifest
+        self.keep = keep
+
+    async def run(self):
+        tracked = dict(self.manifest.iter_files(self.directory))
+        if self.directory.is_dir():
+            tracked_files = set(tracked.values())
+            if any(
+                file not in tracked_files and file.suffix not in (".part", VALIDATOR_SUFFIX)
+                for file in self.directory.iterdir()
+            ):
+                for uuid in tracked:
+                    self.manifest.remove(uuid)
+                return await super().run()
+
+        if self.keep is not None:
+            self.remove_stale(self.keep)
+        return True
+
+    async def track(self, updates: t.AsyncIterable[dict]) -> t.AsyncIterator[dict]:
+        """Pass on ``updates`` while removing the files of stale updates. A stale file that would
+        be replaced by one of the updates is removed before the update is passed on, the other
+        stale files are removed once all updates have been received"""
+        # The extension of a file depends on the content type of the update
+        by_stem = {
+            file.with_suffix(""): uuid for uuid, file in self.manifest.iter_files(self.directory)
+        }
+        keep = set()
+        async for update in updates:
+            keep.add(update["uuid"])
+            stem = self.directory.joinpath(update_file_name(update)).with_suffix("")
+            if (uuid := by_stem.pop(stem, update["uuid"])) != update["uuid"]:
+                self.remove(uuid)
+            yield update
+        self.remove_stale(keep)
+
+    def remove_stale(self, keep: t.Collection[str]):
+        for uuid, _ in list(self.manifest.iter_files(self.directory)):
+            if uuid not in keep:
+                self.remove(uuid)
+
+    def remove(self, uuid: str):
+        if (entry := self.manifest.get(uuid)) is not None:
+            self.manifest.root.joinpath(entry["file"]).unlink(missing_ok=True)
+        self.manifest.remove(uuid)
+
+
+def update_file_name(update: dict):
+    return f"t{update['timestamp']}_{update['iteration']}_{update['name']}"
+
+
+def ignore_invalid_range(resp):
+    # A 416 response means that our partial download is not valid for the resource anymore.
+    # DownloadResource handles this by starting over, so we don't want to raise an error
+    if resp.status_code == 416:
+        return False
+
+
 def prepare_overwrite_file(file: pathlib.Path, overwrite: t.Optional[bool] = None):
     if file.exists():
         overwrite = resolve_question_flag(
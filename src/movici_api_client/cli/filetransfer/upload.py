@@ -1,17 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import collections
 import contextlib
 import pathlib
 import re
 import typing as t
 
+import gimme
 from tqdm.auto import tqdm
-from tqdm.utils import CallbackIOWrapper
 
 from movici_api_client.api import IAsyncClient
 from movici_api_client.api.requests import (
     AddDatasetData,
+    CommitDatasetUpload,
     CreateDataset,
+    CreateDatasetUpload,
     CreateScenario,
     CreateTimeline,
     CreateUpdate,
@@ -19,20 +23,27 @@ from movici_api_client.api.requests import (
     DeleteTimeline,
     GetDatasets,
     GetDatasetTypes,
+    GetDatasetUpload,
     GetScenarios,
     GetSingleScenario,
     GetViews,
     ModifiyDatasetData,
     UpdateScenario,
     UpdateView,
+    UploadDatasetChunk,
 )
-from movici_api_client.cli.data_dir import DataDir, MoviciDataDir, ScenariosDirectory
+from movici_api_client.cli.cache import UploadSessions
+from movici_api_client.cli.data_dir import DataDir, MoviciDataDir, ScenariosDirectory, UploadLedger
 
-from ..exceptions import InvalidFile, InvalidResource
+from ..exceptions import CustomError, InvalidFile, InvalidResource
 from ..helpers import read_json_file
 from ..utils import echo, prompt_choices_async, validate_uuid
 from .common import ParallelTaskGroup, Task, resolve_question_flag
 
+CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_UNSUPPORTED_STATUS_CODES = {404, 405, 501}
+
 
 class UploadResource(Task):
     def __init__(
@@ -41,7 +52,9 @@ class UploadResource(Task):
         parent_uuid: str,
         strategy: UploadStrategy,
         name_or_uuid: t.Optional[str] = None,
-        all_resources: t.Optional[t.Sequence[dict]] = None,
+        all_resources: t.Optional[t.List[dict]] = None,
+        locks: t.Optional[t.Dict[str, asyncio.Lock]] = None,
+        ledger: t.Optional[UploadLedger] = None,
     ) -> None:
 
         self.file = file
@@ -49,26 +62,56 @@ class UploadResource(Task):
         self.name_or_uuid = name_or_uuid
         self.all_resources = all_resources
         self.strategy = strategy
+        self.locks = locks
+        self.ledger = ledger
 
     async def run(self) -> t.Optional[bool]:
-        async with self.client:
+        # When uploading concurrently, multiple files may resolve to the same resource. We hold a
+        # lock per resource so that a resource is only created once, after which other files see
+        # it as an existing resource
+        async with self.client, self.get_lock():
             name, existing = await self.get_existing()
+            sha256 = await hash_file(self.ledger, self.file)
 
             if not existing:
                 if self.determine_create_new(self.params.create, name):
-                    return await self.strategy.create_new(
+                    uuid = await self.strategy.create_new(
                         self.parent_uuid,
                         file=self.file,
                         name=name,
                         inspect=self.params.inspect,
                     )
+                    if uuid is not None:
+                        self.all_resources.append({"uuid": uuid, "name": name, "has_data": True})
+                        self.record_upload(uuid, sha256)
+                    return uuid
+
+            if not self.params.overwrite and self.is_unchanged(existing, sha256):
+                self.ledger.skip(self.file)
+                return existing["uuid"]
 
             if self.strategy.require_overwrite_question(existing) and not self.determine_overwrite(
                 self.params.overwrite, name
             ):
                 return
 
-            return await self.strategy.update_existing(existing, self.file, self.params.inspect)
+            uuid = await self.strategy.update_existing(existing, self.file, self.params.inspect)
+            self.record_upload(uuid, sha256)
+            return uuid
+
+    def is_unchanged(self, existing: dict, sha256: t.Optional[str]):
+        if self.ledger is None or not existing.get("has_data", True):
+            return False
+        return self.ledger.is_uploaded(self.file, existing["uuid"], sha256)
+
+    def record_upload(self, uuid: t.Optional[str], sha256: t.Optional[str]):
+        if self.ledger is not None and uuid is not None:
+            self.ledger.record(self.file, uuid, sha256)
+
+    def get_lock(self) -> asyncio.Lock:
+        if self.locks is None:
+            return asyncio.Lock()
+        return self.locks[self.name_or_uuid or self.file.stem]
 
     async def ensure_all_resources(self):
         if self.all_resources is None:
@@ -121,25 +164,42 @@ class UploadMultipleResources(Task):
         directory: DataDir,
         parent_uuid: str,
         strategy: UploadStrategy = None,
+        ledger: t.Optional[UploadLedger] = None,
     ):
         self.directory = directory
         self.parent_uuid = parent_uuid
         self.strategy = strategy
+        self.ledger = ledger if ledger is not None else getattr(directory, "upload_ledger", None)
 
     async def run(self) -> t.Optional[bool]:
-        all_resources = await self.strategy.get_all(self.parent_uuid)
-        async with self.client:
-            for file in tqdm(
-                list(self.strategy.iter_files(self.directory)),
-                desc=f"Processing {self.strategy.resource_type} files",
-            ):
-                task = self.strategy.upload_task(
-                    file=file,
-                    parent_uuid=self.parent_uuid,
-                    all_resources=all_resources,
-                    strategy=self.strategy,
-                )
-                await task.run()
+        jobs = self.params.jobs or 1
+        # Individual progress bars would clobber each other when uploading concurrently
+        self.strategy.progress = jobs == 1
+        try:
+            async with self.client:
+                all_resources = await self.strategy.get_all(self.parent_uuid)
+                files = list(self.strategy.iter_files(self.directory))
+                locks = collections.defaultdict(asyncio.Lock)
+                await ParallelTaskGroup(
+                    (
+                        self.strategy.upload_task(
+                            file=file,
+                            parent_uuid=self.parent_uuid,
+                            all_resources=all_resources,
+                            strategy=self.strategy,
+                            locks=locks,
+                            ledger=self.ledger,
+                        )
+                        for file in files
+                    ),
+                    progress=True,
+                    description=f"Processing {self.strategy.resource_type} files",
+                    max_concurrent=jobs,
+                    total=len(files),
+                ).run()
+        finally:
+            if self.ledger is not None:
+                self.ledger.save()
 
 
 class UploadScenario(Task):
@@ -150,12 +210,16 @@ class UploadScenario(Task):
         name_or_uuid=None,
         all_resources=None,
         strategy: UploadStrategy = None,
+        locks: t.Optional[t.Dict[str, asyncio.Lock]] = None,
+        ledger: t.Optional[UploadLedger] = None,
     ):
         self.file = file
         self.parent_uuid = parent_uuid
         self.name_or_uuid = name_or_uuid
         self.all_resources = all_resources
         self.strategy = strategy or ScenarioUploadStrategy(self.client)
+        self.locks = locks
+        self.ledger = ledger
 
     async def run(self) -> t.Optional[bool]:
         uuid = await UploadResource(
@@ -164,6 +228,8 @@ class UploadScenario(Task):
             strategy=self.strategy,
             name_or_uuid=self.name_or_uuid,
             all_resources=self.all_resources,
+            locks=self.locks,
+            ledger=self.ledger,
         ).run()
         if uuid is None:
             return
@@ -186,6 +252,7 @@ class UploadScenario(Task):
             scenario_dir,
             parent_uuid=uuid,
             scenario=scenario,
+            ledger=self.ledger,
         )
 
     async def upload_views(self, uuid):
@@ -196,6 +263,7 @@ class UploadScenario(Task):
             directory=movici_dir,
             parent_uuid=uuid,
             strategy=strategy,
+            ledger=self.ledger,
         ).run()
 
 
@@ -208,25 +276,66 @@ class UploadTimeline(Task):
         directory: DataDir,
         parent_uuid: str,
         scenario: dict = None,
+        ledger: t.Optional[UploadLedger] = None,
     ):
         self.client = client
         self.directory = directory
         self.parent_uuid = parent_uuid
         self.scenario = scenario
+        self.ledger = ledger
 
     async def run(self) -> t.Optional[bool]:
         async with self.client:
             scenario = await self.ensure_scenario()
-            await self.recreate_timeline(scenario)
+            files = list(self.directory.iter_updates(scenario["name"]))
+            hashes = await self.hash_files(files)
+            # An explicit overwrite uploads all updates again, even if they are unchanged
+            to_upload = None if self.params.overwrite else self.get_new_updates(scenario, hashes)
+            if to_upload is None:
+                await self.recreate_timeline(scenario)
+                to_upload = hashes
+
             await ParallelTaskGroup(
                 (
-                    UploadUpdate(self.parent_uuid, file)
-                    for file in self.directory.iter_updates(scenario["name"])
+                    UploadUpdate(self.parent_uuid, file, sha256=sha256, ledger=self.ledger)
+                    for file, sha256 in to_upload.items()
                 ),
                 progress=True,
                 description=self.scenario["name"],
+                total=len(to_upload),
             ).run()
 
+    async def hash_files(
+        self, files: t.List[pathlib.Path]
+    ) -> t.Dict[pathlib.Path, t.Optional[str]]:
+        hashes = dict.fromkeys(files)
+        if self.ledger is not None:
+            await ParallelTaskGroup(
+                (HashFile(file, hashes, self.ledger) for file in files), total=len(files)
+            ).run()
+        return hashes
+
+    def get_new_updates(self, scenario: dict, hashes: t.Dict[pathlib.Path, str]):
+        """Updates cannot be modified or removed individually. If all previously uploaded update
+        files are unchanged, the existing timeline can be extended with only the new update files.
+        Otherwise returns ``None`` and the timeline must be recreated
+        """
+        if self.ledger is None or not scenario.get("has_timeline") or not hashes:
+            return None
+        directory = next(iter(hashes)).parent
+        uploaded = {
+            file: entry
+            for file, entry in self.ledger.iter_files(directory)
+            if entry["uuid"] == self.parent_uuid
+        }
+        if not uploaded or any(hashes.get(f) != e["sha256"] for f, e in uploaded.items()):
+            for file in uploaded:
+                self.ledger.remove(file)
+            return None
+        for file in uploaded:
+            self.ledger.skip(file)
+        return {file: sha256 for file, sha256 in hashes.items() if file not in uploaded}
+
     async def recreate_timeline(self, scenario: dict):
         if scenario.get("has_timeline"):
             await self.client.request(DeleteTimeline(self.parent_uuid))
@@ -239,10 +348,35 @@ class UploadTimeline(Task):
         return self.scenario
 
 
+class HashFile(Task):
+    """Stores the hash of ``file`` in ``hashes``"""
+
+    def __init__(
+        self,
+        file: pathlib.Path,
+        hashes: t.Dict[pathlib.Path, t.Optional[str]],
+        ledger: t.Optional[UploadLedger] = None,
+    ) -> None:
+        self.file = file
+        self.hashes = hashes
+        self.ledger = ledger
+
+    async def run(self) -> t.Optional[bool]:
+        self.hashes[self.file] = await hash_file(self.ledger, self.file)
+
+
 class UploadUpdate(Task):
-    def __init__(self, parent_uuid: str, file: pathlib.Path) -> None:
+    def __init__(
+        self,
+        parent_uuid: str,
+        file: pathlib.Path,
+        sha256: t.Optional[str] = None,
+        ledger: t.Optional[UploadLedger] = None,
+    ) -> None:
         self.parent_uuid = parent_uuid
         self.file = file
+        self.sha256 = sha256
+        self.ledger = ledger
 
     async def run(self) -> t.Optional[bool]:
         try:
@@ -251,6 +385,8 @@ class UploadUpdate(Task):
             echo(f"Error reading {self.file}: {e!s}", err=True)
             return
         await self.client.request(CreateUpdate(self.parent_uuid, payload))
+        if self.ledger is not None:
+            self.ledger.record(self.file, self.parent_uuid, self.sha256)
 
     def prepare_payload(self) -> t.Optional[dict]:
         try:
@@ -293,6 +429,103 @@ class UploadProject(Task):
                 parent_uuid=self.uuid,
                 strategy=strategy,
             ).run()
+        if (ledger := self.directory.upload_ledger) is not None and ledger.skipped_files:
+            echo(
+                f"Skipped {ledger.skipped_files} unchanged files "
+                f"({format_size(ledger.skipped_bytes)})"
+            )
+
+
+class ChunkedUploadUnsupported(Exception):
+    pass
+
+
+class UploadSessionExpired(Exception):
+    pass
+
+
+class ChunkedUpload(Task):
+    """Upload the data of a dataset in chunks. Failed chunks are retried according to the
+    client's ``RetryPolicy``. The upload session is persisted, so that an interrupted upload of
+    the same, unchanged file resumes where it left off. The data is only replaced when the upload
+    is committed after the last chunk. Raises ``ChunkedUploadUnsupported`` when the server does
+    not support chunked uploads
+    """
+
+    sessions: UploadSessions = gimme.attribute(UploadSessions)
+
+    def __init__(
+        self,
+        uuid: str,
+        file: pathlib.Path,
+        overwrite=False,
+        on_progress: t.Optional[t.Callable[[int], None]] = None,
+        chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE,
+    ) -> None:
+        self.uuid = uuid
+        self.file = file
+        self.overwrite = overwrite
+        self.on_progress = on_progress
+        self.chunk_size = chunk_size
+
+    async def run(self) -> t.Optional[bool]:
+        size = self.file.stat().st_size
+        upload_uuid, chunk_size, offset = await self.resume()
+        if upload_uuid is None:
+            upload_uuid, chunk_size = await self.start(size)
+        self.report_progress(offset)
+
+        loop = asyncio.get_running_loop()
+        with open(self.file, "rb") as fobj:
+            while offset < size:
+                data = await loop.run_in_executor(None, read_chunk, fobj, offset, chunk_size)
+                if not data:
+                    raise InvalidFile("file changed while uploading", self.file)
+                result = await self.client.request(
+                    UploadDatasetChunk(self.uuid, upload_uuid, offset, data, size)
+                )
+                if (received := result["offset"]) <= offset:
+                    raise CustomError(f"Server did not accept data of '{self.file.name}'")
+                self.report_progress(received - offset)
+                offset = received
+
+        await self.client.request(CommitDatasetUpload(self.uuid, upload_uuid))
+        self.sessions.remove(self.uuid)
+        return True
+
+    async def resume(self) -> t.Tuple[t.Optional[str], int, int]:
+        if (session := self.sessions.get(self.uuid, self.file)) is None:
+            return None, self.chunk_size, 0
+
+        def on_error(resp):
+            if resp.status_code == 404:
+                raise UploadSessionExpired()
+
+        try:
+            result = await self.client.request(
+                GetDatasetUpload(self.uuid, session["upload_uuid"]), on_error=on_error
+            )
+        except UploadSessionExpired:
+            self.sessions.remove(self.uuid)
+            return None, self.chunk_size, 0
+        return session["upload_uuid"], session["chunk_size"], result["offset"]
+
+    async def start(self, size: int) -> t.Tuple[str, int]:
+        def on_error(resp):
+            if resp.status_code in CHUNKED_UPLOAD_UNSUPPORTED_STATUS_CODES:
+                raise ChunkedUploadUnsupported()
+
+        result = await self.client.request(
+            CreateDatasetUpload(self.uuid, self.file.name, size, overwrite=self.overwrite),
+            on_error=on_error,
+        )
+        upload_uuid, chunk_size = result["upload_uuid"], result.get("chunk_size", self.chunk_size)
+        self.sessions.set(self.uuid, self.file, upload_uuid, chunk_size)
+        return upload_uuid, chunk_size
+
+    def report_progress(self, num_bytes: int):
+        if self.on_progress is not None and num_bytes:
+            self.on_progress(num_bytes)
 
 
 class UploadStrategy:
@@ -300,6 +533,7 @@ class UploadStrategy:
     messages: dict
     resource_type: str = "resource"
     upload_task: t.Type[Task] = UploadResource
+    progress: bool = True
 
     def __init__(self, client: IAsyncClient):
         self.client = client
@@ -324,9 +558,18 @@ class DatasetUploadStrategy(UploadStrategy):
     extensions = {".json", ".msgpack", ".csv", ".nc", ".tiff", ".tif", ".geotif", ".geotif"}
     resource_type = "dataset"
 
-    def __init__(self, client: IAsyncClient, all_dataset_types=None):
+    def __init__(
+        self,
+        client: IAsyncClient,
+        all_dataset_types=None,
+        chunked_upload_threshold: t.Optional[int] = CHUNKED_UPLOAD_THRESHOLD,
+    ):
         super().__init__(client)
         self.all_dataset_types = all_dataset_types
+        self.prompt_lock: t.Optional[asyncio.Lock] = None
+        # Files of at least this size are uploaded in chunks. ``None`` disables chunked uploads,
+        # which also happens when the server turns out not to support them
+        self.chunked_upload_threshold = chunked_upload_threshold
 
     def iter_files(self, directory: DataDir):
         yield from directory.iter_datasets()
@@ -380,17 +623,32 @@ class DatasetUploadStrategy(UploadStrategy):
         if not self.all_dataset_types:
             echo(f"Could not determine dataset type for '{file.name}'")
             return
-        return await prompt_choices_async(
-            f"\nPlease specify the type for dataset '{file.name}'", self.all_dataset_types
-        )
+        # only ask one question at a time when uploading concurrently
+        if self.prompt_lock is None:
+            self.prompt_lock = asyncio.Lock()
+        async with self.prompt_lock:
+            return await prompt_choices_async(
+                f"\nPlease specify the type for dataset '{file.name}'", self.all_dataset_types
+            )
 
     async def upload_new_data(self, uuid, file):
-        with read_file_progress_bar(file) as fobj:
-            return await self.client.request(AddDatasetData(uuid, fobj))
+        return await self.upload_data(uuid, file, overwrite=False)
 
     async def upload_existing_data(self, uuid, file):
-        with read_file_progress_bar(file) as fobj:
-            return await self.client.request(ModifiyDatasetData(uuid, fobj))
+        return await self.upload_data(uuid, file, overwrite=True)
+
+    async def upload_data(self, uuid: str, file: pathlib.Path, overwrite: bool):
+        with upload_progress_bar(file, disable=not self.progress) as progress:
+            threshold = self.chunked_upload_threshold
+            if threshold is not None and file.stat().st_size >= threshold:
+                try:
+                    return await ChunkedUpload(
+                        uuid, file, overwrite=overwrite, on_progress=progress
+                    ).run()
+                except ChunkedUploadUnsupported:
+                    self.chunked_upload_threshold = None
+            request_type = ModifiyDatasetData if overwrite else AddDatasetData
+            return await self.client.request(request_type(uuid, file, on_progress=progress))
 
 
 class ScenarioUploadStrategy(UploadStrategy):
@@ -454,10 +712,31 @@ class ViewUploadStrategy(UploadStrategy):
         return payload
 
 
+def read_chunk(fobj: t.BinaryIO, offset: int, size: int):
+    fobj.seek(offset)
+    return fobj.read(size)
+
+
+async def hash_file(ledger: t.Optional[UploadLedger], file: pathlib.Path) -> t.Optional[str]:
+    if ledger is None:
+        return None
+    return await asyncio.get_running_loop().run_in_executor(None, ledger.hash_file, file)
+
+
+def format_size(num_bytes: int):
+    return tqdm.format_sizeof(num_bytes, suffix="B", divisor=1024)
+
+
 @contextlib.contextmanager
-def read_file_progress_bar(file: pathlib.Path):
-    with open(file, "rb") as fobj, tqdm(
-        total=file.stat().st_size, unit="B", unit_scale=True, unit_divisor=1024, desc=file.name
+def upload_progress_bar(file: pathlib.Path, disable=False):
+    """Yields a callback that advances the progress bar by a number of bytes"""
+    with tqdm(
+        total=file.stat().st_size,
+        unit="B",
+        unit_scale=True,
+        unit_divisor=1024,
+        desc=file.name,
+        disable=disable,
     ) as t:
-        yield CallbackIOWrapper(t.update, fobj, "read")
+        yield t.update
         t.reset()
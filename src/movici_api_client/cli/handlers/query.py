@@ -1,7 +1,16 @@
+import typing as t
+
 import gimme
 
 from movici_api_client.api.client import AsyncClient
-from movici_api_client.api.requests import GetDatasets, GetProjects, GetScenarios, GetScopes
+from movici_api_client.api.requests import (
+    GetDatasets,
+    GetProjects,
+    GetScenarios,
+    GetScopes,
+    GetViews,
+)
+from movici_api_client.cli.cache import MetadataCache
 from movici_api_client.cli.exceptions import InvalidResource
 from movici_api_client.cli.utils import validate_uuid
 
@@ -9,27 +18,51 @@ from movici_api_client.cli.utils import validate_uuid
 class ResourceQuery:
     resource_type = "resource"
     client: AsyncClient = gimme.attribute(AsyncClient)
+    cache: MetadataCache = gimme.attribute(MetadataCache)
 
     def request_all(self):
         raise NotImplementedError
 
+    @property
+    def cache_key(self) -> t.Optional[str]:
+        return None
+
     async def get_uuid(self, name_or_uuid):
         return (
             name_or_uuid if validate_uuid(name_or_uuid) else await self.assert_uuid(name_or_uuid)
         )
 
-    async def get_uuids(self):
+    async def get_uuids(self, use_cache=True):
+        if use_cache and (cached := self.get_cached_uuids()) is not None:
+            return cached
         request = self.request_all()
         all_resources = await self.client.request(request)
-        return {p["name"]: p["uuid"] for p in all_resources}
+        return self.update_cache(all_resources)
+
+    def get_cached_uuids(self) -> t.Optional[dict]:
+        if self.cache_key is None:
+            return None
+        return self.cache.get(self.cache_key)
+
+    def update_cache(self, all_resources: t.List[dict]) -> dict:
+        uuids = {p["name"]: p["uuid"] for p in all_resources or ()}
+        if self.cache_key is not None:
+            self.cache.set(self.cache_key, uuids)
+        return uuids
 
     async def by_name_or_uuid(self, name_or_uuid):
+        """Always requests the resources from the server, since the cache only contains the
+        resources' uuids"""
         request = self.request_all()
         all_resources = await self.client.request(request)
+        self.update_cache(all_resources)
         return self.get_from_list(name_or_uuid, all_resources)
 
     async def assert_uuid(self, name_or_uuid):
-        resources = await self.get_uuids()
+        resources = self.get_cached_uuids()
+        if resources is None or name_or_uuid not in resources:
+            # the resource may have been created after the cache was last updated
+            resources = await self.get_uuids(use_cache=False)
         try:
             return resources[name_or_uuid]
         except KeyError:
@@ -50,6 +83,10 @@ class ProjectQuery(ResourceQuery):
     def request_all(self):
         return GetProjects()
 
+    @property
+    def cache_key(self):
+        return "projects"
+
 
 class ScopeQuery(ResourceQuery):
     resource_type = "scope"
@@ -57,6 +94,10 @@ class ScopeQuery(ResourceQuery):
     def request_all(self):
         return GetScopes()
 
+    @property
+    def cache_key(self):
+        return "scopes"
+
 
 class DatasetQuery(ResourceQuery):
     resource_type = "dataset"
@@ -67,6 +108,10 @@ class DatasetQuery(ResourceQuery):
     def request_all(self):
         return GetDatasets(self.project_uuid)
 
+    @property
+    def cache_key(self):
+        return f"datasets:{self.project_uuid}"
+
 
 class ScenarioQuery(ResourceQuery):
     resource_type = "scenario"
@@ -76,3 +121,21 @@ class ScenarioQuery(ResourceQuery):
 
     def request_all(self):
         return GetScenarios(self.project_uuid)
+
+    @property
+    def cache_key(self):
+        return f"scenarios:{self.project_uuid}"
+
+
+class ViewQuery(ResourceQuery):
+    resource_type = "view"
+
+    def __init__(self, scenario_uuid: str):
+        self.scenario_uuid = scenario_uuid
+
+    def request_all(self):
+        return GetViews(self.scenario_uuid)
+
+    @property
+    def cache_key(self):
+        return f"views:{self.scenario_uuid}"
@@ -1,10 +1,14 @@
 import asyncio
+import functools
 import typing as t
 
+import gimme
+
 from movici_api_client.api import requests as req
 from movici_api_client.api.client import AsyncClient
 
 from .. import filetransfer as ft
+from ..cache import MetadataCache
 from ..common import CLIParameters
 from ..cqrs import Event, EventHandler, Mediator
 from ..events.authorization import CreateScope, DeleteScope, GetScopes
@@ -69,14 +73,38 @@ async def _valid_project_uuid_from_context(mediator: Mediator):
     proj_name = context.get("project")
     if not proj_name:
         raise NoActiveProject()
-    projects = await mediator.send(GetAllProjects())
-    projects_dict = {p["name"]: p["uuid"] for p in projects}
+    query = ProjectQuery()
+    projects_dict = query.get_cached_uuids()
+    if projects_dict is None or proj_name not in projects_dict:
+        projects_dict = query.update_cache(await mediator.send(GetAllProjects()))
     try:
         return projects_dict[proj_name]
     except KeyError:
         raise InvalidActiveProject(proj_name)
 
 
+def invalidates_cache(*keys: str):
+    """Class decorator for handlers that create, modify or delete resources. After handling an
+    event, the given keys are removed from the ``MetadataCache``. Keys are formatted using the
+    handler's attributes, eg: ``"datasets:{project_uuid}"``
+    """
+
+    def decorator(cls: t.Type[EventHandler]):
+        original = cls.handle
+
+        @functools.wraps(original)
+        async def handle(self, event: Event, mediator: Mediator):
+            try:
+                return await original(self, event, mediator)
+            finally:
+                gimme.that(MetadataCache).invalidate(*(key.format_map(vars(self)) for key in keys))
+
+        cls.handle = handle
+        return cls
+
+    return decorator
+
+
 class RemoteEventHandler(EventHandler):
     def __init__(self, client: AsyncClient, params: CLIParameters) -> None:
         self.client = client
@@ -87,7 +115,9 @@ class RemoteGetAllProjectsHandler(RemoteEventHandler):
     __event__ = GetAllProjects
 
     async def handle(self, event: GetAllProjects, mediator: Mediator):
-        return await self.client.request(req.GetProjects())
+        result = await self.client.request(req.GetProjects())
+        ProjectQuery().update_cache(result)
+        return result
 
 
 class RemoteGetSingleProjectHandler(RemoteEventHandler):
@@ -98,6 +128,7 @@ class RemoteGetSingleProjectHandler(RemoteEventHandler):
         return await self.client.request(req.GetSingleProject(uuid))
 
 
+@invalidates_cache("projects", "scopes")
 class RemoteCreateProjectHandler(RemoteEventHandler):
     __event__ = CreateProject
 
@@ -124,6 +155,7 @@ class RemoteUpdateProjectHandler(RemoteEventHandler):
             )
 
 
+@invalidates_cache("projects", "scopes")
 class RemoteDeleteProjectHandler(RemoteEventHandler):
     __event__ = DeleteProject
 
@@ -149,6 +181,7 @@ class RemoteDeleteProjectHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("datasets:{project_uuid}", "scenarios:{project_uuid}")
 class RemoteUploadProjectHandler(RemoteEventHandler):
     __event__ = UploadProject
     project_uuid: str
@@ -177,7 +210,11 @@ class RemoteGetDatasetTypesHandler(RemoteEventHandler):
     __event__ = GetDatasetTypes
 
     async def handle(self, event: GetDatasetTypes, mediator: Mediator):
-        return await self.client.request(req.GetDatasetTypes())
+        cache = gimme.that(MetadataCache)
+        if (result := cache.get("dataset_types")) is None:
+            result = await self.client.request(req.GetDatasetTypes())
+            cache.set("dataset_types", result)
+        return result
 
 
 @requires_valid_project_uuid
@@ -186,7 +223,9 @@ class RemoteGetAllDatasetsHandler(RemoteEventHandler):
     project_uuid: str
 
     async def handle(self, event: GetAllDatasets, mediator: Mediator):
-        return await self.client.request(req.GetDatasets(project_uuid=self.project_uuid))
+        result = await self.client.request(req.GetDatasets(project_uuid=self.project_uuid))
+        DatasetQuery(self.project_uuid).update_cache(result)
+        return result
 
 
 @requires_valid_project_uuid
@@ -200,6 +239,7 @@ class RemoteGetSingleDatasetHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("datasets:{project_uuid}")
 class RemoteCreateDatasetHandler(RemoteEventHandler):
     __event__ = CreateDataset
     project_uuid: str
@@ -222,6 +262,7 @@ class RemoteCreateDatasetHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("datasets:{project_uuid}")
 class RemoteUpdateDatasetHandler(RemoteEventHandler):
     __event__ = UpdateDataset
     project_uuid: str
@@ -239,6 +280,7 @@ class RemoteUpdateDatasetHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("datasets:{project_uuid}")
 class RemoteDeleteDatasetHandler(RemoteEventHandler):
     __event__ = DeleteDataset
     project_uuid: str
@@ -269,6 +311,7 @@ class RemoteClearDatasetHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("datasets:{project_uuid}")
 class RemoteUploadDatasetHandler(RemoteEventHandler):
     __event__ = UploadDataset
     project_uuid: str
@@ -283,6 +326,7 @@ class RemoteUploadDatasetHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("datasets:{project_uuid}")
 class RemoteUploadMultipleDatasetsHandler(RemoteEventHandler):
     __event__ = UploadMultipleDatasets
     project_uuid: str
@@ -306,6 +350,7 @@ class RemoteDownloadDatasetHandler(RemoteEventHandler):
         return await ft.DownloadResource(
             file=file,
             request=req.GetDatasetData(dataset["uuid"]),
+            format=self.params.format,
         )
 
 
@@ -322,6 +367,7 @@ class RemoteDownloadMultipleDatasets(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("datasets:{project_uuid}")
 class RemoteEditDataset(RemoteEventHandler):
     __event__ = EditDataset
     project_uuid: str
@@ -339,7 +385,9 @@ class RemoteGetAllScenariosHandler(RemoteEventHandler):
     project_uuid: str
 
     async def handle(self, event: GetAllScenarios, mediator: Mediator):
-        return await self.client.request(req.GetScenarios(project_uuid=self.project_uuid))
+        result = await self.client.request(req.GetScenarios(project_uuid=self.project_uuid))
+        ScenarioQuery(self.project_uuid).update_cache(result)
+        return result
 
 
 @requires_valid_project_uuid
@@ -353,6 +401,7 @@ class RemoteGetSingleScenarioHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("scenarios:{project_uuid}")
 class RemoteCreateScenarioHandler(RemoteEventHandler):
     __event__ = CreateScenario
     project_uuid: str
@@ -362,6 +411,7 @@ class RemoteCreateScenarioHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("scenarios:{project_uuid}")
 class RemoteDeleteScenarioHandler(RemoteEventHandler):
     __event__ = DeleteScenario
     project_uuid: str
@@ -445,6 +495,7 @@ async def wait_until_simulation_is_reset(client: AsyncClient, uuid, interval=1):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("scenarios:{project_uuid}")
 class RemoteUploadScenarioHandler(RemoteEventHandler):
     __event__ = UploadScenario
     project_uuid: str
@@ -458,6 +509,7 @@ class RemoteUploadScenarioHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("scenarios:{project_uuid}")
 class RemoteUploadMultipleScenariosHandler(RemoteEventHandler):
     __event__ = UploadMultipleScenarios
     project_uuid: str
@@ -495,6 +547,7 @@ class RemoteDownloadMultipleScenariosHandler(RemoteEventHandler):
 
 
 @requires_valid_project_uuid
+@invalidates_cache("scenarios:{project_uuid}")
 class RemoteEditScenarioHandler(RemoteEventHandler):
     __event__ = EditScenario
     project_uuid: str
@@ -510,9 +563,12 @@ class RemoteGetScopesHandler(RemoteEventHandler):
     __event__ = GetScopes
 
     async def handle(self, event: GetScopes, mediator: Mediator):
-        return await self.client.request(req.GetScopes())
+        result = await self.client.request(req.GetScopes())
+        ScopeQuery().update_cache(result)
+        return result
 
 
+@invalidates_cache("scopes")
 class RemoteCreateScopeHandler(RemoteEventHandler):
     __event__ = CreateScope
 
@@ -520,6 +576,7 @@ class RemoteCreateScopeHandler(RemoteEventHandler):
         return await self.client.request(req.CreateScope(event.name))
 
 
+@invalidates_cache("scopes")
 class RemoteDeleteScopeHandler(RemoteEventHandler):
     __event__ = DeleteScope
 
@@ -1,10 +1,13 @@
 import contextlib
+import hashlib
 import json
 import os
 import pathlib
 import tempfile
 from subprocess import call
 
+from movici_api_client.api import codec
+
 from .exceptions import InvalidEditor, InvalidFile, InvalidFileEdit, NoChangeDetected
 
 
@@ -12,13 +15,32 @@ def read_json_file(file: pathlib.Path) -> dict:
     if not file.is_file():
         raise InvalidFile("not a file")
     try:
-        return json.loads(file.read_text())
+        return codec.loads(file.read_bytes())
     except IOError:
         raise InvalidFile("read error", file)
     except json.JSONDecodeError:
         raise InvalidFile("invalid json", file)
 
 
+def write_json_atomic(file: pathlib.Path, contents: dict, pretty=False):
+    """Write a json file by replacing it with a temporary file, so that it is never left half
+    written"""
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(codec.dumps(contents, pretty=pretty))
+    tmp.replace(file)
+
+
+def file_hash(file: pathlib.Path, chunk_size=1024 * 1024) -> str:
+    """Calculate the sha256 hash of a file. This is a blocking operation, for large files it is
+    best run in a thread"""
+    sha = hashlib.sha256()
+    with open(file, "rb") as fobj:
+        while chunk := fobj.read(chunk_size):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
 def edit_resource(resource: dict, editor=None, editor_env="EDITOR", default_editor="vim"):
     EDITOR = editor or os.environ.get(editor_env, default_editor)
 
@@ -1,19 +1,39 @@
+from __future__ import annotations
+
+import atexit
+import functools
+import importlib.util
 import pathlib
+import sys
+import typing as t
 from json import JSONDecodeError
 
 import gimme
-import httpx
 
-from movici_api_client.api import Client, HTTPError, MoviciTokenAuth, Response
-from movici_api_client.api.client import AsyncClient
-from movici_api_client.api.common import parse_service_urls
+from movici_api_client.api.common import Service, parse_service_urls
+from movici_api_client.cli.cache import MetadataCache, UploadSessions
+from movici_api_client.cli.common import CLIParameters
 from movici_api_client.cli.cqrs import Mediator
 from movici_api_client.cli.data_dir import MoviciDataDir
-from movici_api_client.cli.exceptions import InvalidResource
-from movici_api_client.cli.handlers import REMOTE_HANDLERS
+from movici_api_client.cli.exceptions import (
+    InvalidContextSetting,
+    InvalidResource,
+    Unauthenticated,
+)
 
 from . import dependencies
-from .config import Config, get_config, write_config
+from .config import (
+    COMPRESSION_CODECS,
+    DOWNLOAD_FORMATS,
+    TRACE_FORMATS,
+    Config,
+    Context,
+    get_config,
+    parse_bool,
+    parse_choice,
+    parse_number,
+    write_config,
+)
 from .controllers.login import LoginController
 from .decorators import argument, authenticated, command, option
 from .utils import (
@@ -22,30 +42,270 @@ from .utils import (
     assert_context,
     assert_current_context,
     echo,
+    get_client,
     get_project_uuids,
     prompt_choices,
+    set_auth_token_checked,
 )
 
+if t.TYPE_CHECKING:
+    from movici_api_client.api import Client, Response, RetryPolicy
+    from movici_api_client.api.compression import Compression
+    from movici_api_client.api.tracing import JSONLinesExporter
+
+DEFAULT_MAX_CONCURRENT_REQUESTS = 10
+DEFAULT_MAX_ADAPTIVE_CONCURRENCY = 64
+DEFAULT_MAX_RETRIES = 3
+
+# These are the default connection limits of httpx
+DEFAULT_CONNECTION_LIMITS = {
+    "max_connections": (parse_number, 100),
+    "max_keepalive_connections": (parse_number, 20),
+    "keepalive_expiry": (functools.partial(parse_number, tp=float), 5.0),
+}
+
+
+# The client and everything it needs (most notably ``httpx``) is only imported once the
+# dependencies are set up, so that showing the help of the CLI does not import them. The type hints
+# of the ``setup_*`` functions are resolved by ``gimme`` using the registered classes
+
+
+def setup_dependencies(use_cache=True):
+    from movici_api_client.api import AsyncClient, Client, RetryPolicy
 
-def setup_dependencies():
     gimme.register(Config, get_config)
+    gimme.register(RetryPolicy, setup_retry_policy)
     gimme.register(Client, setup_client)
-    gimme.register(AsyncClient, AsyncClient.from_sync_client)
+    gimme.register(AsyncClient, setup_async_client)
     gimme.register(Mediator, setup_mediator)
+    gimme.register(MetadataCache, setup_cache if use_cache else MetadataCache)
+    gimme.register(UploadSessions, setup_upload_sessions)
+    gimme.register(CLIParameters, setup_cli_parameters)
 
 
-def setup_client(config: Config):
+def setup_retry_policy(config: Config):
+    from movici_api_client.api import RetryPolicy
+
+    context = config.current_context
+    if context is None:
+        return RetryPolicy()
+    return RetryPolicy(
+        max_retries=parse_context_setting(
+            context, "max_retries", parse_number, DEFAULT_MAX_RETRIES
+        )
+    )
+
+
+def setup_client(config: Config, retry: RetryPolicy):
+    from httpx import Timeout
+
+    from movici_api_client.api import Client, MoviciTokenAuth
+
     context = config.current_context
 
     if context is None:
         return Client()
     auth = MoviciTokenAuth(auth_token=context.get("auth_token")) if context.get("auth") else False
-    return Client(
+    client = Client(
         base_url=context.url,
         auth=auth,
         on_error=handle_http_error,
         service_urls=parse_service_urls(context, prefix="service."),
-        client=httpx.Client(timeout=httpx.Timeout(10.0, read=60.0)),
+        timeout=Timeout(10.0, read=60.0),
+        retry=retry,
+        rate_limits=setup_rate_limits(context),
+        compression=setup_compression(context),
+        hooks=setup_request_hooks(context),
+        **parse_connection_options(context),
+    )
+    if auth:
+        auth.on_expired = functools.partial(reauthenticate, client, context)
+    return client
+
+
+def setup_async_client(client: Client, config: Config):
+    from movici_api_client.api import AsyncClient
+
+    context = config.current_context
+    return AsyncClient.from_sync_client(
+        client,
+        coalesce_requests=True,
+        limiter=setup_concurrency_limiter(context),
+        service_limiters=setup_service_limiters(context) if context is not None else None,
+    )
+
+
+def setup_rate_limits(context: Context):
+    """Requests to a service are limited to ``rate_limit.<service>`` requests per second, with
+    bursts of up to ``rate_burst.<service>`` requests (default: one second worth of requests)"""
+    from movici_api_client.api import TokenBucket
+
+    rv = {}
+    for name, service in Service.by_name().items():
+        rate_key, burst_key = f"rate_limit.{name}", f"rate_burst.{name}"
+        if (
+            rate := parse_context_setting(
+                context, rate_key, functools.partial(parse_number, tp=float)
+            )
+        ) is None:
+            continue
+        burst = parse_context_setting(context, burst_key, parse_number, max(1, int(rate)))
+        try:
+            rv[service] = TokenBucket(rate, burst)
+        except ValueError:
+            raise InvalidContextSetting(*((burst_key, burst) if rate > 0 else (rate_key, rate)))
+    return rv
+
+
+def setup_service_limiters(context: Context):
+    """Requests to a service are limited to ``max_concurrent_requests.<service>`` concurrent
+    requests, in addition to the overall concurrency limit"""
+    from movici_api_client.api import ConcurrencyLimiter
+
+    rv = {}
+    for name, service in Service.by_name().items():
+        key = f"max_concurrent_requests.{name}"
+        if (limit := parse_context_setting(context, key, parse_number)) is None:
+            continue
+        try:
+            rv[service] = ConcurrencyLimiter(limit)
+        except ValueError:
+            raise InvalidContextSetting(key, limit)
+    return rv
+
+
+def setup_concurrency_limiter(context: t.Optional[Context]):
+    """By default, the number of concurrent requests adapts to the capacity of the server,
+    between ``min_concurrent_requests`` and ``max_concurrent_requests``. When
+    ``adaptive_concurrency`` is disabled, ``max_concurrent_requests`` is a fixed limit"""
+    from movici_api_client.api import AdaptiveConcurrencyLimiter, ConcurrencyLimiter
+
+    if context is None:
+        return ConcurrencyLimiter(DEFAULT_MAX_CONCURRENT_REQUESTS)
+    if not parse_context_setting(context, "adaptive_concurrency", parse_bool, True):
+        return ConcurrencyLimiter(
+            parse_context_setting(
+                context, "max_concurrent_requests", parse_number, DEFAULT_MAX_CONCURRENT_REQUESTS
+            )
+        )
+    min_limit = parse_context_setting(context, "min_concurrent_requests", parse_number, 1)
+    max_limit = parse_context_setting(
+        context, "max_concurrent_requests", parse_number, DEFAULT_MAX_ADAPTIVE_CONCURRENCY
+    )
+    try:
+        return AdaptiveConcurrencyLimiter(
+            initial_limit=DEFAULT_MAX_CONCURRENT_REQUESTS, min_limit=min_limit, max_limit=max_limit
+        )
+    except ValueError:
+        raise InvalidContextSetting("min_concurrent_requests", min_limit)
+
+
+def setup_compression(context: Context) -> t.Optional[Compression]:
+    """Request bodies are only compressed when a ``compression`` codec is configured, since the
+    server must support it"""
+    from movici_api_client.api.compression import Compression, supported_codecs
+
+    codec = parse_context_setting(
+        context, "compression", functools.partial(parse_choice, choices=COMPRESSION_CODECS)
+    )
+    if codec in (None, "none"):
+        return None
+    if codec == "zstd" and "zstd" not in supported_codecs():
+        echo(
+            "zstd compression requires the 'zstandard' package, falling back to gzip",
+            err=True,
+        )
+        codec = "gzip"
+    level = parse_context_setting(context, "compression_level", parse_number)
+    try:
+        return Compression(codec, level=level)
+    except ValueError:
+        raise InvalidContextSetting("compression_level", level)
+
+
+def setup_request_hooks(context: Context) -> t.Optional[JSONLinesExporter]:
+    """When a ``trace_file`` is configured, every request is appended to it as a line of JSON,
+    in the ``trace_format`` (``trace`` or ``otlp`` for OpenTelemetry spans)"""
+    from movici_api_client.api import JSONLinesExporter
+
+    if (trace_file := context.get("trace_file")) is None:
+        return None
+    trace_format = parse_context_setting(
+        context,
+        "trace_format",
+        functools.partial(parse_choice, choices=TRACE_FORMATS),
+        "trace",
+    )
+    try:
+        exporter = JSONLinesExporter(pathlib.Path(trace_file).expanduser(), format=trace_format)
+    except OSError:
+        raise InvalidContextSetting("trace_file", trace_file)
+    # The synchronous client is never closed, so the traces of the last requests are written when
+    # the command exits
+    atexit.register(exporter.close)
+    return exporter
+
+
+def parse_connection_options(context: Context):
+    """Read the HTTP/2 and connection pool settings from a context. Settings that are not
+    configured keep the ``httpx`` defaults"""
+    http2 = parse_context_setting(context, "http2", parse_bool, False)
+    if http2 and importlib.util.find_spec("h2") is None:
+        echo(
+            "HTTP/2 requires the 'h2' package (pip install httpx[http2]), "
+            "falling back to HTTP/1.1",
+            err=True,
+        )
+        http2 = False
+
+    limits = None
+    if any(context.get(key) is not None for key in DEFAULT_CONNECTION_LIMITS):
+        from httpx import Limits
+
+        limits = Limits(
+            **{
+                key: parse_context_setting(context, key, parse, default)
+                for key, (parse, default) in DEFAULT_CONNECTION_LIMITS.items()
+            }
+        )
+    return {"http2": http2, "limits": limits}
+
+
+def parse_context_setting(context: Context, key: str, parse: callable, default=None):
+    if (value := context.get(key)) is None:
+        return default
+    try:
+        return parse(value)
+    except ValueError:
+        raise InvalidContextSetting(key, value)
+
+
+def setup_cache(config: Config):
+    context = config.current_context
+
+    if context is None:
+        return MetadataCache()
+    return MetadataCache.from_context(context)
+
+
+def setup_upload_sessions(config: Config):
+    context = config.current_context
+
+    if context is None:
+        return UploadSessions()
+    return UploadSessions.from_context(context)
+
+
+def setup_cli_parameters(config: Config):
+    """Command line options that are not given default to their context settings"""
+    context = config.current_context
+
+    if context is None:
+        return CLIParameters()
+    return CLIParameters(
+        format=parse_context_setting(
+            context, "download_format", functools.partial(parse_choice, choices=DOWNLOAD_FORMATS)
+        )
     )
 
 
@@ -53,13 +313,17 @@ def setup_mediator(config: Config):
     context = config.current_context
 
     if context is not None and not context.get("local"):
+        # The handlers import all file transfer code, which is not needed by most commands
+        from movici_api_client.cli.handlers import REMOTE_HANDLERS
+
         return Mediator(REMOTE_HANDLERS)
     return Mediator()
 
 
 @option("project_override", "-p", "--project", default="")
-def main(project_override):
-    setup_dependencies()
+@option("--no-cache", is_flag=True, help="Do not use cached resource metadata")
+def main(project_override, no_cache):
+    setup_dependencies(use_cache=not no_cache)
 
     config = gimme.that(Config)
     context = config.current_context
@@ -68,7 +332,23 @@ def main(project_override):
         context["project"] = project_override
 
 
+def reauthenticate(client: Client, context: Context) -> t.Optional[str]:
+    """Login again when the auth token expires during a command, so that the command can
+    continue. This is only possible when the user can be asked for their credentials"""
+    if not sys.stdin.isatty():
+        return None
+    echo(f"Authentication expired, login to {context.url}:")
+    LoginController(client, context).login(ask_username=False)
+    write_config()
+    return context["auth_token"]
+
+
 def handle_http_error(resp: Response):
+    if resp.status_code == 401:
+        # The auth token may have expired since it was last checked
+        if (context := dependencies.get(Config).current_context) is not None:
+            set_auth_token_checked(context, valid=False)
+        raise Unauthenticated()
     try:
         msg = resp.json()
     except JSONDecodeError:
@@ -79,6 +359,8 @@ def handle_http_error(resp: Response):
 
 
 def handle_global_error(exc: Exception):
+    from movici_api_client.api import HTTPError
+
     if isinstance(exc, HTTPError):
         echo(f"A HTTP Error occured: {type(exc).__name__}({exc!s})")
     else:
@@ -88,11 +370,13 @@ def handle_global_error(exc: Exception):
 @command
 @option("-U", "--user", "ask_username", is_flag=True, help="always ask for a username")
 def login(ask_username):
-    client = dependencies.get(Client)
+    client = get_client()
     context = assert_current_context()
     echo(f"Login to {context.url}:")
     LoginController(client, context).login(ask_username)
     write_config()
+    # a different user may have access to different resources
+    dependencies.get(MetadataCache).clear()
     echo("Success!")
 
 
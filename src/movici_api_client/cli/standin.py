@@ -0,0 +1,741 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import dataclasses
+import hashlib
+import mimetypes
+import random
+import re
+import secrets
+import time
+import typing as t
+import uuid
+from urllib.parse import parse_qsl
+
+import httpx
+
+from movici_api_client.api import codec
+from movici_api_client.api.common import Service
+
+# A local, in memory stand-in of the Movici platform, implementing the endpoints that are used in
+# ``movici_api_client.api.requests``. Its responses can be degraded by ``Faults`` (latency,
+# bandwidth, errors and throttling) to exercise concurrency, retries and streaming end-to-end
+# without a live platform. Use it as an ASGI app (``python -m movici_api_client.cli.standin``
+# requires ``uvicorn``), or in process through a ``StandInTransport``:
+#
+#     server = StandInServer(Faults(latency=0.05))
+#     transport = StandInTransport(server)
+#     client = AsyncClient(
+#         "http://standin",
+#         client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+#     )
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DATASET_TYPES = ("antenna_point_set", "flooding_tape", "height_map", "parameters", "road_network")
+
+
+@dataclasses.dataclass
+class Faults:
+    """Degrades the responses of a ``StandInServer``. Every response is delayed by ``latency``
+    plus a random ``jitter`` (in seconds), and request and response bodies are transferred at
+    ``bandwidth`` bytes per second. A random fraction of requests (``throttle_rate``) is rejected
+    with 429 Too Many Requests and a ``Retry-After`` header, and another fraction
+    (``error_rate``) fails with 503 Service Unavailable. Rejected requests do not modify any data
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: t.Optional[float] = None
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: t.Optional[float] = 1.0
+    seed: t.Optional[int] = None
+
+
+@dataclasses.dataclass
+class StandInRequest:
+    method: str
+    path: str
+    params: t.Dict[str, str] = dataclasses.field(default_factory=dict)
+    # lower case header names
+    headers: t.Dict[str, str] = dataclasses.field(default_factory=dict)
+    body: bytes = b""
+
+    def json(self):
+        return codec.loads(self.body) if self.body else {}
+
+
+@dataclasses.dataclass
+class StandInResponse:
+    status_code: int
+    body: bytes = b""
+    headers: t.Dict[str, str] = dataclasses.field(default_factory=dict)
+
+
+class NotFound(Exception):
+    pass
+
+
+class StandInServer:
+    """Keeps all resources in memory. When ``users`` (a mapping of username to password) is
+    given, every request except logging in requires a session token. Otherwise any credentials
+    can be used to log in and requests do not need to be authenticated. ``stats`` counts the
+    ``requests``, the ``bytes_received`` and ``bytes_sent`` and the injected ``errors`` and
+    ``throttled`` responses
+    """
+
+    def __init__(
+        self,
+        faults: t.Optional[Faults] = None,
+        users: t.Optional[t.Dict[str, str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.faults = faults or Faults()
+        self.random = random.Random(self.faults.seed)
+        self.users = users
+        self.chunk_size = chunk_size
+        self.stats: t.Counter[str] = collections.Counter()
+        self.tokens: t.Set[str] = set()
+        self.scopes: t.Dict[str, dict] = {}
+        self.projects: t.Dict[str, dict] = {}
+        self.datasets: t.Dict[str, dict] = {}
+        # dataset uuid -> (content, content type)
+        self.data: t.Dict[str, t.Tuple[bytes, str]] = {}
+        self.uploads: t.Dict[str, dict] = {}
+        self.scenarios: t.Dict[str, dict] = {}
+        self.timelines: t.Dict[str, t.List[dict]] = {}
+        self.updates: t.Dict[str, bytes] = {}
+        self.views: t.Dict[str, dict] = {}
+        self.simulations: t.Dict[str, dict] = {}
+        self.routes = [
+            (method, re.compile(service.value[1] + pattern + "/?"), handler)
+            for service, routes in self.make_routes().items()
+            for method, pattern, handler in routes
+        ]
+
+    def make_routes(self):
+        uuid = r"(?P<uuid>[^/]+)"
+        upload = r"(?P<upload>[^/]+)"
+        return {
+            Service.AUTH: [
+                ("POST", "user/login", self.login),
+                ("GET", "auth", self.check_auth),
+                ("GET", "scopes", self.get_scopes),
+                ("POST", "scopes", self.create_scope),
+                ("DELETE", f"scopes/{uuid}", self.delete_scope),
+            ],
+            Service.DATA_ENGINE: [
+                ("GET", "projects", self.get_projects),
+                ("POST", "projects", self.create_project),
+                ("GET", f"projects/{uuid}", self.get_project),
+                ("PUT", f"projects/{uuid}", self.update_project),
+                ("DELETE", f"projects/{uuid}", self.delete_project),
+                ("GET", f"projects/{uuid}/datasets", self.get_datasets),
+                ("POST", f"projects/{uuid}/datasets", self.create_dataset),
+                ("GET", f"datasets/{uuid}", self.get_dataset),
+                ("PUT", f"datasets/{uuid}", self.update_dataset),
+                ("DELETE", f"datasets/{uuid}", self.delete_dataset),
+                ("GET", f"datasets/{uuid}/data", self.get_data),
+                ("POST", f"datasets/{uuid}/data", self.add_data),
+                ("DELETE", f"datasets/{uuid}/data", self.delete_data),
+                ("POST", f"datasets/{uuid}/uploads", self.create_upload),
+                ("GET", f"datasets/{uuid}/uploads/{upload}", self.get_upload),
+                ("PUT", f"datasets/{uuid}/uploads/{upload}", self.upload_chunk),
+                ("POST", f"datasets/{uuid}/uploads/{upload}/commit", self.commit_upload),
+                ("GET", f"projects/{uuid}/scenarios", self.get_scenarios),
+                ("POST", f"projects/{uuid}/scenarios", self.create_scenario),
+                ("GET", f"scenarios/{uuid}", self.get_scenario),
+                ("PUT", f"scenarios/{uuid}", self.update_scenario),
+                ("DELETE", f"scenarios/{uuid}", self.delete_scenario),
+                ("POST", f"scenarios/{uuid}/timeline", self.create_timeline),
+                ("DELETE", f"scenarios/{uuid}/timeline", self.delete_timeline),
+                ("GET", f"scenarios/{uuid}/updates", self.get_updates),
+                ("POST", f"scenarios/{uuid}/updates", self.create_update),
+                ("GET", f"updates/{uuid}", self.get_update),
+                ("GET", f"scenarios/{uuid}/views", self.get_views),
+                ("POST", f"scenarios/{uuid}/views", self.create_view),
+                ("GET", f"views/{uuid}", self.get_view),
+                ("PUT", f"views/{uuid}", self.update_view),
+                ("DELETE", f"views/{uuid}", self.delete_view),
+                ("GET", "schema/dataset_types", self.get_dataset_types),
+            ],
+            Service.MODEL_ENGINE: [
+                ("GET", f"simulations/{uuid}", self.get_simulation),
+                ("POST", f"simulations/{uuid}", self.run_simulation),
+                ("DELETE", f"simulations/{uuid}", self.delete_simulation),
+            ],
+        }
+
+    def respond(self, request: StandInRequest) -> StandInResponse:
+        """Handles a request without any delays, see ``delay`` and ``iter_body``"""
+        self.stats["requests"] += 1
+        self.stats["bytes_received"] += len(request.body)
+        response = self.inject_fault() or self.dispatch(request)
+        self.stats["bytes_sent"] += len(response.body)
+        return response
+
+    def dispatch(self, request: StandInRequest) -> StandInResponse:
+        for method, pattern, handler in self.routes:
+            if (match := pattern.fullmatch(request.path)) is None:
+                continue
+            if method != request.method:
+                continue
+            if handler != self.login and not self.is_authenticated(request):
+                return json_response({"error": "unauthenticated"}, 401)
+            try:
+                return handler(request, **match.groupdict())
+            except NotFound:
+                break
+            except (KeyError, TypeError, ValueError) as e:
+                return json_response({"error": f"invalid request: {e!s}"}, 400)
+        return json_response({"error": "not found"}, 404)
+
+    def inject_fault(self) -> t.Optional[StandInResponse]:
+        faults, draw = self.faults, self.random.random()
+        if draw < faults.throttle_rate:
+            self.stats["throttled"] += 1
+            headers = {}
+            if faults.retry_after is not None:
+                headers["retry-after"] = f"{faults.retry_after:g}"
+            return json_response({"error": "too many requests"}, 429, headers)
+        if draw < faults.throttle_rate + faults.error_rate:
+            self.stats["errors"] += 1
+            return json_response({"error": "service unavailable"}, 503)
+        return None
+
+    def delay(self, request_size: int = 0) -> float:
+        """The time until the response starts, which includes receiving the request body"""
+        delay = self.faults.latency + self.random.uniform(0, self.faults.jitter)
+        if self.faults.bandwidth:
+            delay += request_size / self.faults.bandwidth
+        return delay
+
+    def iter_body(self, body: bytes) -> t.Iterator[t.Tuple[bytes, float]]:
+        """Yields the chunks of a response body, each with the time it takes to send it"""
+        for offset in range(0, len(body), self.chunk_size):
+            chunk = body[offset : offset + self.chunk_size]
+            yield chunk, len(chunk) / self.faults.bandwidth if self.faults.bandwidth else 0.0
+
+    def is_authenticated(self, request: StandInRequest):
+        return self.users is None or request.headers.get("authorization") in self.tokens
+
+    async def __call__(self, scope, receive, send):
+        """The ASGI interface"""
+        if scope["type"] == "lifespan":
+            while (message := await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        if scope["type"] != "http":
+            return
+
+        body, more_body = bytearray(), True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        request = StandInRequest(
+            method=scope["method"],
+            path=scope["path"],
+            params=dict(parse_qsl(scope.get("query_string", b"").decode())),
+            headers={k.decode().lower(): v.decode() for k, v in scope["headers"]},
+            body=bytes(body),
+        )
+        response = self.respond(request)
+        await asyncio.sleep(self.delay(len(request.body)))
+        headers = {"content-length": str(len(response.body)), **response.headers}
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+            }
+        )
+        for chunk, delay in self.iter_body(response.body):
+            await asyncio.sleep(delay)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    # Auth service
+
+    def login(self, request):
+        payload = request.json()
+        username, password = payload["username"], payload["password"]
+        if self.users is not None and self.users.get(username) != password:
+            return json_response({"error": "invalid credentials"}, 401)
+        token = secrets.token_hex(16)
+        self.tokens.add(token)
+        return json_response({"session": token})
+
+    def check_auth(self, request):
+        return json_response({"result": "ok"})
+
+    def get_scopes(self, request):
+        return self.listing(request, "scopes", list(self.scopes.values()))
+
+    def create_scope(self, request):
+        scope = self.add_scope(request.json()["scope_name"])
+        return json_response({"result": "ok", "scope_uuid": scope["scope_uuid"]})
+
+    def delete_scope(self, request, uuid):
+        self.pop(self.scopes, uuid)
+        return ok()
+
+    def add_scope(self, name: str):
+        scope = {"scope_uuid": new_uuid(), "scope_name": name}
+        self.scopes[scope["scope_uuid"]] = scope
+        return scope
+
+    # Projects
+
+    def get_projects(self, request):
+        return self.listing(request, "projects", list(self.projects.values()))
+
+    def create_project(self, request):
+        payload = request.json()
+        project = self.add_project(payload["name"], payload.get("display_name"))
+        return json_response({"result": "ok", "project_uuid": project["uuid"]})
+
+    def get_project(self, request, uuid):
+        return json_response(self.get(self.projects, uuid))
+
+    def update_project(self, request, uuid):
+        project = self.get(self.projects, uuid)
+        project["display_name"] = request.json()["display_name"]
+        return ok()
+
+    def delete_project(self, request, uuid):
+        self.pop(self.projects, uuid)
+        for dataset in self.children(self.datasets, "project_uuid", uuid):
+            self.remove_dataset(dataset["uuid"])
+        for scenario in self.children(self.scenarios, "project_uuid", uuid):
+            self.remove_scenario(scenario["uuid"])
+        return ok()
+
+    def add_project(self, name: str, display_name: t.Optional[str] = None):
+        project = {
+            "uuid": new_uuid(),
+            "name": name,
+            "display_name": display_name or name,
+            "created_on": int(time.time()),
+        }
+        self.projects[project["uuid"]] = project
+        self.add_scope(f"project:{name}")
+        return project
+
+    # Datasets
+
+    def get_datasets(self, request, uuid):
+        self.get(self.projects, uuid)
+        return self.listing(
+            request, "datasets", self.children(self.datasets, "project_uuid", uuid)
+        )
+
+    def create_dataset(self, request, uuid):
+        self.get(self.projects, uuid)
+        payload = request.json()
+        dataset = self.add_dataset(uuid, payload["name"], payload["type"])
+        if payload.get("display_name"):
+            dataset["display_name"] = payload["display_name"]
+        return json_response({"result": "ok", "dataset_uuid": dataset["uuid"]})
+
+    def get_dataset(self, request, uuid):
+        return json_response(self.get(self.datasets, uuid))
+
+    def update_dataset(self, request, uuid):
+        dataset = self.get(self.datasets, uuid)
+        payload = request.json()
+        dataset.update({k: payload[k] for k in ("name", "type", "display_name") if k in payload})
+        dataset["last_modified"] = time.time()
+        return ok()
+
+    def delete_dataset(self, request, uuid):
+        self.get(self.datasets, uuid)
+        self.remove_dataset(uuid)
+        return ok()
+
+    def get_data(self, request, uuid):
+        self.get(self.datasets, uuid)
+        if uuid not in self.data:
+            return json_response({"error": "dataset has no data"}, 404)
+        data, content_type = self.data[uuid]
+        etag = f'"{hashlib.sha256(data).hexdigest()}"'
+        headers = {"content-type": content_type, "etag": etag, "accept-ranges": "bytes"}
+        if request.headers.get("if-none-match") == etag:
+            return StandInResponse(304, headers=headers)
+        if match := re.fullmatch(r"bytes=(\d+)-", request.headers.get("range", "")):
+            start = int(match.group(1))
+            if start >= len(data):
+                return StandInResponse(416, headers={"content-range": f"bytes */{len(data)}"})
+            headers["content-range"] = f"bytes {start}-{len(data) - 1}/{len(data)}"
+            return StandInResponse(206, data[start:], headers)
+        return StandInResponse(200, data, headers)
+
+    def add_data(self, request, uuid):
+        dataset = self.get(self.datasets, uuid)
+        if dataset["has_data"] and request.params.get("overwrite") not in ("true", "True"):
+            return json_response({"error": "dataset already has data"}, 409)
+        self.set_data(uuid, *multipart_file(request))
+        return ok()
+
+    def delete_data(self, request, uuid):
+        dataset = self.get(self.datasets, uuid)
+        self.data.pop(uuid, None)
+        dataset.update(has_data=False, last_modified=time.time())
+        return ok()
+
+    def create_upload(self, request, uuid):
+        self.get(self.datasets, uuid)
+        payload = request.json()
+        upload = {
+            "upload_uuid": new_uuid(),
+            "dataset_uuid": uuid,
+            "filename": payload["filename"],
+            "size": int(payload["size"]),
+            "data": bytearray(),
+        }
+        self.uploads[upload["upload_uuid"]] = upload
+        return json_response({"upload_uuid": upload["upload_uuid"]})
+
+    def get_upload(self, request, uuid, upload):
+        upload = self.get(self.uploads, upload)
+        return json_response({"upload_uuid": upload["upload_uuid"], "offset": len(upload["data"])})
+
+    def upload_chunk(self, request, uuid, upload):
+        upload = self.get(self.uploads, upload)
+        content_range = request.headers.get("content-range", "")
+        if not (match := re.fullmatch(r"bytes (\d+)-\d+/\d+", content_range)):
+            return json_response({"error": "invalid Content-Range"}, 400)
+        # A chunk that does not continue the received data is ignored, the client resumes from
+        # the returned offset
+        if int(match.group(1)) == len(upload["data"]):
+            upload["data"] += request.body
+        return json_response({"offset": len(upload["data"])})
+
+    def commit_upload(self, request, uuid, upload):
+        upload = self.get(self.uploads, upload)
+        if len(upload["data"]) != upload["size"]:
+            return json_response({"error": "upload is incomplete"}, 409)
+        del self.uploads[upload["upload_uuid"]]
+        self.set_data(uuid, bytes(upload["data"]), guess_content_type(upload["filename"]))
+        return ok()
+
+    def add_dataset(
+        self,
+        project_uuid: str,
+        name: str,
+        type: str,
+        data: t.Optional[bytes] = None,
+        content_type="application/json",
+    ):
+        dataset = {
+            "uuid": new_uuid(),
+            "project_uuid": project_uuid,
+            "name": name,
+            "display_name": name,
+            "type": type,
+            "has_data": False,
+            "last_modified": time.time(),
+        }
+        self.datasets[dataset["uuid"]] = dataset
+        if data is not None:
+            self.set_data(dataset["uuid"], data, content_type)
+        return dataset
+
+    def set_data(self, uuid: str, data: bytes, content_type: str):
+        self.data[uuid] = (data, content_type)
+        self.datasets[uuid].update(has_data=True, last_modified=time.time())
+
+    def remove_dataset(self, uuid: str):
+        self.datasets.pop(uuid, None)
+        self.data.pop(uuid, None)
+
+    # Scenarios, timelines and updates
+
+    def get_scenarios(self, request, uuid):
+        self.get(self.projects, uuid)
+        scenarios = self.children(self.scenarios, "project_uuid", uuid)
+        return self.listing(request, "scenarios", scenarios)
+
+    def create_scenario(self, request, uuid):
+        self.get(self.projects, uuid)
+        scenario = self.add_scenario(uuid, request.json())
+        return json_response({"result": "ok", "scenario_uuid": scenario["uuid"]})
+
+    def get_scenario(self, request, uuid):
+        return json_response(self.get(self.scenarios, uuid))
+
+    def update_scenario(self, request, uuid):
+        scenario = self.get(self.scenarios, uuid)
+        scenario.update(request.json(), uuid=uuid, last_modified=time.time())
+        return ok()
+
+    def delete_scenario(self, request, uuid):
+        self.get(self.scenarios, uuid)
+        self.remove_scenario(uuid)
+        return ok()
+
+    def create_timeline(self, request, uuid):
+        scenario = self.get(self.scenarios, uuid)
+        if scenario["has_timeline"]:
+            return json_response({"error": "scenario already has a timeline"}, 409)
+        scenario["has_timeline"] = True
+        self.timelines[uuid] = []
+        return ok()
+
+    def delete_timeline(self, request, uuid):
+        scenario = self.get(self.scenarios, uuid)
+        if not scenario["has_timeline"]:
+            raise NotFound()
+        scenario["has_timeline"] = False
+        for update in self.timelines.pop(uuid, []):
+            self.updates.pop(update["uuid"], None)
+        return ok()
+
+    def get_updates(self, request, uuid):
+        self.get(self.scenarios, uuid)
+        return self.listing(request, "updates", self.timelines.get(uuid, []))
+
+    def create_update(self, request, uuid):
+        if not self.get(self.scenarios, uuid)["has_timeline"]:
+            return json_response({"error": "scenario has no timeline"}, 409)
+        update = self.add_update(uuid, request.json())
+        return json_response({"result": "ok", "update_uuid": update["uuid"]})
+
+    def get_update(self, request, uuid):
+        return StandInResponse(200, self.get(self.updates, uuid), json_headers())
+
+    def add_scenario(self, project_uuid: str, payload: dict):
+        scenario = {
+            **payload,
+            "uuid": new_uuid(),
+            "project_uuid": project_uuid,
+            "has_timeline": False,
+            "last_modified": time.time(),
+        }
+        self.scenarios[scenario["uuid"]] = scenario
+        return scenario
+
+    def add_update(self, scenario_uuid: str, payload: dict):
+        if scenario_uuid not in self.timelines:
+            self.timelines[scenario_uuid] = []
+            self.scenarios[scenario_uuid]["has_timeline"] = True
+        update = {
+            "uuid": new_uuid(),
+            "scenario_uuid": scenario_uuid,
+            # An update file without metadata is named after its dataset
+            "name": payload.get("name", payload.get("dataset")),
+            "timestamp": int(payload["timestamp"]),
+            "iteration": int(payload["iteration"]),
+        }
+        self.timelines[scenario_uuid].append(update)
+        self.updates[update["uuid"]] = codec.dumps({**update, "data": payload["data"]})
+        return update
+
+    def remove_scenario(self, uuid: str):
+        self.scenarios.pop(uuid, None)
+        for update in self.timelines.pop(uuid, []):
+            self.updates.pop(update["uuid"], None)
+        for view in self.children(self.views, "scenario_uuid", uuid):
+            del self.views[view["uuid"]]
+        self.simulations.pop(uuid, None)
+
+    # Views
+
+    def get_views(self, request, uuid):
+        self.get(self.scenarios, uuid)
+        return self.listing(request, "views", self.children(self.views, "scenario_uuid", uuid))
+
+    def create_view(self, request, uuid):
+        self.get(self.scenarios, uuid)
+        view = {**request.json(), "uuid": new_uuid(), "scenario_uuid": uuid}
+        self.views[view["uuid"]] = view
+        return json_response({"result": "ok", "view_uuid": view["uuid"]})
+
+    def get_view(self, request, uuid):
+        return json_response(self.get(self.views, uuid))
+
+    def update_view(self, request, uuid):
+        view = self.get(self.views, uuid)
+        view.update(request.json(), uuid=uuid)
+        return ok()
+
+    def delete_view(self, request, uuid):
+        self.pop(self.views, uuid)
+        return ok()
+
+    def get_dataset_types(self, request):
+        types = [{"name": name} for name in DATASET_TYPES]
+        return self.listing(request, "dataset_types", types)
+
+    # Simulations
+
+    def get_simulation(self, request, uuid):
+        return json_response(self.get(self.simulations, uuid))
+
+    def run_simulation(self, request, uuid):
+        self.get(self.scenarios, uuid)
+        self.simulations[uuid] = {"uuid": uuid, "status": "Succeeded", "started_at": time.time()}
+        return ok()
+
+    def delete_simulation(self, request, uuid):
+        self.pop(self.simulations, uuid)
+        return ok()
+
+    # Helpers
+
+    def listing(self, request: StandInRequest, envelope: str, items: t.List[dict]):
+        """Paginates ``items`` when the request has a ``limit``"""
+        if "limit" not in request.params:
+            return json_response({envelope: items})
+        limit, offset = int(request.params["limit"]), int(request.params.get("offset", 0))
+        return json_response(
+            {
+                envelope: items[offset : offset + limit],
+                "limit": limit,
+                "offset": offset,
+                "total": len(items),
+            }
+        )
+
+    @staticmethod
+    def get(resources: dict, uuid: str):
+        try:
+            return resources[uuid]
+        except KeyError:
+            raise NotFound()
+
+    def pop(self, resources: dict, uuid: str):
+        self.get(resources, uuid)
+        return resources.pop(uuid)
+
+    @staticmethod
+    def children(resources: t.Dict[str, dict], key: str, uuid: str):
+        return [r for r in resources.values() if r[key] == uuid]
+
+
+class ResponseStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    def __init__(self, server: StandInServer, body: bytes):
+        self.server = server
+        self.body = body
+
+    def __iter__(self):
+        for chunk, delay in self.server.iter_body(self.body):
+            if delay:
+                time.sleep(delay)
+            yield chunk
+
+    async def __aiter__(self):
+        for chunk, delay in self.server.iter_body(self.body):
+            await asyncio.sleep(delay)
+            yield chunk
+
+
+class StandInTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Sends the requests of an ``httpx.Client`` or ``httpx.AsyncClient`` to a ``StandInServer``
+    in process, applying the server's ``Faults``. A synchronous client blocks during delays"""
+
+    def __init__(self, server: t.Optional[StandInServer] = None):
+        self.server = server if server is not None else StandInServer()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.server.respond(self.convert_request(request, request.read()))
+        time.sleep(self.server.delay(len(request.content)))
+        return self.convert_response(response)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.server.respond(self.convert_request(request, await request.aread()))
+        await asyncio.sleep(self.server.delay(len(request.content)))
+        return self.convert_response(response)
+
+    @staticmethod
+    def convert_request(request: httpx.Request, body: bytes):
+        return StandInRequest(
+            method=request.method,
+            path=request.url.path,
+            params=dict(request.url.params),
+            headers={k.lower(): v for k, v in request.headers.items()},
+            body=body,
+        )
+
+    def convert_response(self, response: StandInResponse):
+        headers = {"content-length": str(len(response.body)), **response.headers}
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            stream=ResponseStream(self.server, response.body),
+        )
+
+
+def new_uuid():
+    return str(uuid.uuid4())
+
+
+def json_headers():
+    return {"content-type": "application/json"}
+
+
+def json_response(data, status_code=200, headers: t.Optional[dict] = None):
+    return StandInResponse(status_code, codec.dumps(data), {**json_headers(), **(headers or {})})
+
+
+def ok():
+    return json_response({"result": "ok"})
+
+
+def guess_content_type(filename: str):
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def multipart_file(request: StandInRequest) -> t.Tuple[bytes, str]:
+    """The content and content type of the first file in a ``multipart/form-data`` body"""
+    match = re.search(r"boundary=\"?([^;\"]+)", request.headers.get("content-type", ""))
+    if match is None:
+        raise ValueError("not a multipart body")
+    for part in request.body.split(b"--" + match.group(1).encode()):
+        head, sep, content = part.partition(b"\r\n\r\n")
+        if not sep or b"filename=" not in head:
+            continue
+        content_type = re.search(rb"content-type: *([^\r\n]+)", head, re.IGNORECASE)
+        if content_type is None or content_type.group(1) == b"application/octet-stream":
+            filename = re.search(rb'filename="([^"]*)"', head).group(1).decode()
+            content_type = guess_content_type(filename)
+        else:
+            content_type = content_type.group(1).decode()
+        return content[: -len(b"\r\n")], content_type
+    raise ValueError("no file in multipart body")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local stand-in of the Movici platform")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="bytes per second")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        parser.error("running the stand-in server requires uvicorn")
+
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    uvicorn.run(StandInServer(faults), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
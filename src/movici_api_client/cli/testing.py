@@ -3,6 +3,7 @@ from collections import deque
 from unittest.mock import AsyncMock, Mock
 
 from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.common import IAsyncClient, ISyncClient
 
 
 class FakeClient(Client):
@@ -22,6 +23,13 @@ class FakeClient(Client):
         else:
             return response.data
 
+    def stream_items(self, req, on_error=None):
+        # fake responses are not streamed
+        return ISyncClient.stream_items(self, req, on_error)
+
+    def iterate(self, req, page_size=None, on_error=None):
+        return ISyncClient.iterate(self, req, page_size, on_error)
+
     def set_response(self, response_data=None, status_code=200):
         self.responses = deque([FakeResponse(response_data, status_code)])
 
@@ -38,6 +46,12 @@ class FakeClient(Client):
 class FakeAsyncClient(FakeClient, AsyncClient):
     mock_cls = AsyncMock
 
+    def stream_items(self, req, on_error=None):
+        return IAsyncClient.stream_items(self, req, on_error)
+
+    def iterate(self, req, page_size=None, on_error=None):
+        return IAsyncClient.iterate(self, req, page_size, on_error)
+
     async def __aenter__(self):
         return self
 
@@ -1,8 +1,6 @@
 import dataclasses
 import typing as t
 
-import tabulate
-
 
 def format_anything(obj, fields):
 
@@ -63,6 +61,9 @@ def pick(obj, attrs: t.List[str], default=None):
 
 
 def format_table(objects, keys, default=""):
+    # imported lazily to keep the CLI startup fast
+    import tabulate
+
     if keys is not None:
         objects = (pick(o, keys, default) for o in objects)
     return tabulate.tabulate(objects, headers="keys")
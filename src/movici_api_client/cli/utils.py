@@ -1,21 +1,24 @@
+from __future__ import annotations
+
 import functools
+import hashlib
 import pathlib
+import time
 import typing as t
 import uuid
 
 import gimme
-import questionary
-from click import Abort, Choice
+from click import Abort, Choice, IntRange
 from click import Path as PathType
 from click import confirm, echo, prompt
 
-from movici_api_client.api.client import Client
 from movici_api_client.api.common import Request
 from movici_api_client.api.requests import GetProjects
 from movici_api_client.cli import dependencies
 from movici_api_client.cli.common import OPTIONS_COMMAND, Controller, get_options
-from movici_api_client.cli.config import Config
+from movici_api_client.cli.config import DEFAULT_AUTH_CHECK_INTERVAL, Config, Context, write_config
 from movici_api_client.cli.exceptions import (
+    InvalidContextSetting,
     InvalidResource,
     MoviciCLIError,
     NoActiveProject,
@@ -23,6 +26,10 @@ from movici_api_client.cli.exceptions import (
     NoCurrentContext,
 )
 
+if t.TYPE_CHECKING:
+    from movici_api_client.api import Client
+
+
 # Show static analysis tools that we're using these imports with the intent to export, proxy and
 # possibly adapt them
 confirm = confirm
@@ -31,6 +38,7 @@ echo = echo
 Abort = Abort
 confirm = confirm
 Choice = Choice
+IntRange = IntRange
 
 DirPath = functools.partial(
     PathType, file_okay=False, readable=True, exists=True, path_type=pathlib.Path
@@ -53,6 +61,50 @@ def assert_current_context():
     return assert_context(config)
 
 
+def auth_token_fingerprint(context: Context) -> str:
+    """A digest of the auth token and the url it belongs to, so that the moment a token was
+    checked can be stored without storing the token a second time"""
+    token = f"{context.get('url')}\n{context.get('auth_token')}"
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def auth_token_recently_checked(context: Context) -> bool:
+    """Whether the current auth token of ``context`` was found to be valid less than
+    ``auth_check_interval`` seconds ago, in which case it does not need to be checked again"""
+    if (checked_at := context.get("auth_token_checked_at")) is None:
+        return False
+    if context.get("auth_token_checked_for") != auth_token_fingerprint(context):
+        return False
+    interval = context.get("auth_check_interval", DEFAULT_AUTH_CHECK_INTERVAL)
+    try:
+        interval = float(interval)
+    except (TypeError, ValueError):
+        raise InvalidContextSetting("auth_check_interval", interval)
+    try:
+        return 0 <= time.time() - float(checked_at) < interval
+    except (TypeError, ValueError):
+        return False
+
+
+def mark_auth_token_checked(context: Context):
+    """Record that the current auth token of ``context`` was found to be valid just now"""
+    context["auth_token_checked_at"] = time.time()
+    context["auth_token_checked_for"] = auth_token_fingerprint(context)
+
+
+def set_auth_token_checked(context: Context, valid: bool):
+    """Remember whether the auth token of ``context`` is valid, so that subsequent commands can
+    skip checking it while it is known to be valid"""
+    if valid:
+        mark_auth_token_checked(context)
+    elif "auth_token_checked_at" in context:
+        del context["auth_token_checked_at"]
+        context.pop("auth_token_checked_for", None)
+    else:
+        return
+    write_config()
+
+
 def assert_active_project(project=None):
     if project is None:
         context = assert_current_context()
@@ -74,14 +126,20 @@ def assert_project_uuid(project: str):
     return assert_resource_uuid(project, GetProjects(), resource_type="project")
 
 
+def get_client() -> Client:
+    # The client is only imported when it is used, since it takes a long time to import ``httpx``
+    from movici_api_client.api import Client
+
+    return dependencies.get(Client)
+
+
 def get_resource_uuids(request: Request):
-    client = dependencies.get(Client)
-    all_resources = client.request(request)
-    return {p["name"]: p["uuid"] for p in all_resources}
+    client = get_client()
+    return {p["name"]: p["uuid"] for p in client.iterate(request)}
 
 
 def get_resource_uuid(name_or_uuid, request, resource_type="resource", client=None):
-    client = client or dependencies.get(Client)
+    client = client or get_client()
     return (
         name_or_uuid
         if validate_uuid(name_or_uuid)
@@ -90,8 +148,9 @@ def get_resource_uuid(name_or_uuid, request, resource_type="resource", client=No
 
 
 def get_resource(name_or_uuid, request, client=None, resource_type="resource"):
-    client = client or dependencies.get(Client)
-    all_resources = client.request(request)
+    client = client or get_client()
+    # Stops requesting pages once the resource has been found
+    all_resources = client.iterate(request)
     return get_resource_from_list(name_or_uuid, all_resources, resource_type=resource_type)
 
 
@@ -121,7 +180,13 @@ def iter_commands(obj: Controller):
         yield (group_name, val)
 
 
+# questionary (and prompt_toolkit) is only imported when needed, since it takes a long time to
+# import and most commands never prompt
+
+
 def prompt_choices(question: str, choices: t.Sequence[str]):
+    import questionary
+
     return questionary.select(
         question,
         choices=choices,
@@ -131,6 +196,8 @@ def prompt_choices(question: str, choices: t.Sequence[str]):
 
 
 async def prompt_choices_async(question: str, choices: t.Sequence[str]):
+    import questionary
+
     return await questionary.select(
         question,
         choices=choices,
@@ -1,6 +1,13 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, call
+
+import httpx
 import pytest
 
-from movici_api_client.api.common import Service, parse_service_urls
+from movici_api_client.api.auth import MoviciTokenAuth
+from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.common import BaseRequest, Service, parse_service_urls, unwrap_envelope
+from movici_api_client.api.limiter import ConcurrencyLimiter
 
 
 @pytest.mark.parametrize(
@@ -30,3 +37,285 @@ from movici_api_client.api.common import Service, parse_service_urls
 )
 def test_get_service_urls(urls, prefix, expected):
     assert parse_service_urls(urls, prefix=prefix) == expected
+
+
+class TestCoalesceRequests:
+    @pytest.fixture
+    def calls(self):
+        return []
+
+    @pytest.fixture
+    def client(self, calls):
+        async def handler(request: httpx.Request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            if request.url.path.endswith("missing"):
+                return httpx.Response(404, json={"error": "not found"})
+            return httpx.Response(200, json={"path": request.url.path})
+
+        transport = httpx.MockTransport(handler)
+        return AsyncClient(
+            "https://example.org",
+            auth=False,
+            client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+            coalesce_requests=True,
+        )
+
+    @pytest.mark.asyncio
+    async def test_coalesces_identical_requests(self, client, calls):
+        async with client:
+            results = await asyncio.gather(*(client.request(GetPath("a")) for _ in range(3)))
+        assert results == [{"path": "/a"}] * 3
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_does_not_coalesce_different_requests(self, client, calls):
+        async with client:
+            await asyncio.gather(client.request(GetPath("a")), client.request(GetPath("b")))
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_does_not_coalesce_non_idempotent_requests(self, client, calls):
+        async with client:
+            await asyncio.gather(*(client.request(GetPath("a", "POST")) for _ in range(2)))
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_does_not_coalesce_sequential_requests(self, client, calls):
+        async with client:
+            await client.request(GetPath("a"))
+            await client.request(GetPath("a"))
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_handles_errors_per_caller(self, client, calls):
+        def ignore(resp):
+            return False
+
+        async with client:
+            results = await asyncio.gather(
+                client.request(GetPath("missing"), on_error=ignore),
+                client.request(GetPath("missing")),
+                return_exceptions=True,
+            )
+        assert results[0] == {"error": "not found"}
+        assert isinstance(results[1], httpx.HTTPStatusError)
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self, client, calls):
+        async with client:
+            first = asyncio.ensure_future(client.request(GetPath("a")))
+            second = asyncio.ensure_future(client.request(GetPath("a")))
+            await asyncio.sleep(0)
+            first.cancel()
+            assert await second == {"path": "/a"}
+        assert len(calls) == 1
+
+
+class TestServiceLimits:
+    @pytest.fixture
+    def release(self):
+        return asyncio.Event()
+
+    @pytest.fixture
+    def client(self, release):
+        async def handler(request: httpx.Request):
+            if request.url.path.startswith("/slow"):
+                await release.wait()
+            return httpx.Response(200, json={"path": request.url.path})
+
+        transport = httpx.MockTransport(handler)
+        return AsyncClient(
+            "https://example.org",
+            auth=False,
+            client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+            max_concurrent=3,
+            service_limiters={Service.DATA_ENGINE: ConcurrencyLimiter(2)},
+        )
+
+    @pytest.mark.asyncio
+    async def test_busy_service_does_not_block_other_services(self, client, release):
+        async with client:
+            slow = [
+                asyncio.ensure_future(
+                    client.request(GetPath(f"slow/{i}", service=Service.DATA_ENGINE))
+                )
+                for i in range(5)
+            ]
+            await asyncio.sleep(0.01)
+            assert client.service_limiters[Service.DATA_ENGINE].in_flight == 2
+            assert await client.request(GetPath("fast", service=Service.AUTH)) == {"path": "/fast"}
+            release.set()
+            await asyncio.gather(*slow)
+
+    @pytest.mark.asyncio
+    async def test_waits_for_rate_limit(self, client, release):
+        bucket = Mock(reserve=Mock(return_value=0.01))
+        client.rate_limits = {Service.AUTH: bucket}
+        async with client:
+            await client.request(GetPath("fast", service=Service.AUTH))
+            await client.request(GetPath("fast", service=Service.MODEL_ENGINE))
+        assert bucket.reserve.call_count == 1
+
+
+class TestStreamItems:
+    @pytest.fixture
+    def client(self):
+        async def chunks(data: bytes):
+            for i in range(0, len(data), 5):
+                yield data[i : i + 5]
+
+        def handler(request: httpx.Request):
+            if request.url.path.endswith("missing"):
+                return httpx.Response(404)
+            if request.url.path.endswith("items"):
+                data = b'{"items": [{"uuid": "a"}, {"uuid": "b"}, {"uuid": "c"}]}'
+                return httpx.Response(200, stream=ChunkedStream(chunks(data)))
+            if request.url.path.endswith("list"):
+                return httpx.Response(200, json=["a", "b"])
+            return httpx.Response(200, json={"path": request.url.path})
+
+        transport = httpx.MockTransport(handler)
+        return AsyncClient(
+            "https://example.org",
+            auth=False,
+            client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+            limiter=ConcurrencyLimiter(1),
+        )
+
+    @pytest.mark.asyncio
+    async def test_streams_items(self, client):
+        async with client:
+            items = [item async for item in client.stream_items(GetItems("items"))]
+        assert items == [{"uuid": "a"}, {"uuid": "b"}, {"uuid": "c"}]
+
+    @pytest.mark.asyncio
+    async def test_releases_slot_while_consuming_items(self, client):
+        results = []
+        async with client:
+            async for item in client.stream_items(GetItems("items")):
+                # would deadlock if the listing kept occupying the only slot
+                results.append(await client.request(GetPath(item["uuid"])))
+        assert results == [{"path": "/a"}, {"path": "/b"}, {"path": "/c"}]
+        assert client.limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_yields_nothing_on_suppressed_error(self, client):
+        async with client:
+            items = [
+                item
+                async for item in client.stream_items(
+                    GetItems("missing"), on_error=lambda resp: False
+                )
+            ]
+        assert items == []
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_regular_request(self, client):
+        async with client:
+            items = [item async for item in client.stream_items(GetPath("list"))]
+        assert items == ["a", "b"]
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        async for chunk in self.chunks:
+            yield chunk
+
+
+class GetPath(BaseRequest):
+    def __init__(self, path, method="GET", service=None):
+        self.path = path
+        self.method = method
+        self.service = service
+
+    def make_request(self):
+        return {"method": self.method, "url": f"https://example.org/{self.path}"}
+
+
+@unwrap_envelope("items")
+class GetItems(GetPath):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_async_client_passes_connection_options():
+    factory = Mock(return_value=AsyncMock(httpx.AsyncClient))
+    limits = httpx.Limits(max_connections=4)
+    client = AsyncClient("https://example.org", client_factory=factory, http2=True, limits=limits)
+    async with client:
+        pass
+    assert factory.call_args == call(timeout=client.timeout, http2=True, limits=limits)
+
+
+class TestReauthenticate:
+    class AuthServer:
+        """Only accepts the ``valid`` token"""
+
+        def __init__(self, valid="new"):
+            self.valid = valid
+            self.tokens = []
+
+        def __call__(self, request: httpx.Request):
+            self.tokens.append(request.headers.get("Authorization"))
+            if request.headers.get("Authorization") != self.valid:
+                return httpx.Response(401)
+            return httpx.Response(200, json={"ok": True})
+
+    class GetAuthenticated(BaseRequest):
+        auth = True
+
+        def make_request(self):
+            return {"method": "GET", "url": "https://example.org/some/path"}
+
+    @pytest.fixture
+    def server(self):
+        return self.AuthServer()
+
+    def test_retries_request_with_new_token(self, server):
+        on_expired = Mock(return_value="new")
+        client = Client(
+            "https://example.org",
+            auth=MoviciTokenAuth("old", on_expired=on_expired),
+            client=httpx.Client(transport=httpx.MockTransport(server)),
+        )
+        assert client.request(self.GetAuthenticated()) == {"ok": True}
+        assert server.tokens == ["old", "new"]
+        assert on_expired.call_count == 1
+
+    def test_fails_without_new_token(self, server):
+        client = Client(
+            "https://example.org",
+            auth=MoviciTokenAuth("old", on_expired=Mock(return_value=None)),
+            client=httpx.Client(transport=httpx.MockTransport(server)),
+        )
+        with pytest.raises(httpx.HTTPStatusError):
+            client.request(self.GetAuthenticated())
+        assert server.tokens == ["old"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_new_token(self, server):
+        on_expired = Mock(return_value="new")
+
+        async def handler(request):
+            # All requests are rejected before the first one obtains a new token
+            await asyncio.sleep(0.01)
+            return server(request)
+
+        transport = httpx.MockTransport(handler)
+        client = AsyncClient(
+            "https://example.org",
+            auth=MoviciTokenAuth("old", on_expired=on_expired),
+            client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+        )
+        async with client:
+            results = await asyncio.gather(
+                *(client.request(self.GetAuthenticated()) for _ in range(3))
+            )
+        assert results == [{"ok": True}] * 3
+        assert on_expired.call_count == 1
+        assert server.tokens.count("new") == 3
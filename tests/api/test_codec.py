@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from movici_api_client.api import codec
+
+DOCUMENT = {"name": "ünïcode", "values": [1, 2.5, None, True], "nested": {"a": []}}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def implementation(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(codec, "orjson", None)
+    elif codec.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+@pytest.mark.usefixtures("implementation")
+@pytest.mark.parametrize("pretty", [False, True])
+def test_roundtrip(pretty):
+    data = codec.dumps(DOCUMENT, pretty=pretty)
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == codec.loads(data.decode()) == DOCUMENT
+
+
+@pytest.mark.usefixtures("implementation")
+def test_pretty_output_matches_stdlib():
+    assert codec.dumps(DOCUMENT, pretty=True).decode() == json.dumps(
+        DOCUMENT, indent=2, ensure_ascii=False
+    )
+
+
+@pytest.mark.usefixtures("implementation")
+def test_raises_json_decode_error():
+    with pytest.raises(json.JSONDecodeError):
+        codec.loads(b"{invalid")
+
+
+def test_encode_json_body():
+    conf = codec.encode_json_body(
+        {"method": "POST", "json": {"a": 1}, "headers": {"Authorization": "token"}}
+    )
+    assert conf == {
+        "method": "POST",
+        "content": b'{"a":1}',
+        "headers": {"Authorization": "token", "Content-Type": "application/json"},
+    }
+
+
+def test_encode_json_body_without_json():
+    conf = {"method": "GET"}
+    assert codec.encode_json_body(conf) is conf
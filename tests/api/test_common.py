@@ -1,9 +1,11 @@
+import hashlib
+import logging
 from unittest.mock import Mock
 
 import httpx
 import pytest
 
-from movici_api_client.api.common import urljoin
+from movici_api_client.api.common import BaseClient, BaseRequest, RequestSummary, urljoin
 
 
 @pytest.fixture
@@ -21,3 +23,45 @@ def session():
 )
 def test_urljoin(parts, expected):
     assert urljoin(*parts) == expected
+
+
+class LargeRequest(BaseRequest):
+    def make_request(self):
+        return {
+            "method": "POST",
+            "url": "https://example.org/updates/",
+            "json": {"data": "x" * 1000},
+        }
+
+
+def test_request_summary_redacts_and_summarizes_body():
+    summary = RequestSummary(
+        {
+            "method": "post",
+            "url": "https://example.org/updates/",
+            "headers": {"Authorization": "secret", "Content-Type": "application/json"},
+            "content": b"some content",
+        }
+    )
+    digest = hashlib.sha256(b"some content").hexdigest()[:12]
+    assert str(summary) == (
+        "POST https://example.org/updates/ "
+        "headers={'Authorization': '<redacted>', 'Content-Type': 'application/json'} "
+        f"content=<12 bytes, sha256 {digest}>"
+    )
+
+
+def test_logs_request_summary(caplog):
+    client = BaseClient("https://example.org", logger=logging.getLogger("test_client"))
+    with caplog.at_level(logging.DEBUG, logger="test_client"):
+        client._prepare_request_config(LargeRequest())
+    assert len(caplog.messages) == 1
+    assert caplog.messages[0].startswith("request POST https://example.org/updates/")
+    assert "x" * 100 not in caplog.messages[0]
+
+
+def test_does_not_summarize_request_when_not_logged():
+    logger = Mock(logging.Logger)
+    logger.isEnabledFor.return_value = False
+    BaseClient("https://example.org", logger=logger)._prepare_request_config(LargeRequest())
+    assert not logger.debug.called
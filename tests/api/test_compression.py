@@ -0,0 +1,132 @@
+import gzip
+import json
+import zlib
+
+import httpx
+import pytest
+
+from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.common import BaseRequest
+from movici_api_client.api.compression import Compression, VerifyingDecoder
+from movici_api_client.api.multipart import AsyncMultipartStream, MultipartStream
+
+PAYLOAD = {"data": [{"id": i, "value": "abc" * 10} for i in range(100)]}
+
+
+@pytest.fixture
+def compression():
+    return Compression("gzip")
+
+
+@pytest.mark.parametrize(
+    "conf",
+    [
+        {"method": "POST", "content": b"small"},
+        {"method": "GET"},
+    ],
+)
+def test_does_not_compress_small_bodies(compression, conf):
+    assert compression.apply(conf) is conf
+
+
+def test_compresses_content(compression):
+    conf = compression.apply({"method": "PUT", "content": b"x" * 2048})
+    assert gzip.decompress(conf["content"]) == b"x" * 2048
+    assert conf["headers"]["Content-Encoding"] == "gzip"
+
+
+@pytest.mark.parametrize("stream_type", [MultipartStream, AsyncMultipartStream])
+@pytest.mark.asyncio
+async def test_compresses_multipart_stream(compression, tmp_path, stream_type):
+    file = tmp_path.joinpath("data.json")
+    file.write_bytes(b"x" * 100000)
+    body = stream_type({"data": file}, chunk_size=1000, boundary="abc")
+    conf = compression.apply({"method": "POST", "content": body, "headers": body.headers})
+    assert "Content-Length" not in conf["headers"]
+    if stream_type is MultipartStream:
+        compressed = b"".join(conf["content"])
+        expected = b"".join(body)
+    else:
+        compressed = b"".join([chunk async for chunk in conf["content"]])
+        expected = b"".join([chunk async for chunk in body])
+    assert gzip.decompress(compressed) == expected
+    assert len(compressed) < len(expected) / 10
+
+
+@pytest.mark.parametrize("codec,level", [("brotli", None), ("gzip", 10)])
+def test_invalid_compression(codec, level):
+    with pytest.raises(ValueError):
+        Compression(codec, level=level)
+
+
+class TestVerifyingDecoder:
+    def test_decodes_gzip(self):
+        data = gzip.compress(b"some data")
+        decoder = VerifyingDecoder("gzip")
+        assert decoder.decode(data[:5]) + decoder.decode(data[5:]) + decoder.flush() == (
+            b"some data"
+        )
+
+    def test_detects_truncated_body(self):
+        decoder = VerifyingDecoder("gzip")
+        decoder.decode(gzip.compress(b"some data")[:-4])
+        with pytest.raises(httpx.DecodingError):
+            decoder.flush()
+
+    def test_detects_corrupt_body(self):
+        with pytest.raises(httpx.DecodingError):
+            VerifyingDecoder("deflate").decode(b"not deflated")
+
+    def test_passes_identity(self):
+        decoder = VerifyingDecoder(None)
+        assert decoder.decode(b"data") + decoder.flush() == b"data"
+        assert not decoder.compressed
+
+    def test_unsupported_encoding(self):
+        with pytest.raises(httpx.DecodingError):
+            VerifyingDecoder("compress")
+
+
+class PostPayload(BaseRequest):
+    def make_request(self):
+        return {"method": "POST", "url": "https://example.org/", "json": PAYLOAD}
+
+
+@pytest.mark.asyncio
+async def test_async_client_compresses_requests(compression):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, json={})
+
+    transport = httpx.MockTransport(handler)
+    client = AsyncClient(
+        "https://example.org",
+        auth=False,
+        client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+        compression=compression,
+    )
+    async with client:
+        await client.request(PostPayload())
+    assert requests[0].headers["content-encoding"] == "gzip"
+    assert json.loads(zlib.decompress(requests[0].read(), 16 + zlib.MAX_WBITS)) == PAYLOAD
+
+
+def test_client_compresses_json_body(compression):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, json={})
+
+    client = Client(
+        "https://example.org",
+        auth=False,
+        client=httpx.Client(transport=httpx.MockTransport(handler)),
+        compression=compression,
+    )
+    client.request(PostPayload())
+    assert requests[0].headers["content-type"] == "application/json"
+    assert requests[0].headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(requests[0].read())) == PAYLOAD
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from movici_api_client.api.jsonstream import EnvelopeParser
+
+RESPONSE = {
+    "total": 3,
+    "updates": [
+        {"uuid": "0001", "name": "ünïcode", "values": [1.5, -2e10, None, True]},
+        12345,
+        'text with "quotes" and , ] }',
+    ],
+    "next": {"nested": [1, 2, {"updates": []}]},
+}
+
+
+def parse(data: bytes, chunk_size, envelope="updates"):
+    parser = EnvelopeParser(envelope)
+    items = []
+    for i in range(0, len(data), chunk_size):
+        items.extend(parser.feed(data[i : i + chunk_size]))
+    items.extend(parser.close())
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1000])
+def test_parses_items_across_chunk_boundaries(chunk_size):
+    data = json.dumps(RESPONSE, indent=1, ensure_ascii=False).encode()
+    assert parse(data, chunk_size) == RESPONSE["updates"]
+
+
+def test_yields_items_before_response_is_complete():
+    parser = EnvelopeParser("updates")
+    assert parser.feed(b'{"updates": [{"a": 1}, {"b"') == [{"a": 1}]
+    assert parser.feed(b": 2}, 3") == [{"b": 2}]
+    assert parser.feed(b"4]}") == [34]
+    assert parser.close() == []
+
+
+@pytest.mark.parametrize("envelope,expected", [("updates", []), ("other", [1])])
+def test_parses_empty_and_trailing_lists(envelope, expected):
+    assert parse(b'{"updates": [], "other": [1]}', 3, envelope=envelope) == expected
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b'{"updates": [1, 2',
+        b'{"updates": [1 2]}',
+        b'{"updates": [1]} trailing',
+        b'["updates"]',
+    ],
+)
+def test_raises_on_invalid_json(data):
+    with pytest.raises(ValueError):
+        parse(data, 4)
+
+
+def test_raises_on_missing_envelope():
+    with pytest.raises(KeyError):
+        parse(b'{"projects": []}', 4)
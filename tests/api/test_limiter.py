@@ -0,0 +1,163 @@
+import asyncio
+
+import httpx
+import pytest
+
+from movici_api_client.api.limiter import (
+    AdaptiveConcurrencyLimiter,
+    ConcurrencyLimiter,
+    TokenBucket,
+)
+
+
+async def run_request(limiter, status_code=200, latency=0.0):
+    async with limiter.acquire() as slot:
+        slot.start -= latency
+        slot.record(httpx.Response(status_code))
+
+
+@pytest.mark.asyncio
+async def test_limits_concurrent_requests():
+    limiter = ConcurrencyLimiter(2)
+    max_in_flight = 0
+
+    async def request():
+        nonlocal max_in_flight
+        async with limiter.acquire():
+            max_in_flight = max(max_in_flight, limiter.in_flight)
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(*(request() for _ in range(10)))
+    assert max_in_flight == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_block_others():
+    limiter = ConcurrencyLimiter(1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.acquire():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    cancelled = asyncio.create_task(run_request(limiter))
+    waiting = asyncio.create_task(run_request(limiter))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    release.set()
+    await asyncio.wait_for(asyncio.gather(holder, waiting), timeout=1)
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_fixed_limit_does_not_adapt():
+    limiter = ConcurrencyLimiter(4)
+    await run_request(limiter, status_code=503)
+    assert limiter.limit == 4
+
+
+class TestAdaptiveConcurrencyLimiter:
+    @pytest.mark.asyncio
+    async def test_increases_limit_on_success(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=10)
+        for _ in range(10):
+            await run_request(limiter)
+        assert limiter.limit > 2
+
+    @pytest.mark.asyncio
+    async def test_does_not_increase_when_latency_rises(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2)
+        await run_request(limiter, latency=0.1)
+        limit = limiter._limit
+        for _ in range(5):
+            await run_request(limiter, latency=1.0)
+        assert limiter._limit == limit
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status_code", [429, 502, 503, 504])
+    async def test_decreases_limit_when_overloaded(self, status_code):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        await run_request(limiter, status_code=status_code)
+        assert limiter.limit == 4
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status_code", [500, 501, 502, 503, 504])
+    async def test_server_errors_never_increase_limit(self, status_code):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2)
+        for _ in range(10):
+            await run_request(limiter, status_code=status_code)
+        assert limiter.limit == 2
+
+    @pytest.mark.asyncio
+    async def test_decreases_limit_on_timeout(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        with pytest.raises(httpx.ReadTimeout):
+            async with limiter.acquire():
+                raise httpx.ReadTimeout("timeout")
+        assert limiter.limit == 4
+
+    @pytest.mark.asyncio
+    async def test_decreases_once_per_burst_of_failures(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        release = asyncio.Event()
+
+        async def request():
+            async with limiter.acquire() as slot:
+                await release.wait()
+                slot.record(httpx.Response(503))
+
+        tasks = [asyncio.create_task(request()) for _ in range(4)]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+        assert limiter.limit == 4
+
+    @pytest.mark.asyncio
+    async def test_stays_within_bounds(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=3)
+        for _ in range(3):
+            await run_request(limiter, status_code=503)
+        assert limiter.limit == 2
+        for _ in range(20):
+            await run_request(limiter)
+        assert limiter.limit == 3
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(min_limit=10, max_limit=5)
+
+
+class TestTokenBucket:
+    @pytest.fixture
+    def clock(self):
+        class Clock:
+            now = 0.0
+
+            def __call__(self):
+                return self.now
+
+        return Clock()
+
+    def test_allows_burst(self, clock):
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        assert [bucket.reserve() for _ in range(4)] == [0, 0, 0, 0.5]
+
+    def test_reserves_in_order(self, clock):
+        bucket = TokenBucket(rate=2, clock=clock)
+        assert [bucket.reserve() for _ in range(3)] == [0, 0.5, 1.0]
+
+    def test_refills_over_time(self, clock):
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+        bucket.reserve(), bucket.reserve()
+        clock.now = 0.5
+        assert bucket.reserve() == 0
+        clock.now = 100
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0.5]
+
+    @pytest.mark.parametrize("rate,burst", [(0, 1), (1, 0)])
+    def test_invalid_settings(self, rate, burst):
+        with pytest.raises(ValueError):
+            TokenBucket(rate, burst)
@@ -0,0 +1,128 @@
+from unittest.mock import patch
+
+import httpx
+import pytest
+from httpx._multipart import MultipartStream as HttpxMultipartStream
+
+from movici_api_client.api import multipart
+from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.multipart import AsyncMultipartStream, MultipartStream
+from movici_api_client.api.requests import AddDatasetData, ModifiyDatasetData
+from movici_api_client.api.retry import RetryPolicy
+
+CONTENT = bytes(range(256)) * 100
+
+
+@pytest.fixture
+def file(tmp_path):
+    rv = tmp_path.joinpath("dataset.json")
+    rv.write_bytes(CONTENT)
+    return rv
+
+
+def expected_body(file, boundary):
+    with open(file, "rb") as fobj:
+        return b"".join(HttpxMultipartStream({}, {"data": fobj}, boundary.encode()))
+
+
+def test_body_matches_httpx_encoding(file):
+    body = MultipartStream({"data": file}, chunk_size=1000, boundary="abc")
+    content = b"".join(body)
+    assert content == expected_body(file, "abc")
+    assert body.headers["Content-Length"] == str(len(content))
+
+
+def test_streams_file_object_from_current_position(file):
+    with open(file, "rb") as fobj:
+        fobj.seek(1000)
+        body = MultipartStream({"data": fobj}, boundary="abc")
+        assert b"".join(body) == b"".join(body)
+        assert int(body.headers["Content-Length"]) == len(expected_body(file, "abc")) - 1000
+
+
+@pytest.mark.asyncio
+async def test_async_body_reports_progress(file):
+    progress = []
+    body = AsyncMultipartStream(
+        {"data": file}, chunk_size=1000, on_progress=progress.append, boundary="abc"
+    )
+    assert b"".join([chunk async for chunk in body]) == expected_body(file, "abc")
+    assert sum(progress) == len(CONTENT)
+    assert max(progress) == 1000
+
+
+@pytest.mark.asyncio
+async def test_fails_when_file_shrinks(file):
+    body = AsyncMultipartStream({"data": file})
+    file.write_bytes(b"short")
+    with pytest.raises(ValueError):
+        [chunk async for chunk in body]
+
+
+class UploadServer:
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        request.read()
+        self.requests.append(request)
+        if self.failures:
+            return self.failures.pop(0)
+        return httpx.Response(200, json={})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("request_type", [AddDatasetData, ModifiyDatasetData])
+async def test_async_upload(file, request_type):
+    server = UploadServer()
+    transport = httpx.MockTransport(server)
+    client = AsyncClient(
+        "https://example.org",
+        auth=False,
+        client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+    )
+    async with client:
+        await client.request(request_type("0000", file))
+    request = server.requests[0]
+    assert request.headers["content-length"] == str(len(request.content))
+    assert "transfer-encoding" not in request.headers
+    assert CONTENT in request.content
+
+
+@pytest.mark.parametrize(
+    "client,stream_type",
+    [(Client(""), MultipartStream), (AsyncClient(""), AsyncMultipartStream)],
+)
+def test_creates_body_for_client(file, client, stream_type):
+    with patch.object(multipart, "FilePart", wraps=multipart.FilePart) as file_part:
+        config = AddDatasetData("0000", file).generate_config(client)
+    assert type(config["content"]) is stream_type
+    assert file_part.call_count == 1
+
+
+def test_sync_upload_is_retried(file):
+    server = UploadServer(httpx.Response(503))
+    client = Client(
+        "https://example.org",
+        auth=False,
+        client=httpx.Client(transport=httpx.MockTransport(server)),
+        retry=RetryPolicy(backoff_factor=0),
+    )
+    client.request(AddDatasetData("0000", file))
+    assert len(server.requests) == 2
+    assert server.requests[0].content == server.requests[1].content
+
+
+def test_retried_upload_reports_progress_once(file):
+    progress = []
+    server = UploadServer(httpx.Response(503))
+    client = Client(
+        "https://example.org",
+        auth=False,
+        client=httpx.Client(transport=httpx.MockTransport(server)),
+        retry=RetryPolicy(backoff_factor=0),
+    )
+    client.request(AddDatasetData("0000", file, on_progress=progress.append))
+    assert len(server.requests) == 2
+    assert sum(progress) == len(CONTENT)
@@ -0,0 +1,146 @@
+import asyncio
+import dataclasses
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from movici_api_client.api import codec
+from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.common import BaseRequest, unwrap_envelope
+from movici_api_client.api.pagination import Page, PageResult
+
+ITEMS = [{"uuid": str(i)} for i in range(25)]
+
+
+@dataclasses.dataclass
+@unwrap_envelope("items")
+class GetItems(BaseRequest):
+    paginated = True
+
+    def make_request(self):
+        return {"method": "GET", "url": "https://example.org/items", "params": {"q": "a"}}
+
+
+class GetAllItems(GetItems):
+    paginated = False
+
+
+class PaginatingServer:
+    def __init__(self, mode="offset"):
+        self.mode = mode
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        self.requests.append(request)
+        params = request.url.params
+        if self.mode is None:
+            return httpx.Response(200, json={"items": ITEMS})
+        limit = int(params["limit"])
+        offset = int(params.get("cursor" if self.mode == "cursor" else "offset", 0))
+        body = {"items": ITEMS[offset : offset + limit]}
+        if self.mode == "cursor":
+            body["next_cursor"] = str(offset + limit) if offset + limit < len(ITEMS) else None
+        else:
+            body.update(limit=limit, offset=offset, total=len(ITEMS))
+        return httpx.Response(200, json=body)
+
+
+@pytest.fixture
+def server():
+    return PaginatingServer()
+
+
+@pytest.fixture
+def client(server):
+    return Client(
+        "https://example.org",
+        auth=False,
+        client=httpx.Client(transport=httpx.MockTransport(server)),
+    )
+
+
+@pytest.fixture
+def async_client(server):
+    transport = httpx.MockTransport(server)
+    return AsyncClient(
+        "https://example.org",
+        auth=False,
+        client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+    )
+
+
+def test_page_adds_query_parameters():
+    config = Page(GetItems(), page_size=10, offset=20).generate_config(None)
+    assert config["params"] == {"q": "a", "limit": 10, "offset": 20}
+    config = Page(GetItems(), page_size=10, cursor="abc").generate_config(None)
+    assert config["params"] == {"q": "a", "limit": 10, "cursor": "abc"}
+
+
+def test_page_of_unpaginated_request_has_no_query_parameters():
+    assert Page(GetAllItems(), page_size=10).generate_config(None)["params"] == {"q": "a"}
+
+
+@pytest.mark.parametrize(
+    "body,num_items,expected",
+    [
+        ({"items": []}, 10, None),
+        ({"limit": 10, "offset": 0}, 10, Page(GetItems(), 10, offset=10)),
+        ({"limit": 10, "offset": 0}, 5, None),
+        ({"limit": 10, "offset": 0, "total": 10}, 10, None),
+        ({"limit": 10}, 20, None),
+        ({"next_cursor": "abc"}, 10, Page(GetItems(), 10, cursor="abc")),
+        ({"next_cursor": None}, 10, None),
+        ([], 10, None),
+    ],
+)
+def test_next_page(body, num_items, expected):
+    result = PageResult(Page(GetItems(), 10), [{}] * num_items, body)
+    assert result.next_page() == expected
+
+
+@pytest.mark.parametrize("mode,num_requests", [("offset", 3), ("cursor", 3), (None, 1)])
+def test_iterates_over_all_pages(client, server, mode, num_requests):
+    server.mode = mode
+    assert list(client.iterate(GetItems(), page_size=10)) == ITEMS
+    assert len(server.requests) == num_requests
+
+
+def test_does_not_page_unpaginated_request(client, server):
+    server.mode = None
+    assert list(client.iterate(GetAllItems(), page_size=10)) == ITEMS
+    assert "limit" not in server.requests[0].url.params
+    assert len(server.requests) == 1
+
+
+def test_decodes_page_once(client, server):
+    with patch.object(codec, "loads", wraps=codec.loads) as loads:
+        assert len(list(client.iterate(GetItems(), page_size=10))) == len(ITEMS)
+    assert loads.call_count == 3
+
+
+def test_requests_pages_lazily(client, server):
+    for item in client.iterate(GetItems(), page_size=10):
+        if item["uuid"] == "3":
+            break
+    assert len(server.requests) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["offset", "cursor", None])
+async def test_async_iterates_over_all_pages(async_client, server, mode):
+    server.mode = mode
+    async with async_client:
+        items = [item async for item in async_client.iterate(GetItems(), page_size=10)]
+    assert items == ITEMS
+
+
+@pytest.mark.asyncio
+async def test_async_prefetches_next_page(async_client, server):
+    async with async_client:
+        iterator = async_client.iterate(GetItems(), page_size=10)
+        await iterator.__anext__()
+        await asyncio.sleep(0.01)
+        assert len(server.requests) == 2
+        await iterator.aclose()
+    assert len(server.requests) == 2
@@ -4,6 +4,7 @@ import pytest
 
 from movici_api_client.api import requests
 from movici_api_client.api.client import Client
+from movici_api_client.api.common import with_headers
 
 
 @pytest.fixture
@@ -66,3 +67,13 @@ def test_update_project(client):
         "url": "/data-engine/v4/projects/0000-0000/",
         "json": {"display_name": "Some Project"},
     }
+
+
+def test_with_headers(client):
+    request = with_headers(requests.CheckAuthToken("abc"), {"Range": "bytes=10-"})
+    assert request.auth
+    assert request.generate_config(client) == {
+        "method": "GET",
+        "url": "/auth/v1/auth/",
+        "headers": {"Authorization": "abc", "Range": "bytes=10-"},
+    }
@@ -0,0 +1,192 @@
+import io
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.common import BaseRequest
+from movici_api_client.api.retry import RetryPolicy, parse_retry_after
+
+
+class SimpleRequest(BaseRequest):
+    def __init__(self, method="GET", **kwargs):
+        self.method = method
+        self.kwargs = kwargs
+
+    def make_request(self):
+        return {"method": self.method, "url": "https://example.org/resource", **self.kwargs}
+
+    def make_response(self, resp):
+        return resp.status_code
+
+
+class FlakyServer:
+    """Fails with the given responses or exceptions before responding with 200"""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        request.read()
+        self.requests.append(request)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return failure
+        return httpx.Response(200)
+
+
+@pytest.fixture
+def policy():
+    return RetryPolicy(backoff_factor=0)
+
+
+@pytest.fixture
+def make_client(policy):
+    def _make_client(server):
+        return Client(
+            "https://example.org",
+            client=httpx.Client(transport=httpx.MockTransport(server)),
+            retry=policy,
+        )
+
+    return _make_client
+
+
+def test_retries_server_errors(make_client, policy):
+    server = FlakyServer(httpx.Response(502), httpx.Response(503))
+    assert make_client(server).request(SimpleRequest()) == 200
+    assert len(server.requests) == 3
+    assert policy.stats.retries == 2
+
+
+def test_gives_up_after_max_retries(make_client, policy):
+    server = FlakyServer(*(httpx.Response(502) for _ in range(10)))
+    with pytest.raises(httpx.HTTPStatusError):
+        make_client(server).request(SimpleRequest())
+    assert len(server.requests) == policy.max_retries + 1
+    assert policy.stats.exhausted == 1
+
+
+@pytest.mark.parametrize(
+    "failure, retried",
+    [
+        (httpx.Response(500), False),
+        (httpx.Response(429), True),
+        (httpx.ConnectError("refused"), True),
+        (httpx.ReadError("dropped"), False),
+    ],
+)
+def test_retries_non_idempotent_request_only_when_not_processed(make_client, failure, retried):
+    server = FlakyServer(failure)
+    try:
+        make_client(server).request(SimpleRequest("POST"))
+    except httpx.HTTPError:
+        pass
+    assert len(server.requests) == (2 if retried else 1)
+
+
+def test_does_not_retry_client_errors(make_client):
+    server = FlakyServer(httpx.Response(404))
+    with pytest.raises(httpx.HTTPStatusError):
+        make_client(server).request(SimpleRequest())
+    assert len(server.requests) == 1
+
+
+def test_honours_retry_after(make_client):
+    server = FlakyServer(httpx.Response(429, headers={"Retry-After": "2"}))
+    with patch("time.sleep") as sleep:
+        make_client(server).request(SimpleRequest())
+    assert sleep.call_args.args == (2.0,)
+
+
+def test_does_not_wait_for_long_retry_after(make_client, policy):
+    server = FlakyServer(httpx.Response(429, headers={"Retry-After": "3600"}))
+    with pytest.raises(httpx.HTTPStatusError):
+        make_client(server).request(SimpleRequest())
+    assert len(server.requests) == 1
+
+
+def test_rewinds_file_before_retry(make_client):
+    server = FlakyServer(httpx.Response(503))
+    file = io.BytesIO(b"some data")
+    make_client(server).request(SimpleRequest("POST", files={"data": file}))
+    assert [b"some data" in r.content for r in server.requests] == [True, True]
+
+
+def test_does_not_retry_non_rewindable_body(make_client):
+    server = FlakyServer(httpx.Response(503))
+    with pytest.raises(httpx.HTTPStatusError):
+        make_client(server).request(SimpleRequest("PUT", content=iter([b"some data"])))
+    assert len(server.requests) == 1
+
+
+def test_retries_rewindable_body(make_client):
+    class Body:
+        rewindable = True
+
+        def __iter__(self):
+            yield b"some data"
+
+    server = FlakyServer(httpx.Response(503))
+    make_client(server).request(SimpleRequest("PUT", content=Body()))
+    assert [r.content for r in server.requests] == [b"some data", b"some data"]
+
+
+def test_retry_budget(make_client):
+    policy = RetryPolicy(backoff_factor=0, min_budget=1, budget_ratio=0)
+    client = make_client(FlakyServer(*(httpx.Response(502) for _ in range(10))))
+    client.retry = policy
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            client.request(SimpleRequest())
+    assert policy.stats.retries == 1
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("5", 5.0), ("-1", 0.0), ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0), ("invalid", None)],
+)
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(httpx.Response(429, headers={"Retry-After": value})) == expected
+
+
+class TestAsyncClient:
+    @pytest.fixture
+    def make_client(self, policy):
+        def _make_client(server):
+            transport = httpx.MockTransport(server)
+            return AsyncClient(
+                "https://example.org",
+                client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+                retry=policy,
+            )
+
+        return _make_client
+
+    @pytest.mark.asyncio
+    async def test_retries_request(self, make_client):
+        server = FlakyServer(httpx.Response(502), httpx.ConnectError("refused"))
+        async with make_client(server) as client:
+            assert await client.request(SimpleRequest()) == 200
+        assert len(server.requests) == 3
+
+    @pytest.mark.asyncio
+    async def test_retries_stream(self, make_client):
+        server = FlakyServer(httpx.Response(503))
+        async with make_client(server) as client:
+            async with client.stream(SimpleRequest()) as resp:
+                assert resp.status_code == 200
+        assert len(server.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_does_not_retry_stream_after_response_is_used(self, make_client):
+        server = FlakyServer()
+        async with make_client(server) as client:
+            with pytest.raises(httpx.ReadError):
+                async with client.stream(SimpleRequest()):
+                    raise httpx.ReadError("dropped")
+        assert len(server.requests) == 1
@@ -0,0 +1,307 @@
+import asyncio
+import io
+import json
+import time
+
+import httpx
+import pytest
+
+from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.common import BaseRequest, Service
+from movici_api_client.api.retry import RetryPolicy
+from movici_api_client.api.tracing import (
+    JSONLinesExporter,
+    RequestHooks,
+    RequestTrace,
+    url_template,
+)
+
+UUID = "6a1c3bb5-3e8f-4f5b-8a63-c0f9b1d7a1a4"
+
+
+class SimpleRequest(BaseRequest):
+    service = Service.DATA_ENGINE
+
+    def __init__(self, method="GET", **kwargs):
+        self.method = method
+        self.kwargs = kwargs
+
+    def make_request(self):
+        return {
+            "method": self.method,
+            "url": f"https://example.org/datasets/{UUID}/data",
+            **self.kwargs,
+        }
+
+    def make_response(self, resp):
+        return resp.status_code
+
+
+class RecordingHooks(RequestHooks):
+    def __init__(self):
+        self.events = []
+        self.traces = []
+
+    def on_request_start(self, trace):
+        self.events.append("start")
+
+    def on_first_byte(self, trace):
+        self.events.append(f"first_byte {trace.status_code}")
+
+    def on_retry(self, trace, delay):
+        self.events.append("retry")
+
+    def on_complete(self, trace):
+        self.events.append("complete")
+        self.traces.append(trace)
+
+
+class ContentStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Counts towards the bytes downloaded, unlike content that is given directly"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def __iter__(self):
+        yield self.content
+
+    async def __aiter__(self):
+        yield self.content
+
+
+class Server:
+    """Fails with the given status codes before responding with 200 and some content"""
+
+    def __init__(self, *failures, content=b"some content"):
+        self.failures = list(failures)
+        self.content = content
+
+    def __call__(self, request: httpx.Request):
+        request.read()
+        if self.failures:
+            return httpx.Response(self.failures.pop(0))
+        return httpx.Response(200, stream=ContentStream(self.content))
+
+
+@pytest.fixture
+def hooks():
+    return RecordingHooks()
+
+
+@pytest.fixture
+def make_client(hooks):
+    def _make_client(server):
+        return Client(
+            "https://example.org",
+            client=httpx.Client(transport=httpx.MockTransport(server)),
+            retry=RetryPolicy(backoff_factor=0),
+            hooks=hooks,
+        )
+
+    return _make_client
+
+
+def test_reports_request_lifecycle(make_client, hooks):
+    assert make_client(Server()).request(SimpleRequest("POST", content=b"abc")) == 200
+    assert hooks.events == ["start", "first_byte 200", "complete"]
+    trace = hooks.traces[0]
+    assert trace.request == "SimpleRequest"
+    assert trace.service == "data_engine"
+    assert trace.method == "POST"
+    assert trace.url_template == "/datasets/{uuid}/data"
+    assert (trace.status_code, trace.attempts) == (200, 1)
+    assert (trace.bytes_sent, trace.bytes_received) == (3, len(b"some content"))
+    assert 0 <= trace.time_to_first_byte <= trace.latency
+
+
+def test_reports_retries(make_client, hooks):
+    make_client(Server(503)).request(SimpleRequest())
+    assert hooks.events == ["start", "first_byte 503", "retry", "first_byte 200", "complete"]
+    assert hooks.traces[0].attempts == 2
+    assert [name for _, name, _ in hooks.traces[0].events] == [
+        "first_byte",
+        "retry",
+        "first_byte",
+    ]
+
+
+def test_reports_failed_request(make_client, hooks):
+    def server(request):
+        raise httpx.ReadError("connection reset")
+
+    with pytest.raises(httpx.ReadError):
+        make_client(server).request(SimpleRequest("POST"))
+    assert hooks.events == ["start", "complete"]
+    assert (hooks.traces[0].error, hooks.traces[0].attempts) == ("ReadError", 1)
+
+
+def test_reports_stream(make_client, hooks):
+    with make_client(Server()).stream(SimpleRequest()) as resp:
+        assert hooks.events == ["start", "first_byte 200"]
+        resp.read()
+    assert hooks.events[-1] == "complete"
+    assert hooks.traces[0].bytes_received == len(b"some content")
+
+
+def test_no_hooks_by_default():
+    client = Client(
+        "https://example.org", client=httpx.Client(transport=httpx.MockTransport(Server()))
+    )
+    assert client.request(SimpleRequest()) == 200
+
+
+class TestAsyncClient:
+    @pytest.fixture
+    def make_client(self, hooks):
+        def _make_client(server, **kwargs):
+            transport = httpx.MockTransport(server)
+            return AsyncClient(
+                "https://example.org",
+                client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+                retry=RetryPolicy(backoff_factor=0),
+                hooks=hooks,
+                **kwargs,
+            )
+
+        return _make_client
+
+    @pytest.mark.asyncio
+    async def test_reports_retries(self, make_client, hooks):
+        async with make_client(Server(429)) as client:
+            assert await client.request(SimpleRequest()) == 200
+        assert hooks.events == ["start", "first_byte 429", "retry", "first_byte 200", "complete"]
+
+    @pytest.mark.asyncio
+    async def test_reports_queue_wait(self, make_client, hooks):
+        async def server(request):
+            await asyncio.sleep(0.02)
+            return httpx.Response(200)
+
+        async with make_client(server, max_concurrent=1) as client:
+            await asyncio.gather(*(client.request(SimpleRequest("POST")) for _ in range(2)))
+        assert max(t.queue_wait for t in hooks.traces) >= 0.01
+
+    @pytest.mark.asyncio
+    async def test_reports_coalesced_requests(self, make_client, hooks):
+        async with make_client(Server(), coalesce_requests=True) as client:
+            await asyncio.gather(*(client.request(SimpleRequest()) for _ in range(2)))
+        assert sorted(t.coalesced for t in hooks.traces) == [False, True]
+        assert sorted(t.bytes_received for t in hooks.traces) == [0, len(b"some content")]
+
+    @pytest.mark.asyncio
+    async def test_reports_stream(self, make_client, hooks):
+        async with make_client(Server(503)) as client:
+            async with client.stream(SimpleRequest()) as resp:
+                await resp.aread()
+        assert hooks.events == ["start", "first_byte 503", "retry", "first_byte 200", "complete"]
+
+
+@pytest.fixture
+def trace():
+    return RequestTrace(
+        request="GetDatasets",
+        method="GET",
+        url=f"https://example.org/data-engine/v4/projects/{UUID}/datasets/",
+        url_template="/data-engine/v4/projects/{uuid}/datasets/",
+        service="data_engine",
+        started_at=1.5,
+        status_code=200,
+        attempts=1,
+        latency=0.25,
+        events=[(0.1, "first_byte", {})],
+    )
+
+
+def test_exports_json_lines(trace):
+    file = io.BytesIO()
+    exporter = JSONLinesExporter(file)
+    exporter.on_complete(trace)
+    exporter.on_complete(trace)
+    exporter.flush()
+    lines = file.getvalue().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["url_template"] == "/data-engine/v4/projects/{uuid}/datasets/"
+
+
+def test_exports_otlp_spans(trace):
+    file = io.BytesIO()
+    exporter = JSONLinesExporter(file, format="otlp")
+    exporter.on_complete(trace)
+    exporter.close()
+    span = json.loads(file.getvalue())["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["name"] == "GET /data-engine/v4/projects/{uuid}/datasets/"
+    assert (span["startTimeUnixNano"], span["endTimeUnixNano"]) == ("1500000000", "1750000000")
+    assert {"key": "http.response.status_code", "value": {"intValue": "200"}} in span["attributes"]
+    assert span["events"][0] == {
+        "timeUnixNano": "1600000000",
+        "name": "first_byte",
+        "attributes": [],
+    }
+    assert span["status"] == {"code": 0}
+
+
+def test_exporter_appends_to_path(trace, tmp_path):
+    path = tmp_path / "trace.jsonl"
+    for _ in range(2):
+        exporter = JSONLinesExporter(path)
+        exporter.on_complete(trace)
+        exporter.close()
+    assert len(path.read_bytes().splitlines()) == 2
+
+
+def test_exporter_reopens_path_after_close(trace, tmp_path):
+    path = tmp_path / "trace.jsonl"
+    exporter = JSONLinesExporter(path)
+    exporter.close()
+    exporter.on_complete(trace)
+    exporter.close()
+    assert len(path.read_bytes().splitlines()) == 1
+
+
+def test_exporter_writes_in_background(trace):
+    class SlowFile(io.BytesIO):
+        def write(self, data):
+            time.sleep(0.05)
+            return super().write(data)
+
+    file = SlowFile()
+    exporter = JSONLinesExporter(file)
+    start = time.perf_counter()
+    exporter.on_complete(trace)
+    assert time.perf_counter() - start < 0.05
+    exporter.flush()
+    assert len(file.getvalue().splitlines()) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_client_closes_hooks(trace, tmp_path):
+    path = tmp_path / "trace.jsonl"
+    exporter = JSONLinesExporter(path)
+    client = AsyncClient(
+        "https://example.org",
+        client_factory=lambda **kw: httpx.AsyncClient(
+            transport=httpx.MockTransport(Server()), **kw
+        ),
+        hooks=exporter,
+    )
+    async with client:
+        await client.request(SimpleRequest())
+    assert exporter.file.closed
+    assert len(path.read_bytes().splitlines()) == 1
+
+
+def test_invalid_export_format():
+    with pytest.raises(ValueError):
+        JSONLinesExporter(io.BytesIO(), format="xml")
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("https://example.org/auth/v1/scopes/", "/auth/v1/scopes/"),
+        (f"https://example.org/datasets/{UUID}/data/?a=1", "/datasets/{uuid}/data/"),
+        ("https://example.org/updates/12", "/updates/{id}"),
+    ],
+)
+def test_url_template(url, expected):
+    assert url_template(url) == expected
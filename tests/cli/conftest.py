@@ -4,6 +4,7 @@ import os
 import gimme
 import pytest
 
+from movici_api_client.cli.cache import CACHE_DIR_ENV
 from movici_api_client.cli.config import CONFIG_LOCATION_ENV, get_config
 from movici_api_client.cli.testing import FakeClient
 
@@ -43,6 +44,13 @@ def config_path(tmp_path):
     return file
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    directory = tmp_path / ".movici_cache"
+    os.environ[CACHE_DIR_ENV] = str(directory)
+    return directory
+
+
 @pytest.fixture
 def read_config(config_path):
     def read_config_():
@@ -5,6 +5,7 @@ import pytest
 import movici_api_client.cli.controllers.login
 from movici_api_client.cli.config import Context
 from movici_api_client.cli.controllers.login import LoginController
+from movici_api_client.cli.utils import auth_token_fingerprint
 
 
 @pytest.fixture
@@ -90,3 +91,9 @@ def test_login_with_different_username_situations(
     controller.login(ask_username)
     request = controller.client.request.call_args[0][0]
     assert request.username == expected
+
+
+def test_login_marks_token_as_checked(prompt, controller, context):
+    controller.login(ask_username=True)
+    assert "auth_token_checked_at" in context
+    assert context["auth_token_checked_for"] == auth_token_fingerprint(context)
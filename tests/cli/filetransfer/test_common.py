@@ -1,8 +1,15 @@
-from unittest.mock import AsyncMock
+import asyncio
+import io
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 
-from movici_api_client.cli.filetransfer.common import ParallelTaskGroup, SequentialTaskGroup, Task
+from movici_api_client.cli.filetransfer.common import (
+    BufferedFileWriter,
+    ParallelTaskGroup,
+    SequentialTaskGroup,
+    Task,
+)
 
 
 class FakeTask(Task, AsyncMock):
@@ -34,3 +41,96 @@ async def test_parallel_task_group_finishes_up_on_error():
 
     assert mock_1.await_count == 1
     assert mock_2.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_parallel_task_group_limits_tasks_in_flight():
+    in_flight = 0
+    max_in_flight = 0
+
+    class CountingTask(Task):
+        async def run(self):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+
+    await ParallelTaskGroup((CountingTask() for _ in range(50)), max_concurrent=3).run()
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_parallel_task_group_pulls_tasks_lazily():
+    created = 0
+    finished = 0
+
+    class RecordingTask(Task):
+        async def run(self):
+            nonlocal finished
+            await asyncio.sleep(0)
+            finished += 1
+
+    def iter_tasks():
+        nonlocal created
+        for _ in range(10):
+            # never more than max_concurrent tasks are pulled ahead of the finished tasks
+            assert created - finished <= 2
+            created += 1
+            yield RecordingTask()
+
+    await ParallelTaskGroup(iter_tasks(), max_concurrent=2).run()
+    assert finished == 10
+
+
+@pytest.mark.asyncio
+async def test_parallel_task_group_runs_async_iterable():
+    finished = []
+
+    class RecordingTask(Task):
+        def __init__(self, i):
+            self.i = i
+
+        async def run(self):
+            await asyncio.sleep(0)
+            finished.append(self.i)
+
+    async def iter_tasks():
+        for i in range(10):
+            await asyncio.sleep(0)
+            yield RecordingTask(i)
+
+    await ParallelTaskGroup(iter_tasks(), max_concurrent=3).run()
+    assert sorted(finished) == list(range(10))
+
+
+def test_parallel_task_group_requires_positive_max_concurrent():
+    with pytest.raises(ValueError):
+        ParallelTaskGroup([], max_concurrent=0)
+
+
+class TestBufferedFileWriter:
+    @pytest.mark.asyncio
+    async def test_writes_all_data_in_order(self):
+        fobj = io.BytesIO()
+        async with BufferedFileWriter(fobj, min_chunk_size=10, max_chunk_size=40) as writer:
+            for i in range(100):
+                await writer.write(bytes([i]) * 3)
+        assert fobj.getvalue() == b"".join(bytes([i]) * 3 for i in range(100))
+
+    @pytest.mark.asyncio
+    async def test_grows_chunk_size(self):
+        fobj = Mock(io.BytesIO)
+        async with BufferedFileWriter(fobj, min_chunk_size=10, max_chunk_size=40) as writer:
+            for _ in range(20):
+                await writer.write(b"x" * 10)
+        assert [len(c.args[0]) for c in fobj.write.call_args_list] == [10, 20, 40, 40, 40, 40, 10]
+
+    @pytest.mark.asyncio
+    async def test_raises_write_errors(self):
+        fobj = Mock(io.BytesIO)
+        fobj.write.side_effect = OSError("disk full")
+        with pytest.raises(OSError):
+            async with BufferedFileWriter(fobj, min_chunk_size=10) as writer:
+                for _ in range(20):
+                    await writer.write(b"x" * 10)
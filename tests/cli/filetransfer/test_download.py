@@ -0,0 +1,428 @@
+import asyncio
+import gzip
+import hashlib
+import re
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import movici_api_client.cli.filetransfer.common as filetransfer_common
+from movici_api_client.api.client import AsyncClient
+from movici_api_client.api.requests import GetDatasetData
+from movici_api_client.cli.common import CLIParameters
+from movici_api_client.cli.data_dir import (
+    MOVICI_DOWNLOAD_MANIFEST,
+    DownloadManifest,
+    MoviciDataDir,
+)
+from movici_api_client.cli.filetransfer import DownloadResource
+from movici_api_client.cli.filetransfer.download import DownloadScenarios, SyncSimulationDirectory
+from movici_api_client.cli.standin import StandInServer, StandInTransport
+
+CONTENT = bytes(range(256)) * 64
+
+
+LAST_MODIFIED = "Wed, 01 Jan 2020 00:00:00 GMT"
+
+
+class RangeServer:
+    """Serves ``content`` as a json file, optionally honouring Range requests. The connection can
+    be made to drop after ``fail_after`` bytes
+    """
+
+    def __init__(self, accept_ranges=True, fail_after=None, etag=None, gzip=False, msgpack=False):
+        self.accept_ranges = accept_ranges
+        self.fail_after = fail_after
+        self.etag = etag
+        self.gzip = gzip
+        self.msgpack = msgpack
+        self.content = CONTENT
+        self.last_modified = LAST_MODIFIED
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        self.requests.append(request)
+        headers = {"content-type": "application/json"}
+        if self.msgpack and "application/msgpack" in request.headers.get("accept", ""):
+            headers["content-type"] = "application/msgpack"
+        if self.accept_ranges:
+            headers["accept-ranges"] = "bytes"
+        if self.etag is not None:
+            if request.headers.get("if-none-match") == self.etag:
+                return httpx.Response(304)
+            headers["etag"] = self.etag
+
+        headers["last-modified"] = self.last_modified
+
+        content, start = self.content, 0
+        if (
+            self.accept_ranges
+            and request.headers.get("if-range", self.etag) in (self.etag, self.last_modified)
+            and (match := re.match(r"bytes=(\d+)-", request.headers.get("range", "")))
+        ):
+            start = int(match.group(1))
+            if start >= len(content):
+                return httpx.Response(416, headers=headers)
+            headers["content-range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+        body = content[start:]
+        if self.gzip and "gzip" in request.headers.get("accept-encoding", ""):
+            body = gzip.compress(body)
+            headers["content-encoding"] = "gzip"
+        headers["content-length"] = str(len(body))
+        return httpx.Response(206 if start else 200, headers=headers, stream=self.stream(body))
+
+    def stream(self, body):
+        fail_after = self.fail_after
+        self.fail_after = None
+
+        class Stream(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                if fail_after is None:
+                    yield body
+                    return
+                yield body[:fail_after]
+                raise httpx.ReadError("connection dropped")
+
+        return Stream()
+
+
+def write_partial(file, contents, validator=LAST_MODIFIED):
+    file.write_bytes(contents)
+    file.with_name(file.name + ".validator").write_text(validator)
+
+
+@pytest.fixture
+def setup_download(gimme_repo, tmp_path):
+    def _setup(server, max_concurrent=10, overwrite=True, **kwargs):
+        transport = httpx.MockTransport(server)
+        gimme_repo.add(
+            AsyncClient(
+                "https://example.org",
+                auth=False,
+                client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+                max_concurrent=max_concurrent,
+            )
+        )
+        gimme_repo.add(CLIParameters(overwrite=overwrite))
+        return DownloadResource(
+            file=tmp_path.joinpath("dataset"),
+            request=GetDatasetData("0000"),
+            progress=False,
+            **kwargs,
+        )
+
+    return _setup
+
+
+@pytest.mark.asyncio
+async def test_download_renames_part_file(setup_download, tmp_path):
+    await setup_download(RangeServer()).run()
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+    assert not tmp_path.joinpath("dataset.json.part").exists()
+
+
+@pytest.mark.asyncio
+async def test_resumes_interrupted_download(setup_download, tmp_path):
+    server = RangeServer(fail_after=10000)
+    task = setup_download(server)
+    with pytest.raises(httpx.ReadError):
+        await task.run()
+    size = tmp_path.joinpath("dataset.json.part").stat().st_size
+    assert 0 < size <= 10000
+
+    await task.run()
+    assert server.requests[-1].headers["range"] == f"bytes={size}-"
+    assert server.requests[-1].headers["if-range"] == LAST_MODIFIED
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+    assert not tmp_path.joinpath("dataset.json.part").exists()
+    assert not tmp_path.joinpath("dataset.json.part.validator").exists()
+
+
+@pytest.mark.asyncio
+async def test_starts_over_when_content_changed_since_interruption(setup_download, tmp_path):
+    server = RangeServer(fail_after=10000, etag='"v1"')
+    task = setup_download(server)
+    with pytest.raises(httpx.ReadError):
+        await task.run()
+
+    server.content, server.etag = CONTENT[::-1], '"v2"'
+    await task.run()
+    assert server.requests[-1].headers["if-range"] == '"v1"'
+    assert len(server.requests) == 2
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT[::-1]
+    assert not tmp_path.joinpath("dataset.json.part.validator").exists()
+
+
+@pytest.mark.asyncio
+async def test_starts_over_without_validator(setup_download, tmp_path):
+    tmp_path.joinpath("dataset.json.part").write_bytes(CONTENT[:100])
+    server = RangeServer()
+    await setup_download(server).run()
+    assert [r.headers.get("range") for r in server.requests] == [None]
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_discards_partial_download_without_range_support(setup_download, tmp_path):
+    task = setup_download(RangeServer(accept_ranges=False, fail_after=10000))
+    with pytest.raises(httpx.ReadError):
+        await task.run()
+    assert not tmp_path.joinpath("dataset.json.part").exists()
+    assert not tmp_path.joinpath("dataset.json.part.validator").exists()
+
+
+@pytest.mark.asyncio
+async def test_starts_over_when_range_is_ignored(setup_download, tmp_path):
+    write_partial(tmp_path.joinpath("dataset.json.part"), b"stale")
+    server = RangeServer(accept_ranges=False)
+    await setup_download(server).run()
+    assert len(server.requests) == 1
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_starts_over_on_invalid_range(setup_download, tmp_path):
+    write_partial(tmp_path.joinpath("dataset.json.part"), CONTENT + b"too long")
+    server = RangeServer()
+    await setup_download(server).run()
+    assert [r.headers.get("range") for r in server.requests] == [
+        f"bytes={len(CONTENT) + 8}-",
+        None,
+    ]
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_starts_over_on_invalid_range_with_single_connection(setup_download, tmp_path):
+    write_partial(tmp_path.joinpath("dataset.json.part"), CONTENT + b"too long")
+    server = RangeServer()
+    await asyncio.wait_for(setup_download(server, max_concurrent=1).run(), timeout=5)
+    assert len(server.requests) == 2
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_decodes_compressed_download(setup_download, tmp_path):
+    server = RangeServer(gzip=True)
+    await setup_download(server).run()
+    assert server.requests[0].headers["accept-encoding"] == "gzip"
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_discards_truncated_compressed_download(setup_download, tmp_path):
+    task = setup_download(RangeServer(gzip=True, fail_after=100))
+    with pytest.raises(httpx.ReadError):
+        await task.run()
+    assert not tmp_path.joinpath("dataset.json.part").exists()
+
+
+@pytest.mark.asyncio
+async def test_resumes_without_compression(setup_download, tmp_path):
+    write_partial(tmp_path.joinpath("dataset.json.part"), CONTENT[:100])
+    server = RangeServer(gzip=True)
+    await setup_download(server).run()
+    assert server.requests[0].headers["accept-encoding"] == "identity"
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return DownloadManifest(tmp_path.joinpath(MOVICI_DOWNLOAD_MANIFEST), root=tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_download_updates_manifest(setup_download, manifest):
+    await setup_download(RangeServer(etag='"abc"'), manifest=manifest, uuid="0000").run()
+    assert manifest.get("0000") == {
+        "file": "dataset.json",
+        "size": len(CONTENT),
+        "mtime_ns": manifest.root.joinpath("dataset.json").stat().st_mtime_ns,
+        "sha256": hashlib.sha256(CONTENT).hexdigest(),
+        "etag": '"abc"',
+        "last_modified": LAST_MODIFIED,
+        "version": None,
+        "format": "json",
+    }
+
+
+@pytest.mark.asyncio
+async def test_skips_download_of_same_version(setup_download, manifest):
+    server = RangeServer()
+    await setup_download(server, manifest=manifest, uuid="0000", version="1").run()
+    await setup_download(server, manifest=manifest, uuid="0000", version="1").run()
+    assert len(server.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_downloads_new_version(setup_download, manifest):
+    server = RangeServer()
+    await setup_download(server, manifest=manifest, uuid="0000", version="1").run()
+    await setup_download(server, manifest=manifest, uuid="0000", version="2").run()
+    assert len(server.requests) == 2
+    assert manifest.get("0000")["version"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_overwrites_tracked_file_without_asking(setup_download, manifest):
+    server = RangeServer()
+    await setup_download(server, manifest=manifest, uuid="0000", version="1").run()
+    await setup_download(server, manifest=manifest, uuid="0000", version="2", overwrite=None).run()
+    assert manifest.get("0000")["version"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_does_not_overwrite_tracked_file_with_no_overwrite(setup_download, manifest):
+    server = RangeServer()
+    await setup_download(server, manifest=manifest, uuid="0000", version="1").run()
+    task = setup_download(server, manifest=manifest, uuid="0000", version="2", overwrite=False)
+    assert await task.run() is False
+    assert manifest.get("0000")["version"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_skips_download_when_not_modified(setup_download, manifest, tmp_path):
+    server = RangeServer(etag='"abc"')
+    await setup_download(server, manifest=manifest, uuid="0000").run()
+    await setup_download(server, manifest=manifest, uuid="0000").run()
+    assert server.requests[-1].headers["if-none-match"] == '"abc"'
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_downloads_again_when_local_file_changed(setup_download, manifest, tmp_path):
+    server = RangeServer(etag='"abc"')
+    await setup_download(server, manifest=manifest, uuid="0000").run()
+    tmp_path.joinpath("dataset.json").write_bytes(b"changed")
+    await setup_download(server, manifest=manifest, uuid="0000").run()
+    assert "if-none-match" not in server.requests[-1].headers
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_negotiates_preferred_format(setup_download, tmp_path):
+    server = RangeServer(msgpack=True)
+    await setup_download(server, format="msgpack").run()
+    assert server.requests[0].headers["accept"].startswith("application/msgpack")
+    assert tmp_path.joinpath("dataset.msgpack").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_json_if_format_is_not_supported(setup_download, tmp_path):
+    await setup_download(RangeServer(), format="msgpack").run()
+    assert tmp_path.joinpath("dataset.json").read_bytes() == CONTENT
+
+
+@pytest.mark.asyncio
+async def test_downloads_again_in_other_format(setup_download, manifest, tmp_path):
+    server = RangeServer(msgpack=True)
+    await setup_download(server, manifest=manifest, uuid="0000", version="1").run()
+    await setup_download(
+        server, manifest=manifest, uuid="0000", version="1", format="msgpack"
+    ).run()
+    assert len(server.requests) == 2
+    assert not tmp_path.joinpath("dataset.json").exists()
+    assert manifest.get("0000")["file"] == "dataset.msgpack"
+
+
+@pytest.mark.asyncio
+async def test_replaces_tracked_file_in_other_format_without_asking(setup_download, manifest):
+    server = RangeServer()
+    await setup_download(server, manifest=manifest, uuid="0000", version="1").run()
+    # The server does not support msgpack, so the download replaces the tracked json file
+    task = setup_download(
+        server, manifest=manifest, uuid="0000", version="1", format="msgpack", overwrite=None
+    )
+    with patch.object(filetransfer_common, "confirm", return_value=False) as confirm:
+        assert await task.run() is True
+    assert confirm.call_count == 0
+    assert manifest.get("0000")["format"] == "msgpack"
+
+
+class TestSyncSimulationDirectory:
+    @pytest.fixture
+    def directory(self, tmp_path):
+        rv = tmp_path.joinpath("scenario")
+        rv.mkdir()
+        return rv
+
+    @pytest.fixture
+    def add_update(self, directory, manifest):
+        def _add_update(name, uuid=None):
+            file = directory.joinpath(name)
+            file.write_text("{}")
+            if uuid is not None:
+                manifest.set(uuid, file, sha256="")
+            return file
+
+        return _add_update
+
+    @pytest.mark.asyncio
+    async def test_removes_stale_updates(self, directory, manifest, add_update):
+        keep = add_update("t0_0_a.json", uuid="0001")
+        stale = add_update("t0_0_b.json", uuid="0002")
+        assert await SyncSimulationDirectory(directory, manifest, keep={"0001"}).run()
+        assert keep.exists()
+        assert not stale.exists()
+        assert manifest.get("0002") is None
+
+    @pytest.mark.asyncio
+    async def test_overwrites_directory_with_untracked_files(
+        self, directory, manifest, add_update, gimme_repo
+    ):
+        gimme_repo.add(CLIParameters(overwrite=True))
+        add_update("t0_0_a.json", uuid="0001")
+        add_update("t0_0_b.json")
+        assert await SyncSimulationDirectory(directory, manifest, keep={"0001"}).run()
+        assert list(directory.iterdir()) == []
+        assert manifest.get("0001") is None
+
+    @pytest.mark.asyncio
+    async def test_removes_stale_updates_while_tracking(self, directory, manifest, add_update):
+        keep = add_update("t0_0_a.json", uuid="0001")
+        replaced = add_update("t0_0_b.json", uuid="0002")
+        stale = add_update("t1_0_b.json", uuid="0003")
+
+        async def updates():
+            yield {"uuid": "0001", "timestamp": 0, "iteration": 0, "name": "a"}
+            yield {"uuid": "0004", "timestamp": 0, "iteration": 0, "name": "b"}
+
+        sync = SyncSimulationDirectory(directory, manifest)
+        assert await sync.run()
+        tracked = sync.track(updates())
+        await tracked.__anext__()
+        assert replaced.exists()
+        await tracked.__anext__()
+        # the file is replaced by the new update, so it must be gone before it is downloaded
+        assert not replaced.exists()
+        assert stale.exists()
+        with pytest.raises(StopAsyncIteration):
+            await tracked.__anext__()
+        assert keep.exists()
+        assert not stale.exists()
+        assert [uuid for uuid, _ in manifest.iter_files(directory)] == ["0001"]
+
+
+@pytest.mark.asyncio
+async def test_saves_manifest_once(gimme_repo, tmp_path):
+    server = StandInServer()
+    project = server.add_project("some_project")
+    for i in range(3):
+        scenario = server.add_scenario(project["uuid"], {"name": f"scenario_{i}"})
+        update = {"name": "dataset", "timestamp": 0, "iteration": 0, "data": {}}
+        server.add_update(scenario["uuid"], update)
+    transport = StandInTransport(server)
+    gimme_repo.add(
+        AsyncClient(
+            "http://standin",
+            auth=False,
+            client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+        )
+    )
+    gimme_repo.add(CLIParameters(overwrite=True, with_simulation=True))
+    directory = MoviciDataDir(tmp_path)
+    with patch.object(directory.manifest, "save") as save:
+        await DownloadScenarios(project, directory=directory, progress=False).run()
+    assert save.call_count == 1
+    assert len(directory.manifest.entries) == 6
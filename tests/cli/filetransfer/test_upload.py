@@ -1,17 +1,27 @@
+import asyncio
 import json
-from unittest.mock import Mock, call, patch
+import re
+import typing as t
+from unittest.mock import AsyncMock, Mock, call, patch
 
+import gimme
+import httpx
 import pytest
 
 import movici_api_client.cli.filetransfer.common
 import movici_api_client.cli.filetransfer.upload
 from movici_api_client.api.client import AsyncClient
+from movici_api_client.api.requests import CreateTimeline, CreateUpdate, DeleteTimeline
+from movici_api_client.cli.cache import UploadSessions
 from movici_api_client.cli.common import CLIParameters
+from movici_api_client.cli.data_dir import DataDir, UploadLedger
 from movici_api_client.cli.filetransfer import (
     DatasetUploadStrategy,
+    UploadMultipleResources,
     UploadResource,
     UploadStrategy,
 )
+from movici_api_client.cli.filetransfer.upload import ChunkedUpload, UploadTimeline
 
 
 @pytest.fixture
@@ -150,6 +160,101 @@ class TestUploadResource:
             assert task.determine_create_new(flag, "some_name") == expected
             assert task.determine_overwrite(flag, "some_name") == expected
 
+    @pytest.fixture
+    def ledger(self, data_dir):
+        return UploadLedger(data_dir.joinpath("ledger.json"), root=data_dir)
+
+    @pytest.mark.asyncio
+    async def test_records_upload_in_ledger(self, make_task, strategy, upload_file, ledger):
+        strategy.create_new.return_value = "0001"
+        await make_task(overwrite=False, create_new=True, inspect=False, ledger=ledger).run()
+        assert ledger.is_uploaded(upload_file, "0001", ledger.hash_file(upload_file))
+
+    @pytest.mark.asyncio
+    async def test_skips_unchanged_upload(self, make_task, strategy, upload_file, ledger):
+        strategy.get_all.return_value = [{"name": "dataset", "uuid": "0001", "has_data": True}]
+        ledger.record(upload_file, "0001", ledger.hash_file(upload_file))
+        task = make_task(overwrite=None, create_new=False, inspect=False, ledger=ledger)
+        assert await task.run() == "0001"
+        assert strategy.update_existing.await_count == 0
+        assert ledger.skipped_files == 1
+
+    @pytest.mark.asyncio
+    async def test_overwrite_uploads_unchanged_file(
+        self, make_task, strategy, upload_file, ledger
+    ):
+        strategy.get_all.return_value = [{"name": "dataset", "uuid": "0001", "has_data": True}]
+        strategy.update_existing.return_value = "0001"
+        ledger.record(upload_file, "0001", ledger.hash_file(upload_file))
+        await make_task(overwrite=True, create_new=False, inspect=False, ledger=ledger).run()
+        assert strategy.update_existing.await_count == 1
+        assert ledger.skipped_files == 0
+
+    @pytest.mark.asyncio
+    async def test_uploads_modified_file(self, make_task, strategy, upload_file, ledger):
+        strategy.get_all.return_value = [{"name": "dataset", "uuid": "0001", "has_data": True}]
+        strategy.update_existing.return_value = "0001"
+        ledger.record(upload_file, "0001", ledger.hash_file(upload_file))
+        upload_file.write_text("{}")
+        await make_task(overwrite=True, create_new=False, inspect=False, ledger=ledger).run()
+        assert strategy.update_existing.await_count == 1
+        assert ledger.is_uploaded(upload_file, "0001", ledger.hash_file(upload_file))
+
+    @pytest.mark.asyncio
+    async def test_uploads_unchanged_file_without_data(
+        self, make_task, strategy, upload_file, ledger
+    ):
+        strategy.get_all.return_value = [{"name": "dataset", "uuid": "0001", "has_data": False}]
+        ledger.record(upload_file, "0001", ledger.hash_file(upload_file))
+        await make_task(overwrite=True, create_new=False, inspect=False, ledger=ledger).run()
+        assert strategy.update_existing.await_count == 1
+
+
+class TestUploadMultipleResources:
+    @pytest.fixture(autouse=True)
+    def async_client(self, gimme_repo):
+        gimme_repo.add(AsyncClient(""))
+
+    @pytest.fixture
+    def make_task(self, data_dir, strategy, gimme_repo):
+        def _make_task(jobs=1):
+            gimme_repo.add(CLIParameters(overwrite=True, create=True, inspect=False, jobs=jobs))
+
+            async def create_new(parent_uuid, file, name, inspect):
+                await asyncio.sleep(0)
+                return name
+
+            strategy.upload_task = UploadResource
+            strategy.create_new.side_effect = create_new
+            return UploadMultipleResources(data_dir, parent_uuid="0000-0000", strategy=strategy)
+
+        return _make_task
+
+    @pytest.mark.parametrize("jobs", [1, 4])
+    @pytest.mark.asyncio
+    async def test_uploads_all_files(self, jobs, make_task, add_dataset, strategy):
+        for i in range(10):
+            add_dataset(f"dataset_{i}.json")
+        await make_task(jobs=jobs).run()
+        assert strategy.create_new.await_count == 10
+        assert strategy.get_all.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_creates_shared_resource_once(self, make_task, add_dataset, strategy):
+        add_dataset("dataset.json")
+        add_dataset("dataset.csv")
+        await make_task(jobs=2).run()
+        assert strategy.create_new.await_count == 1
+        assert strategy.update_existing.await_count == 1
+
+    @pytest.mark.parametrize("jobs, progress", [(1, True), (4, False)])
+    @pytest.mark.asyncio
+    async def test_disables_individual_progress_when_concurrent(
+        self, jobs, progress, make_task, strategy
+    ):
+        await make_task(jobs=jobs).run()
+        assert strategy.progress is progress
+
 
 class TestDatasetUploadStrategy:
     prompt_sentinel = object()
@@ -177,3 +282,213 @@ class TestDatasetUploadStrategy:
         ) as prompt:
             prompt.return_value = self.prompt_sentinel
             assert await strategy.infer_dataset_type(file, inspect) == expected_value
+
+
+class TestUploadTimeline:
+    @pytest.fixture
+    def async_client(self, gimme_repo):
+        client = AsyncClient("")
+        client.request = AsyncMock()
+        gimme_repo.add(client)
+        return client
+
+    @pytest.fixture
+    def ledger(self, data_dir):
+        return UploadLedger(data_dir.joinpath("ledger.json"), root=data_dir)
+
+    @pytest.fixture
+    def add_update(self, data_dir):
+        def _add_update(timestamp, data=None):
+            update = {"name": "dataset", "timestamp": timestamp, "iteration": 0, "data": data}
+            data_dir.joinpath(f"t{timestamp}_0_dataset.json").write_text(json.dumps(update))
+
+        return _add_update
+
+    @pytest.fixture
+    def updates(self, add_update):
+        add_update(0)
+        add_update(1)
+
+    @pytest.fixture
+    def upload_timeline(self, async_client, data_dir, ledger, gimme_repo):
+        directory = Mock(DataDir)
+        directory.iter_updates.side_effect = lambda _: sorted(data_dir.glob("t*.json"))
+        scenario = {"name": "scenario", "has_timeline": True}
+
+        async def _upload(overwrite=None):
+            gimme_repo.add(CLIParameters(overwrite=overwrite))
+            async_client.request.reset_mock()
+            await UploadTimeline(
+                async_client, directory, "0001", scenario=scenario, ledger=ledger
+            ).run()
+            return [type(c.args[0]) for c in async_client.request.await_args_list]
+
+        return _upload
+
+    @pytest.mark.asyncio
+    async def test_only_uploads_new_updates(self, upload_timeline, updates, add_update, ledger):
+        await upload_timeline()
+        add_update(2)
+        assert await upload_timeline() == [CreateUpdate]
+        assert ledger.skipped_files == 2
+
+    @pytest.mark.asyncio
+    async def test_recreates_timeline_on_modified_update(
+        self, upload_timeline, updates, add_update
+    ):
+        assert await upload_timeline() == [DeleteTimeline, CreateTimeline] + [CreateUpdate] * 2
+        add_update(0, data={"changed": True})
+        assert await upload_timeline() == [DeleteTimeline, CreateTimeline] + [CreateUpdate] * 2
+
+    @pytest.mark.asyncio
+    async def test_overwrite_recreates_unchanged_timeline(self, upload_timeline, updates):
+        await upload_timeline()
+        assert (
+            await upload_timeline(overwrite=True)
+            == [
+                DeleteTimeline,
+                CreateTimeline,
+            ]
+            + [CreateUpdate] * 2
+        )
+
+
+class ChunkedUploadServer:
+    """Implements the chunked upload protocol for dataset data in memory. Setting ``supported``
+    to ``False`` makes it behave like a server that only accepts a single POST. The connection
+    drops on the chunk with index ``fail_chunk``
+    """
+
+    def __init__(self, supported=True, chunk_size=1000, fail_chunk=None):
+        self.supported = supported
+        self.chunk_size = chunk_size
+        self.fail_chunk = fail_chunk
+        self.uploads: t.Dict[str, bytearray] = {}
+        self.data: t.Dict[str, bytes] = {}
+        self.requests: t.List[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request):
+        request.read()
+        self.requests.append(request)
+        path = request.url.path.strip("/").split("/")
+        uuid, resource, rest = path[3], path[4], path[5:]
+        if resource == "data":
+            self.data[uuid] = request.content
+            return httpx.Response(200, json={})
+        if not self.supported:
+            return httpx.Response(404)
+        if not rest:
+            upload_uuid = f"upload-{len(self.uploads)}"
+            self.uploads[upload_uuid] = bytearray()
+            return httpx.Response(
+                201, json={"upload_uuid": upload_uuid, "chunk_size": self.chunk_size}
+            )
+        if (buffer := self.uploads.get(rest[0])) is None:
+            return httpx.Response(404)
+        if rest[1:] == ["commit"]:
+            self.data[uuid] = bytes(self.uploads.pop(rest[0]))
+            return httpx.Response(200, json={})
+        if request.method == "PUT":
+            if self.fail_chunk is not None and self.count("PUT") - 1 == self.fail_chunk:
+                raise httpx.ReadError("connection dropped")
+            start = int(re.match(r"bytes (\d+)-", request.headers["content-range"]).group(1))
+            if start != len(buffer):
+                return httpx.Response(409)
+            buffer.extend(request.content)
+        return httpx.Response(200, json={"offset": len(buffer)})
+
+    def count(self, method, resource="uploads"):
+        return sum(
+            1 for r in self.requests if r.method == method and f"/{resource}/" in r.url.path
+        )
+
+
+class TestChunkedUpload:
+    @pytest.fixture
+    def content(self):
+        return bytes(range(256)) * 10
+
+    @pytest.fixture
+    def upload_file(self, data_dir, content):
+        file = data_dir.joinpath("height_map.tif")
+        file.write_bytes(content)
+        return file
+
+    @pytest.fixture
+    def sessions(self, gimme_repo, tmp_path):
+        sessions = UploadSessions(tmp_path.joinpath("uploads.json"))
+        gimme_repo.add(sessions)
+        return sessions
+
+    @pytest.fixture
+    def setup_server(self, gimme_repo, sessions):
+        def _setup(**kwargs):
+            server = ChunkedUploadServer(**kwargs)
+            transport = httpx.MockTransport(server)
+            gimme_repo.add(
+                AsyncClient(
+                    "https://example.org",
+                    auth=False,
+                    client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+                )
+            )
+            return server
+
+        return _setup
+
+    @pytest.fixture
+    def upload(self, upload_file):
+        async def _upload(**kwargs):
+            strategy = DatasetUploadStrategy(gimme.that(AsyncClient), chunked_upload_threshold=0)
+            strategy.progress = False
+            await strategy.upload_new_data("0000", upload_file, **kwargs)
+            return strategy
+
+        return _upload
+
+    @pytest.mark.asyncio
+    async def test_uploads_in_chunks(self, setup_server, upload, content, sessions):
+        server = setup_server()
+        await upload()
+        assert server.data["0000"] == content
+        assert server.count("PUT") == 3
+        assert sessions.entries == {}
+
+    @pytest.mark.asyncio
+    async def test_resumes_interrupted_upload(
+        self, setup_server, upload, upload_file, content, sessions
+    ):
+        server = setup_server(fail_chunk=1)
+        with pytest.raises(httpx.ReadError):
+            await upload()
+        assert sessions.get("0000", upload_file) is not None
+
+        progress = Mock()
+        await ChunkedUpload("0000", upload_file, on_progress=progress).run()
+        assert server.data["0000"] == content
+        assert server.count("POST") == 2  # a single session was created and committed
+        assert server.count("PUT") == 4
+        assert sum(c.args[0] for c in progress.call_args_list) == len(content)
+
+    @pytest.mark.asyncio
+    async def test_restarts_expired_session(self, setup_server, upload_file, content, sessions):
+        server = setup_server()
+        sessions.set("0000", upload_file, upload_uuid="expired", chunk_size=1000)
+        await ChunkedUpload("0000", upload_file).run()
+        assert server.data["0000"] == content
+        assert server.count("POST") == 2  # a single session was created and committed
+
+    @pytest.mark.asyncio
+    async def test_does_not_resume_modified_file(self, setup_server, upload_file, sessions):
+        setup_server()
+        sessions.set("0000", upload_file, upload_uuid="upload-0", chunk_size=1000)
+        upload_file.write_bytes(b"modified")
+        assert sessions.get("0000", upload_file) is None
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_single_upload(self, setup_server, upload, content):
+        server = setup_server(supported=False)
+        strategy = await upload()
+        assert content in server.data["0000"]
+        assert server.count("POST", resource="data") == 1
+        assert strategy.chunked_upload_threshold is None
@@ -5,12 +5,14 @@ import gimme
 import pytest
 
 from movici_api_client.api.client import AsyncClient
-from movici_api_client.api.requests import GetDatasets, GetProjects, GetScenarios
+from movici_api_client.api.requests import GetDatasets, GetProjects, GetScenarios, GetViews
+from movici_api_client.cli.cache import MetadataCache
 from movici_api_client.cli.handlers.query import (
     DatasetQuery,
     ProjectQuery,
     ResourceQuery,
     ScenarioQuery,
+    ViewQuery,
 )
 
 
@@ -44,6 +46,7 @@ def setup_gimme(gimme_repo):
         (ProjectQuery(), GetProjects),
         (DatasetQuery(""), GetDatasets),
         (ScenarioQuery(""), GetScenarios),
+        (ViewQuery(""), GetViews),
     ],
 )
 def test_request_all(query, request_cls):
@@ -76,3 +79,37 @@ async def test_get_uuid(name_or_uuid, result, mock_client):
 async def test_by_name_or_uuid(name_or_uuid, result, mock_client):
     query = DummyResourceQuery()
     assert await query.by_name_or_uuid(name_or_uuid) == result
+
+
+class CachedResourceQuery(DummyResourceQuery):
+    cache_key = "resources"
+
+
+@pytest.fixture
+def cache(gimme_repo, tmp_path):
+    cache = MetadataCache(tmp_path / "cache.json")
+    gimme_repo.add(cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_get_uuid_from_cache(mock_client, cache):
+    cache.set("resources", {"resource_c": uuid(3)})
+    assert await CachedResourceQuery().get_uuid("resource_c") == uuid(3)
+    assert mock_client.request.await_count == 0
+
+
+@pytest.mark.asyncio
+async def test_get_uuid_updates_cache_when_not_cached(mock_client, cache):
+    cache.set("resources", {"resource_c": uuid(3)})
+    assert await CachedResourceQuery().get_uuid("resource_a") == uuid(1)
+    assert cache.get("resources") == {"resource_a": uuid(1), "resource_b": uuid(2)}
+
+
+def test_view_query_caches_per_scenario(cache):
+    ViewQuery(uuid(1)).update_cache([{"name": "view_a", "uuid": uuid(3)}])
+    ViewQuery(uuid(2)).update_cache([{"name": "view_a", "uuid": uuid(4)}])
+    assert ViewQuery(uuid(1)).get_cached_uuids() == {"view_a": uuid(3)}
+    cache.invalidate(ViewQuery(uuid(1)).cache_key)
+    assert ViewQuery(uuid(1)).get_cached_uuids() is None
+    assert ViewQuery(uuid(2)).get_cached_uuids() == {"view_a": uuid(4)}
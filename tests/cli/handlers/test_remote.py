@@ -6,6 +6,7 @@ import pytest
 import movici_api_client.cli.handlers.remote
 from movici_api_client.api import requests as req
 from movici_api_client.cli import filetransfer
+from movici_api_client.cli.cache import MetadataCache
 from movici_api_client.cli.common import CLIParameters
 from movici_api_client.cli.config import Context
 from movici_api_client.cli.cqrs import Event, EventHandler, Mediator
@@ -110,6 +111,13 @@ def setup_gimme(gimme_repo, client, cli_params):
     gimme_repo.add(cli_params)
 
 
+@pytest.fixture
+def cache(gimme_repo, tmp_path):
+    cache = MetadataCache(tmp_path / "cache.json")
+    gimme_repo.add(cache)
+    return cache
+
+
 @pytest.fixture
 def mediator():
     return Mediator(ALL_HANDLERS)
@@ -144,6 +152,30 @@ async def test_requires_valid_project_uuid(current_context):
     assert handler.project_uuid == "0000-0001"
 
 
+@pytest.mark.asyncio
+@pytest.mark.no_valid_project_uuid
+async def test_requires_valid_project_uuid_from_cache(current_context, cache):
+    cache.set("projects", {"some_project": "0000-0001"})
+
+    @requires_valid_project_uuid
+    class MyHandler(EventHandler):
+        project_uuid: str
+
+        async def handle(self, event: Event, mediator: Mediator):
+            pass
+
+    handler = MyHandler()
+    await handler.handle(object(), Mediator())
+    assert handler.project_uuid == "0000-0001"
+
+
+@pytest.mark.asyncio
+async def test_invalidates_cache(cache, mediator):
+    cache.set(f"datasets:{project_uuid}", {"some_dataset": uuid1})
+    await mediator.send(DeleteDataset(uuid1))
+    assert cache.get(f"datasets:{project_uuid}") is None
+
+
 @pytest.mark.asyncio
 async def test_remote_get_all_projects_handler(gimme_repo, mediator, client):
     proj = {"uuid": "0000-0000", "name": "some_project"}
@@ -362,6 +394,7 @@ async def test_remote_download_dataset_handler(client, mediator, data_dir):
     assert mock.await_args == call(
         file=data_dir.datasets.joinpath(dataset["name"]),
         request=req.GetDatasetData(dataset["uuid"]),
+        format=None,
     )
 
 
@@ -2,7 +2,13 @@ import click
 import click.testing
 import pytest
 
-from movici_api_client.cli.bootstrap import create_click_command, register_controller
+from movici_api_client.cli.bootstrap import (
+    LazyGroup,
+    create_click_command,
+    import_controller,
+    register_controller,
+)
+from movici_api_client.cli.commands import CONTROLLERS
 from movici_api_client.cli.common import Controller
 from movici_api_client.cli.decorators import argument, command
 
@@ -71,3 +77,37 @@ def test_command_with_arguments():
     result = runner.invoke(cli, ["foo"])
     assert result.exit_code == 0
     assert "foo" in result.output
+
+
+@pytest.fixture
+def lazy_group():
+    return LazyGroup("main", lazy_controllers={f"{__name__}:MyController": ("get", "list")})
+
+
+def test_lazy_group_lists_commands_without_loading(lazy_group):
+    assert lazy_group.list_commands(None) == ["get", "list"]
+    assert lazy_group.commands == {}
+
+
+def test_lazy_group_loads_controller_on_use(lazy_group):
+    runner = click.testing.CliRunner()
+    result = runner.invoke(lazy_group, ["list", "multiple"])
+    assert result.exit_code == 0
+    assert "list" in result.output
+    assert "single" in lazy_group.commands["get"].commands
+    assert lazy_group.lazy_controllers == {}
+
+
+def test_lazy_group_help_does_not_load_controllers(lazy_group):
+    runner = click.testing.CliRunner()
+    result = runner.invoke(lazy_group, ["--help"])
+    assert result.exit_code == 0
+    assert "get" in result.output
+    assert lazy_group.commands == {}
+
+
+def test_lazy_controllers_match_registered_commands():
+    for path, names in CONTROLLERS.items():
+        group = click.Group("main")
+        register_controller(group, import_controller(path)())
+        assert sorted(group.commands) == sorted(names), path
@@ -0,0 +1,107 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from movici_api_client.cli.cache import (
+    MetadataCache,
+    UploadSessions,
+    clear_cache_dir,
+    get_cache_file,
+)
+from movici_api_client.cli.config import Context
+
+
+@pytest.fixture
+def context():
+    return Context("some/context", url="https://example.org")
+
+
+@pytest.fixture
+def cache(context, cache_dir):
+    return MetadataCache.from_context(context)
+
+
+def test_cache_file_per_context(context, cache_dir):
+    assert get_cache_file(context) == cache_dir / "some_context.json"
+
+
+def test_set_and_get(cache):
+    cache.set("key", {"a": 1})
+    assert cache.get("key") == {"a": 1}
+
+
+def test_persists_cache(cache, context):
+    cache.set("key", {"a": 1})
+    assert MetadataCache.from_context(context).get("key") == {"a": 1}
+
+
+def test_ignores_cache_of_different_url(cache, context):
+    cache.set("key", {"a": 1})
+    context.url = "https://other.example.org"
+    assert MetadataCache.from_context(context).get("key") is None
+
+
+def test_entries_expire(cache):
+    cache.set("key", {"a": 1})
+    with patch.object(time, "time", return_value=time.time() + cache.ttl + 1):
+        assert cache.get("key") is None
+
+
+def test_ttl_from_context(context):
+    context["cache_ttl"] = "0"
+    cache = MetadataCache.from_context(context)
+    cache.set("key", {"a": 1})
+    assert cache.get("key") is None
+
+
+def test_disabled_cache():
+    cache = MetadataCache()
+    cache.set("key", {"a": 1})
+    assert cache.get("key") is None
+
+
+def test_evicts_oldest_entries(cache):
+    cache.max_entries = 2
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert [cache.get(key) for key in ("a", "b", "c")] == [None, "b", "c"]
+
+
+def test_invalidate_scoped_keys(cache):
+    cache.set("datasets:1", [])
+    cache.set("datasets:2", [])
+    cache.set("scenarios:1", [])
+    cache.invalidate("datasets")
+    assert list(cache.entries) == ["scenarios:1"]
+
+
+def test_clear(cache):
+    cache.set("key", {"a": 1})
+    cache.clear()
+    assert not cache.file.exists()
+
+
+def test_clear_cache_dir(cache, cache_dir):
+    cache.set("key", {"a": 1})
+    clear_cache_dir()
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_clear_cache_dir_keeps_upload_sessions(context, cache, cache_dir, tmp_path):
+    file = tmp_path.joinpath("data.nc")
+    file.write_bytes(b"data")
+    cache.set("key", {"a": 1})
+    UploadSessions.from_context(context).set("0000", file, "upload", chunk_size=10)
+    clear_cache_dir()
+    assert UploadSessions.from_context(context).get("0000", file) is not None
+    assert not cache.file.exists()
+
+
+def test_persists_upload_sessions(context, cache_dir, tmp_path):
+    file = tmp_path.joinpath("data.nc")
+    file.write_bytes(b"data")
+    UploadSessions.from_context(context).set("0000", file, "upload", chunk_size=10)
+    session = UploadSessions.from_context(context).get("0000", file)
+    assert (session["upload_uuid"], session["chunk_size"]) == ("upload", 10)
+    assert UploadSessions.from_context(Context("some/context", url="other")).entries == {}
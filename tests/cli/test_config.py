@@ -215,3 +215,19 @@ class TestContext:
 
     def test_default_value(self, context):
         assert context["auth"] is True
+
+    @pytest.mark.parametrize(
+        "key, value, expected",
+        [
+            ("max_connections", "50", 50),
+            ("keepalive_expiry", "2.5", 2.5),
+            ("http2", "true", True),
+        ],
+    )
+    def test_context_parses_connection_settings(self, context, key, value, expected):
+        context[key] = value
+        assert context[key] == expected
+
+    def test_context_rejects_invalid_number(self, context):
+        with pytest.raises(ValueError):
+            context["max_connections"] = "many"
@@ -1,11 +1,18 @@
+import os
+import pathlib
+from unittest.mock import patch
+
 import pytest
 
 from movici_api_client.cli.data_dir import (
     MOVICI_DATADIR_SENTINEL,
+    MOVICI_DOWNLOAD_MANIFEST,
+    MOVICI_UPLOAD_LEDGER,
     MoviciDataDir,
     SimpleDataDirectory,
 )
 from movici_api_client.cli.exceptions import InvalidDirectory
+from movici_api_client.cli.helpers import file_hash
 
 
 @pytest.fixture
@@ -71,3 +78,114 @@ def test_iter_files(extensions, files, result, tmp_path_factory):
     for file in files:
         path.joinpath(file).touch()
     assert set(f.name for f in data_dir._iter_files()) == set(result)
+
+
+class TestDownloadManifest:
+    @pytest.fixture
+    def manifest(self, movici_data_dir):
+        return movici_data_dir.manifest
+
+    @pytest.fixture
+    def dataset(self, movici_data_dir, manifest):
+        file = movici_data_dir.datasets.joinpath("dataset.json")
+        file.write_text("{}")
+        manifest.set("0000", file, sha256=file_hash(file), version="1")
+        return file
+
+    def test_manifest_is_stored_next_to_sentinel(self, movici_data_dir, manifest, dataset):
+        manifest.save()
+        assert movici_data_dir.path.joinpath(MOVICI_DOWNLOAD_MANIFEST).is_file()
+
+    def test_save_and_load_manifest(self, movici_data_dir, manifest, dataset):
+        manifest.save()
+        result = MoviciDataDir(movici_data_dir.path).manifest
+        assert result.get("0000") == manifest.get("0000")
+        assert result.get("0000")["file"] == "init_data/dataset.json"
+
+    def test_interrupted_save_keeps_previous_manifest(self, movici_data_dir, manifest, dataset):
+        manifest.save()
+        manifest.set("0001", dataset, sha256="abc")
+
+        def write_bytes(file, data):
+            with open(file, "wb") as fobj:
+                fobj.write(data[:10])
+            raise OSError("disk full")
+
+        with patch.object(pathlib.Path, "write_bytes", write_bytes), pytest.raises(OSError):
+            manifest.save()
+        result = MoviciDataDir(movici_data_dir.path).manifest
+        assert result.get("0000") == manifest.get("0000")
+        assert result.get("0001") is None
+
+    def test_load_invalid_manifest(self, movici_data_dir):
+        movici_data_dir.path.joinpath(MOVICI_DOWNLOAD_MANIFEST).write_text("invalid")
+        assert movici_data_dir.manifest.entries == {}
+
+    def test_get_valid_entry(self, manifest, dataset):
+        assert manifest.get_valid("0000")["version"] == "1"
+
+    @pytest.mark.parametrize("contents", ["[]", "{ }"])
+    def test_get_valid_entry_of_modified_file(self, manifest, dataset, contents):
+        dataset.write_text(contents)
+        assert manifest.get_valid("0000") is None
+
+    def test_get_valid_entry_of_touched_file(self, manifest, dataset):
+        stat = dataset.stat()
+        os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert manifest.get_valid("0000") is not None
+
+    def test_get_valid_entry_records_new_modification_time(self, manifest, dataset):
+        stat = dataset.stat()
+        os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        manifest.get_valid("0000")
+        assert manifest.get("0000")["mtime_ns"] == stat.st_mtime_ns + 10**9
+        assert manifest.dirty
+
+    def test_check_valid_entry_does_not_modify_manifest(self, manifest, dataset):
+        stat = dataset.stat()
+        os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        manifest.dirty = False
+        entry, mtime_ns = manifest.check_valid("0000")
+        assert mtime_ns == stat.st_mtime_ns + 10**9
+        assert entry["mtime_ns"] == stat.st_mtime_ns
+        assert not manifest.dirty
+
+    def test_get_valid_entry_of_removed_file(self, manifest, dataset):
+        dataset.unlink()
+        assert manifest.get_valid("0000") is None
+
+
+class TestUploadLedger:
+    @pytest.fixture
+    def ledger(self, movici_data_dir):
+        return movici_data_dir.upload_ledger
+
+    @pytest.fixture
+    def dataset(self, movici_data_dir, ledger):
+        file = movici_data_dir.datasets.joinpath("dataset.json")
+        file.write_text("{}")
+        ledger.record(file, "0000", sha256=file_hash(file))
+        return file
+
+    def test_save_and_load_ledger(self, movici_data_dir, ledger, dataset):
+        ledger.save()
+        assert movici_data_dir.path.joinpath(MOVICI_UPLOAD_LEDGER).is_file()
+        result = MoviciDataDir(movici_data_dir.path).upload_ledger
+        assert result.get(dataset) == ledger.get(dataset)
+        assert result.get(dataset)["file"] == "init_data/dataset.json"
+
+    def test_is_uploaded(self, ledger, dataset):
+        assert ledger.is_uploaded(dataset, "0000", ledger.hash_file(dataset))
+        assert not ledger.is_uploaded(dataset, "0001", ledger.hash_file(dataset))
+
+    def test_modified_file_is_not_uploaded(self, ledger, dataset):
+        dataset.write_text("[]")
+        assert not ledger.is_uploaded(dataset, "0000", ledger.hash_file(dataset))
+
+    def test_hash_file_reuses_recorded_hash(self, ledger, dataset):
+        ledger.entries[ledger.relative_path(dataset)]["sha256"] = "recorded"
+        assert ledger.hash_file(dataset) == "recorded"
+
+    def test_skip_counts_files(self, ledger, dataset):
+        ledger.skip(dataset)
+        assert (ledger.skipped_files, ledger.skipped_bytes) == (1, 2)
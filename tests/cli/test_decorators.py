@@ -1,3 +1,4 @@
+import time
 from unittest.mock import call, patch
 
 import pytest
@@ -8,6 +9,7 @@ from movici_api_client.cli.common import CLIParameters, Controller
 from movici_api_client.cli.decorators import authenticated, catch_exceptions, cli_options
 from movici_api_client.cli.exceptions import MoviciCLIError, Unauthenticated
 from movici_api_client.cli.testing import FakeClient
+from movici_api_client.cli.utils import mark_auth_token_checked
 
 
 class TestCatchExceptions:
@@ -33,7 +35,13 @@ class TestCatchExceptions:
 class TestAuthenticated:
     @pytest.fixture(autouse=True)
     def config(self, gimme_repo, read_config):
-        gimme_repo.add(read_config())
+        config = read_config()
+        gimme_repo.add(config)
+        return config
+
+    @pytest.fixture
+    def context(self, config):
+        return config.current_context
 
     def test_authenticated_requests_authentication(self, client: FakeClient):
         @authenticated
@@ -60,6 +68,65 @@ class TestAuthenticated:
         with pytest.raises(Unauthenticated):
             test_func()
 
+    def test_authenticated_skips_check_of_recently_checked_token(self, client, context):
+        mark_auth_token_checked(context)
+
+        @authenticated
+        def test_func():
+            return 42
+
+        assert test_func() == 42
+        assert not client.request.called
+
+    @pytest.mark.parametrize("key, value", [("auth_token", "other"), ("url", "https://other")])
+    def test_authenticated_checks_token_that_changed_since_check(
+        self, client, context, key, value
+    ):
+        mark_auth_token_checked(context)
+        context[key] = value
+
+        @authenticated
+        def test_func():
+            return 42
+
+        test_func()
+        assert isinstance(client.request.call_args[0][0], CheckAuthToken)
+
+    @pytest.mark.parametrize("checked_at, interval", [(0, None), (time.time() - 20, 10)])
+    def test_authenticated_checks_stale_token(self, client, context, checked_at, interval):
+        context["auth_token_checked_at"] = checked_at
+        if interval is not None:
+            context["auth_check_interval"] = interval
+
+        @authenticated
+        def test_func():
+            return 42
+
+        test_func()
+        assert isinstance(client.request.call_args[0][0], CheckAuthToken)
+
+    def test_authenticated_remembers_valid_token(self, context, read_config):
+        @authenticated
+        def test_func():
+            return 42
+
+        test_func()
+        assert time.time() - read_config().current_context["auth_token_checked_at"] < 10
+
+    def test_authenticated_forgets_invalid_token(self, client, context, read_config):
+        mark_auth_token_checked(context)
+        context["auth_token_checked_at"] = 0
+        client.set_response(status_code=401)
+
+        @authenticated
+        def test_func():
+            return 42
+
+        with pytest.raises(Unauthenticated):
+            test_func()
+        assert "auth_token_checked_at" not in read_config().current_context
+        assert "auth_token_checked_for" not in read_config().current_context
+
 
 class TestCliOption:
     @pytest.fixture
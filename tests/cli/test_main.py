@@ -1,12 +1,37 @@
+import importlib.util
+import os
+import pathlib
+import subprocess
+import sys
+from unittest.mock import patch
+
 import click.testing
+import httpx
 import pytest
 
+import movici_api_client
+from movici_api_client.api import AdaptiveConcurrencyLimiter, RetryPolicy
+from movici_api_client.api.common import Service
+from movici_api_client.api.requests import GetProjects
 from movici_api_client.cli.bootstrap import cli_factory
-from movici_api_client.cli.config import read_config
+from movici_api_client.cli.config import Config, Context, read_config
 from movici_api_client.cli.controllers.config import ConfigController
 from movici_api_client.cli.controllers.datasets import DatasetController
 from movici_api_client.cli.controllers.projects import ProjectController
-from movici_api_client.cli.main import login, main
+from movici_api_client.cli.exceptions import InvalidContextSetting, Unauthenticated
+from movici_api_client.cli.main import (
+    handle_http_error,
+    login,
+    main,
+    parse_connection_options,
+    setup_async_client,
+    setup_cli_parameters,
+    setup_client,
+    setup_compression,
+    setup_concurrency_limiter,
+    setup_rate_limits,
+    setup_request_hooks,
+)
 
 
 @pytest.fixture
@@ -24,6 +49,17 @@ def test_integration(cli):
     assert result.exit_code == 0
 
 
+def test_loading_cli_does_not_import_httpx():
+    # httpx takes a long time to import, and is not needed for showing the help of the CLI
+    code = (
+        "import sys, movici_api_client.cli.main, movici_api_client.cli.commands;"
+        "sys.exit('httpx' in sys.modules)"
+    )
+    src_dir = pathlib.Path(movici_api_client.__file__).parents[1]
+    env = {**os.environ, "PYTHONPATH": str(src_dir)}
+    assert subprocess.run([sys.executable, "-c", code], env=env).returncode == 0
+
+
 def test_login_saves_context(cli, client, config_path):
     client.set_response({"session": "some_auth_token"})
     runner = click.testing.CliRunner()
@@ -31,3 +67,164 @@ def test_login_saves_context(cli, client, config_path):
     config = read_config(config_path)
     assert config.current_context["auth_token"] == "some_auth_token"
     assert config.current_context["username"] == "user"
+
+
+class TestConnectionOptions:
+    @pytest.fixture
+    def context(self):
+        return Context("foo", "https://example.org")
+
+    def test_default_connection_options(self, context):
+        assert parse_connection_options(context) == {"http2": False, "limits": None}
+
+    def test_connection_limits(self, context):
+        context["max_connections"] = "4"
+        assert parse_connection_options(context)["limits"] == httpx.Limits(
+            max_connections=4, max_keepalive_connections=20, keepalive_expiry=5.0
+        )
+
+    def test_http2_falls_back_without_h2(self, context):
+        context["http2"] = True
+        with patch.object(importlib.util, "find_spec", return_value=None):
+            assert parse_connection_options(context)["http2"] is False
+
+    def test_invalid_setting(self, context):
+        dict.__setitem__(context, "max_connections", "many")
+        with pytest.raises(InvalidContextSetting):
+            parse_connection_options(context)
+
+    def test_async_client_inherits_connection_options(self, context):
+        context["max_connections"] = "4"
+        config = Config([context], current_context="foo")
+        client = setup_async_client(setup_client(config, RetryPolicy()), config)
+        assert client.limits.max_connections == 4
+
+    def test_adaptive_concurrency(self, context):
+        context["min_concurrent_requests"] = "2"
+        context["max_concurrent_requests"] = "50"
+        limiter = setup_concurrency_limiter(context)
+        assert isinstance(limiter, AdaptiveConcurrencyLimiter)
+        assert (limiter.min_limit, limiter.max_limit) == (2, 50)
+
+    def test_fixed_concurrency(self, context):
+        context["adaptive_concurrency"] = "false"
+        context["max_concurrent_requests"] = "50"
+        limiter = setup_concurrency_limiter(context)
+        assert not isinstance(limiter, AdaptiveConcurrencyLimiter)
+        assert limiter.limit == 50
+
+    def test_invalid_concurrency_limits(self, context):
+        context["min_concurrent_requests"] = "20"
+        context["max_concurrent_requests"] = "10"
+        with pytest.raises(InvalidContextSetting):
+            setup_concurrency_limiter(context)
+
+    def test_rate_limits(self, context):
+        context["rate_limit.auth"] = "2.5"
+        context["rate_burst.auth"] = "5"
+        context["max_concurrent_requests.data_engine"] = "3"
+        config = Config([context], current_context="foo")
+        sync_client = setup_client(config, RetryPolicy())
+        client = setup_async_client(sync_client, config)
+        assert list(sync_client.rate_limits) == [Service.AUTH]
+        assert (client.rate_limits[Service.AUTH].rate, client.rate_limits[Service.AUTH].burst) == (
+            2.5,
+            5,
+        )
+        assert client.service_limiters[Service.DATA_ENGINE].limit == 3
+
+    def test_default_rate_burst(self, context):
+        context["rate_limit.auth"] = "4"
+        assert setup_rate_limits(context)[Service.AUTH].burst == 4
+
+    @pytest.mark.parametrize("key,value", [("rate_limit.auth", "0"), ("rate_burst.auth", "0")])
+    def test_invalid_rate_limit(self, context, key, value):
+        context["rate_limit.auth"] = "1"
+        context[key] = value
+        with pytest.raises(InvalidContextSetting) as e:
+            setup_rate_limits(context)
+        assert key in str(e.value)
+
+    def test_no_compression_by_default(self, context):
+        assert setup_compression(context) is None
+
+    def test_compression(self, context):
+        context["compression"] = "GZIP"
+        context["compression_level"] = "9"
+        compression = setup_compression(context)
+        assert (compression.codec, compression.level) == ("gzip", 9)
+
+    def test_invalid_compression(self, context):
+        with pytest.raises(ValueError):
+            context["compression"] = "brotli"
+        context["compression"] = "gzip"
+        context["compression_level"] = "12"
+        with pytest.raises(InvalidContextSetting):
+            setup_compression(context)
+
+    def test_download_format(self, context):
+        config = Config([context], current_context="foo")
+        assert setup_cli_parameters(config).format is None
+        context["download_format"] = "MsgPack"
+        assert setup_cli_parameters(config).format == "msgpack"
+        with pytest.raises(ValueError):
+            context["download_format"] = "xml"
+
+    def test_no_request_hooks_by_default(self, context):
+        assert setup_request_hooks(context) is None
+
+    def test_trace_file(self, context, tmp_path):
+        context["trace_file"] = str(tmp_path / "trace.jsonl")
+        context["trace_format"] = "OTLP"
+        hooks = setup_request_hooks(context)
+        assert hooks.format == "otlp"
+        assert hooks.file.name == str(tmp_path / "trace.jsonl")
+        hooks.close()
+
+
+def test_handle_http_error_forgets_expired_token(gimme_repo, read_config):
+    config = read_config()
+    config.current_context["auth_token_checked_at"] = 1234.0
+    gimme_repo.add(config)
+    with pytest.raises(Unauthenticated):
+        handle_http_error(httpx.Response(401))
+    assert "auth_token_checked_at" not in read_config().current_context
+
+
+class TestReauthenticate:
+    @pytest.fixture
+    def config(self, read_config):
+        config = read_config()
+        config.current_context["auth_token"] = "expired"
+        return config
+
+    @pytest.fixture
+    def make_client(self, config):
+        def server(request: httpx.Request):
+            if "user/login" in request.url.path:
+                return httpx.Response(200, json={"session": "new"})
+            if request.headers.get("Authorization") != "new":
+                return httpx.Response(401)
+            return httpx.Response(200, json={"projects": []})
+
+        def _make_client():
+            client = setup_client(config, RetryPolicy())
+            client.client = httpx.Client(transport=httpx.MockTransport(server))
+            return client
+
+        return _make_client
+
+    def test_logs_in_again_and_retries_request(self, make_client, gimme_repo, config, read_config):
+        gimme_repo.add(config)
+        config.current_context["username"] = "user"
+        with patch("sys.stdin.isatty", return_value=True), patch(
+            "movici_api_client.cli.controllers.login.prompt", return_value="pw"
+        ):
+            assert make_client().request(GetProjects()) == []
+        assert read_config().current_context["auth_token"] == "new"
+
+    def test_does_not_login_when_not_interactive(self, make_client, gimme_repo, config):
+        gimme_repo.add(config)
+        with patch("sys.stdin.isatty", return_value=False):
+            with pytest.raises(Unauthenticated):
+                make_client().request(GetProjects())
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from movici_api_client.api import codec
+from movici_api_client.api.auth import MoviciLoginAuth
+from movici_api_client.api.client import AsyncClient, Client
+from movici_api_client.api.pagination import Page
+from movici_api_client.api.requests import (
+    AddDatasetData,
+    CreateDataset,
+    CreateProject,
+    CreateScenario,
+    CreateTimeline,
+    CreateUpdate,
+    DeleteProject,
+    GetDatasets,
+    GetProjects,
+    GetScopes,
+    GetSimulation,
+    GetSingleDataset,
+    GetSingleUpdate,
+    GetUpdates,
+    RunSimulation,
+)
+from movici_api_client.api.retry import RetryPolicy
+from movici_api_client.cli.standin import (
+    Faults,
+    StandInRequest,
+    StandInServer,
+    StandInTransport,
+    multipart_file,
+)
+
+BASE_URL = "http://standin"
+
+
+@pytest.fixture
+def server():
+    return StandInServer()
+
+
+@pytest.fixture
+def transport(server):
+    return StandInTransport(server)
+
+
+@pytest.fixture
+def client(transport):
+    return Client(BASE_URL, auth=False, client=httpx.Client(transport=transport))
+
+
+@pytest.fixture
+def project(server):
+    return server.add_project("some_project")
+
+
+def make_async_client(transport, **kwargs):
+    return AsyncClient(
+        BASE_URL,
+        client_factory=lambda **kw: httpx.AsyncClient(transport=transport, **kw),
+        **kwargs,
+    )
+
+
+def test_creates_and_gets_projects(client, server):
+    project_uuid = client.request(CreateProject("some_project", "Some Project"))["project_uuid"]
+    projects = client.request(GetProjects())
+    assert [(p["uuid"], p["name"], p["display_name"]) for p in projects] == [
+        (project_uuid, "some_project", "Some Project")
+    ]
+    assert [s["name"] for s in client.request(GetScopes())] == ["project:some_project"]
+
+
+def test_deleting_project_deletes_its_datasets(client, server, project):
+    server.add_dataset(project["uuid"], "some_dataset", "road_network", b"{}")
+    client.request(DeleteProject(project["uuid"]))
+    assert server.datasets == {}
+    assert server.data == {}
+
+
+def test_uploads_and_downloads_dataset_data(client, server, project, tmp_path):
+    file = tmp_path / "some_dataset.json"
+    file.write_bytes(b'{"some": "data"}')
+    dataset_uuid = client.request(CreateDataset(project["uuid"], "some_dataset", "road_network"))[
+        "dataset_uuid"
+    ]
+    client.request(AddDatasetData(dataset_uuid, file))
+
+    assert client.request(GetSingleDataset(dataset_uuid))["has_data"]
+    resp = client.client.get(f"{BASE_URL}/data-engine/v4/datasets/{dataset_uuid}/data")
+    assert resp.content == b'{"some": "data"}'
+    assert resp.headers["content-type"] == "application/json"
+
+
+def test_unknown_resource_is_not_found(client):
+    resp = client.client.get(f"{BASE_URL}/data-engine/v4/datasets/invalid")
+    assert resp.status_code == 404
+
+
+def test_paginates_lists(client, server, project):
+    for i in range(5):
+        server.add_dataset(project["uuid"], f"dataset_{i}", "road_network")
+
+    resp = client.client.get(
+        f"{BASE_URL}/data-engine/v4/projects/{project['uuid']}/datasets/",
+        params={"limit": 2, "offset": 4},
+    )
+    body = codec.loads(resp.content)
+    assert [d["name"] for d in body["datasets"]] == ["dataset_4"]
+    assert (body["limit"], body["offset"], body["total"]) == (2, 4, 5)
+    names = [d["name"] for d in client.iterate(GetDatasets(project["uuid"]), page_size=2)]
+    assert names == [f"dataset_{i}" for i in range(5)]
+
+
+def test_paginated_lists_are_transformed_like_the_full_list(client, server):
+    scopes = [server.add_scope(f"scope_{i}") for i in range(3)]
+
+    expected = [{"name": s["scope_name"], "uuid": s["scope_uuid"]} for s in scopes]
+    assert client.request(Page(GetScopes(), page_size=2)).items == expected[:2]
+    assert list(client.iterate(GetScopes(), page_size=2)) == expected
+    assert client.request(GetScopes()) == expected
+
+
+def test_supports_conditional_and_range_requests(client, server, project):
+    dataset = server.add_dataset(project["uuid"], "some_dataset", "road_network", b"0123456789")
+    url = f"{BASE_URL}/data-engine/v4/datasets/{dataset['uuid']}/data"
+    etag = f'"{hashlib.sha256(b"0123456789").hexdigest()}"'
+
+    assert client.client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    resp = client.client.get(url, headers={"Range": "bytes=4-"})
+    assert resp.status_code == 206
+    assert resp.content == b"456789"
+    assert resp.headers["content-range"] == "bytes 4-9/10"
+    assert client.client.get(url, headers={"Range": "bytes=10-"}).status_code == 416
+
+
+def test_requires_login_when_configured_with_users(transport):
+    transport.server.users = {"user": "secret"}
+    auth = MoviciLoginAuth("user", "secret")
+    client = Client(BASE_URL, auth=auth, client=httpx.Client(transport=transport))
+    auth.login(client)
+    assert client.request(GetProjects()) == []
+    unauthenticated = Client(BASE_URL, auth=False, client=httpx.Client(transport=transport))
+    assert unauthenticated.client.get(f"{BASE_URL}/data-engine/v4/projects/").status_code == 401
+
+
+def test_runs_simulations(client, server, project):
+    scenario_uuid = client.request(CreateScenario(project["uuid"], {"name": "some_scenario"}))[
+        "scenario_uuid"
+    ]
+    with pytest.raises(httpx.HTTPStatusError):
+        client.request(GetSimulation(scenario_uuid))
+    client.request(RunSimulation(scenario_uuid))
+    assert client.request(GetSimulation(scenario_uuid))["status"] == "Succeeded"
+
+
+@pytest.mark.parametrize(
+    "faults,status_code,stat",
+    [
+        (Faults(throttle_rate=1.0, retry_after=2), 429, "throttled"),
+        (Faults(error_rate=1.0), 503, "errors"),
+    ],
+)
+def test_injects_faults(faults, status_code, stat):
+    server = StandInServer(faults)
+    resp = server.respond(StandInRequest("GET", "/data-engine/v4/projects/"))
+    assert resp.status_code == status_code
+    assert server.stats[stat] == 1
+    if status_code == 429:
+        assert resp.headers["retry-after"] == "2"
+
+
+def test_delay_includes_latency_and_bandwidth():
+    server = StandInServer(Faults(latency=0.1, bandwidth=1000), chunk_size=500)
+    assert server.delay(500) == pytest.approx(0.6)
+    assert list(server.iter_body(b"a" * 600)) == [(b"a" * 500, 0.5), (b"a" * 100, 0.1)]
+
+
+def test_multipart_file_guesses_content_type():
+    body = (
+        b"--boundary\r\n"
+        b'Content-Disposition: form-data; name="data"; filename="some.json"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n"
+        b"{}\r\n"
+        b"--boundary--\r\n"
+    )
+    request = StandInRequest(
+        "POST", "/", headers={"content-type": "multipart/form-data; boundary=boundary"}, body=body
+    )
+    assert multipart_file(request) == (b"{}", "application/json")
+
+
+@pytest.mark.asyncio
+async def test_async_client_retries_injected_faults(server, project):
+    server.faults = Faults(throttle_rate=0.5, retry_after=0, seed=0)
+    retry = RetryPolicy(max_retries=10, backoff_factor=0, min_budget=100)
+    async with make_async_client(StandInTransport(server), auth=False, retry=retry) as client:
+        results = await asyncio.gather(
+            *(client.request(GetProjects()) for _ in range(10)),
+        )
+    assert all(r == [project] for r in results)
+    assert server.stats["throttled"] > 0
+    assert server.stats["requests"] == 10 + server.stats["throttled"]
+
+
+@pytest.mark.asyncio
+async def test_async_client_uploads_timeline(server, project):
+    async with make_async_client(StandInTransport(server), auth=False) as client:
+        scenario_uuid = (
+            await client.request(CreateScenario(project["uuid"], {"name": "some_scenario"}))
+        )["scenario_uuid"]
+        await client.request(CreateTimeline(scenario_uuid))
+        payload = {"name": "some_dataset", "timestamp": 1, "iteration": 0, "data": {"a": 1}}
+        await client.request(CreateUpdate(scenario_uuid, payload))
+        updates = await client.request(GetUpdates(scenario_uuid))
+        update = await client.request(GetSingleUpdate(updates[0]["uuid"]))
+    assert update["data"] == {"a": 1}
+    assert update["timestamp"] == 1
+
+
+@pytest.mark.asyncio
+async def test_asgi_app(server, project):
+    received = [{"type": "http.request", "body": b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/data-engine/v4/projects/",
+        "query_string": b"limit=1",
+        "headers": [(b"host", b"standin")],
+    }
+    await server(scope, receive, send)
+    assert sent[0]["status"] == 200
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    assert codec.loads(body) == {"projects": [project], "limit": 1, "offset": 0, "total": 1}